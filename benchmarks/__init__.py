@@ -0,0 +1,2 @@
+# Benchmarks run against the emulated connections, so no hardware is needed.
+# Run them from the repository root, e.g. python -m benchmarks.throughput
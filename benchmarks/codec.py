@@ -0,0 +1,188 @@
+"""
+Encode / decode microbenchmarks for every protocol version.
+
+Measures the CPU cost of the codec functions of every Philips SICP version, SamsungV065
+and BenQGeneric without any hardware: command() on a TestConnection (framing only, the
+frame is not sent anywhere), Tools.list_to_bytes on the frame, calculate_checksum,
+get_answer_data on the answer of the emulated display and Tools.ascii_hex_list_to_string
+on the payload of the serial number. The ASCII protocol of BenQ has no binary answer,
+command_with_response decodes the canned answer of the emulated projector instead.
+Functions a vendor does not have are left out.
+
+Every function runs in a loop calibrated to take at least --min-time seconds per sample,
+after a warmup sample --samples samples are taken (like pyperf does in one process). The
+result reports ns/op (median, mean, standard deviation and minimum over the samples) and
+the allocations per op: the number of GC tracked objects (lists, dicts, instances) an op
+leaves behind including its result, counted with the collector disabled. Python 2 has no
+counter for temporaries freed within the call (tracemalloc is Python 3 only), so a
+growing number means a codec change allocates more objects that outlive the call.
+
+    python -m benchmarks.codec --samples 20 --output codec.json
+"""
+import argparse
+import gc
+import math
+import time
+
+from benchmarks.common import environment, write_results, percentile
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, SamsungEmulatedConnection, \
+    BenQEmulatedConnection
+from displaycontrol.connections.parser import HexParser
+from displaycontrol.connections.pipelineconnection import CaptureConnection, FrameCaptured
+from displaycontrol.connections.testconnection import TestConnection
+from displaycontrol.tools import Tools
+from displaycontrol.vendors.capabilities import supports
+from displaycontrol.vendors.philips import SICP_VERSIONS
+from displaycontrol.vendors.registry import get_vendor
+
+
+def vendors():
+    """ Registry key, controller class, emulated connection, the power state query and the
+    serial number query (None if there is none) of every protocol version """
+    result = []
+    for version in SICP_VERSIONS:
+        controller_class = get_vendor('philips_sicp%d' % version)
+        result.append(('philips_sicp%d' % version, controller_class,
+                       PhilipsEmulatedConnection(group_byte=controller_class.answer_header_length == 3),
+                       (0x19, []), (0x15, [])))
+    result.append(('samsung_v065', get_vendor('samsung_v065'), SamsungEmulatedConnection(), (0x11, []), (0x8A, [])))
+    result.append(('benq_generic', get_vendor('benq_generic'), BenQEmulatedConnection(), ('pow=?', None), None))
+    return result
+
+
+class CannedConnection(TestConnection):
+    """ Answers every command with the same canned answer """
+
+    def __init__(self, answer):
+        TestConnection.__init__(self)
+        self.answer = answer
+
+    def runcommand(self, command, with_handshake=True):
+        return self.answer
+
+
+def calibrate(func, min_time):
+    """ Number of loops (a power of two) that takes at least min_time seconds """
+    loops = 1
+    while True:
+        started = time.time()
+        for i in xrange(loops):
+            func()
+        if time.time() - started >= min_time or loops >= 2 ** 24:
+            return loops
+        loops *= 2
+
+
+def allocations(func, loops):
+    """ GC tracked objects left behind per call, with the results kept alive """
+    results = [None] * loops
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        before = gc.get_count()[0]
+        for i in xrange(loops):
+            results[i] = func()
+        after = gc.get_count()[0]
+    finally:
+        if enabled:
+            gc.enable()
+    return float(after - before) / loops
+
+
+def bench(func, samples, min_time):
+    """ Runs func in calibrated loops and returns ns/op and allocations per op """
+    loops = calibrate(func, min_time)
+    timings = []
+    for sample in range(samples + 1):
+        started = time.time()
+        for i in xrange(loops):
+            func()
+        timings.append((time.time() - started) / loops * 1e9)
+    # The first sample is the warmup
+    timings = timings[1:]
+    mean = sum(timings) / len(timings)
+    return {
+        'loops': loops,
+        'samples': samples,
+        'ns_per_op': percentile(timings, 50),
+        'mean_ns': mean,
+        'stdev_ns': math.sqrt(sum((timing - mean) ** 2 for timing in timings) / len(timings)),
+        'min_ns': min(timings),
+        'allocations_per_op': round(allocations(func, min(loops, 10000)), 3),
+    }
+
+
+def capture_frame(controller_class, query):
+    """ The bytes command() sends for a query """
+    capture = CaptureConnection()
+    controller = controller_class(capture)
+    try:
+        controller.command(*query)
+    except FrameCaptured:
+        pass
+    return capture.frames[0]
+
+
+def answer_for(controller_class, connection, query):
+    """ The answer of the emulated display to a query as hex list, like the parser returns it """
+    return HexParser().parse(connection.respond(capture_frame(controller_class, query)))
+
+
+def bench_vendor(controller_class, connection, query, serial_query, samples, min_time):
+    encoder = controller_class(TestConnection())
+    # The BenQ handshake would wait for a prompt on every command
+    encoder.connection.handshake = None
+    result = {'command': bench(lambda: encoder.command(*query), samples, min_time)}
+
+    frame = [ord(c) for c in capture_frame(controller_class, query)]
+    result['list_to_bytes'] = bench(lambda: Tools.list_to_bytes(frame), samples, min_time)
+    if supports(controller_class, 'command_with_response'):
+        # e.g. '*pow=?#\r\n*POW=ON#\r\n', the echo of the command and the value
+        decoder = controller_class(CannedConnection(connection.respond(capture_frame(controller_class, query))))
+        decoder.connection.handshake = None
+        result['command_with_response'] = bench(lambda: decoder.command_with_response(query[0]), samples,
+                                                min_time)
+    if supports(controller_class, 'calculate_checksum'):
+        body = frame[:-1]
+        result['calculate_checksum'] = bench(lambda: encoder.calculate_checksum(body), samples, min_time)
+    if supports(controller_class, 'get_answer_data'):
+        # get_answer_data cuts the frame in place, so every call gets a copy
+        answer = answer_for(controller_class, connection, query)
+        result['get_answer_data'] = bench(lambda: encoder.get_answer_data(answer[:]), samples, min_time)
+    if serial_query is not None and supports(controller_class, 'get_serialnumber'):
+        payload = encoder.get_answer_data(answer_for(controller_class, connection, serial_query))
+        # Philips answers with the command code in front of the text
+        if payload and int(payload[0], 16) == serial_query[0]:
+            payload = payload[1:]
+        result['ascii_hex_list_to_string'] = bench(lambda: Tools.ascii_hex_list_to_string(payload), samples,
+                                                   min_time)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Encode / decode microbenchmarks for every protocol version')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='seconds every sample runs at least')
+    parser.add_argument('--vendor', action='append', default=None,
+                        help='registry key of a vendor to run, may be repeated, defaults to all')
+    parser.add_argument('--output', default=None, help='JSON file to write, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'codec',
+        'environment': environment(),
+        'settings': vars(args),
+        'vendors': {},
+    }
+    for name, controller_class, connection, query, serial_query in vendors():
+        if args.vendor is None or name in args.vendor:
+            results['vendors'][name] = bench_vendor(controller_class, connection, query, serial_query,
+                                                    args.samples, args.min_time)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
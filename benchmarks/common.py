@@ -0,0 +1,76 @@
+"""
+Helpers shared by all benchmark scripts: timing, statistics and JSON output.
+"""
+import json
+import platform
+import sys
+import time
+
+
+def percentile(values, percent):
+    """ Nearest rank percentile of the given values """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = int(round(percent / 100.0 * len(ordered) + 0.5)) - 1
+    return ordered[max(0, min(index, len(ordered) - 1))]
+
+
+def measure(func, iterations):
+    """ Calls func the given amount of times and returns a dict with throughput and latency """
+    latencies = []
+    started = time.time()
+    for i in range(iterations):
+        begin = time.time()
+        func()
+        latencies.append(time.time() - begin)
+    total = time.time() - started
+    return {
+        'iterations': iterations,
+        'seconds': total,
+        'ops_per_second': iterations / total if total > 0 else None,
+        'p50_ms': percentile(latencies, 50) * 1000.0,
+        'p99_ms': percentile(latencies, 99) * 1000.0,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+    }
+
+
+def write_results(results, output=None):
+    """ Writes the results as JSON to the given file name or to stdout """
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        with open(output, 'w') as handle:
+            handle.write(text + '\n')
+
+
+class Silence:
+    """ Context manager that swallows everything printed (e.g. by the detectors) """
+
+    def __init__(self):
+        self._stdout = None
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = _NullWriter()
+        return self
+
+    def __exit__(self, *args):
+        sys.stdout = self._stdout
+
+
+class _NullWriter:
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
@@ -0,0 +1,82 @@
+"""
+Import time benchmark.
+
+Imports a module in a fresh interpreter for every run and reports the median and p99
+wall clock time, and which heavy modules (pyserial, the vendor modules) ended up in
+sys.modules. The result is written as JSON.
+
+    python -m benchmarks.import_time --runs 20 --output import_time.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import percentile, environment, write_results
+
+MODULES = [
+    'displaycontrol.vendors',
+    'displaycontrol.vendors.benq',
+    'displaycontrol.vendors.registry',
+    'displaycontrol.connections',
+    'displaycontrol.fleet',
+]
+
+WATCHED = [
+    'serial',
+    'displaycontrol.vendors.benq',
+    'displaycontrol.vendors.philips',
+    'displaycontrol.vendors.samsung',
+]
+
+SCRIPT = """
+import json, sys, time
+started = time.time()
+import %s
+seconds = time.time() - started
+print(json.dumps({'seconds': seconds, 'loaded': [name for name in %r if name in sys.modules]}))
+"""
+
+
+def import_once(module):
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT % (module, WATCHED)])
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_module(module, runs):
+    timings = []
+    loaded = []
+    for i in range(runs):
+        result = import_once(module)
+        timings.append(result['seconds'])
+        loaded = result['loaded']
+    return {
+        'runs': runs,
+        'median_ms': percentile(timings, 50) * 1000.0,
+        'p99_ms': percentile(timings, 99) * 1000.0,
+        'loaded': loaded,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import time benchmark')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--module', action='append', default=None,
+                        help='module to import, may be given more than once')
+    parser.add_argument('--output', default=None, help='JSON file to write, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'import_time',
+        'environment': environment(),
+        'settings': vars(args),
+        'modules': {},
+    }
+    for module in args.module or MODULES:
+        results['modules'][module] = bench_module(module, args.runs)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
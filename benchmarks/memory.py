@@ -0,0 +1,80 @@
+"""
+Memory benchmark for large fleets.
+
+Builds N controllers and N display handles (see displaycontrol.handles) for displays
+spread over a number of emulated ports, each kind in a fresh interpreter, and reports
+the growth of the resident memory per display and the time it took to build them.
+The result is written as JSON.
+
+    python -m benchmarks.memory --displays 10000 --output memory.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import environment, write_results
+
+SCRIPT = """
+import gc, json, os, resource, time
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.handles import DisplayHandle, protocol_for
+from displaycontrol.vendors.philips import PhilipsSICP188
+
+
+def resident():
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+kind, displays, ports = %r, %d, %d
+connections = [PhilipsEmulatedConnection(range(1, displays // ports + 2)) for port in range(ports)]
+protocol = protocol_for(PhilipsSICP188)
+gc.collect()
+before = resident()
+started = time.time()
+if kind == 'controller':
+    objects = [PhilipsSICP188(connections[index %% ports], index // ports + 1) for index in range(displays)]
+else:
+    objects = [DisplayHandle(protocol, connections[index %% ports], index // ports + 1) for index in range(displays)]
+seconds = time.time() - started
+gc.collect()
+grown = resident() - before
+print(json.dumps({'bytes': grown, 'seconds': seconds}))
+"""
+
+
+def bench_kind(kind, displays, ports):
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT % (kind, displays, ports)])
+    result = json.loads(output.strip().splitlines()[-1])
+    return {
+        'displays': displays,
+        'resident_bytes': result['bytes'],
+        'bytes_per_display': float(result['bytes']) / displays,
+        'build_ms': result['seconds'] * 1000.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memory benchmark for controllers and display handles')
+    parser.add_argument('--displays', type=int, default=10000)
+    parser.add_argument('--ports', type=int, default=64)
+    parser.add_argument('--output', default=None, help='JSON file to write, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'memory',
+        'environment': environment(),
+        'settings': vars(args),
+        'kinds': {},
+    }
+    for kind in ['controller', 'handle']:
+        results['kinds'][kind] = bench_kind(kind, args.displays, args.ports)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Command throughput, latency and discovery benchmark.
+
+Runs every vendor against its emulated connection and reports commands/second and
+p50/p99 latency for a getter and a setter, the cost of encoding a frame with command()
+and decoding it with get_answer_data(), and the time a full discovery over N ports and
+M display ids takes with the Philips and Samsung detectors. The result is written as JSON.
+
+    python -m benchmarks.throughput --iterations 2000 --output throughput.json
+"""
+import argparse
+import time
+
+from benchmarks.common import measure, environment, write_results, Silence
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, \
+    SamsungEmulatedConnection, BenQEmulatedConnection
+from displaycontrol.connections.testconnection import TestConnection
+from displaycontrol.vendors import DisplayGeneric, PhilipsSICP100, PhilipsSICP188, PhilipsSerialDetector, \
+    SamsungV065, SamsungSerialDetector, BenQLU9235
+
+
+def vendors(latency):
+    """ Name, controller class, emulated connection and a raw get command for every vendor """
+    return [
+        ('philips_sicp100', PhilipsSICP100, PhilipsEmulatedConnection(latency=latency), (0x19, [])),
+        ('philips_sicp188', PhilipsSICP188, PhilipsEmulatedConnection(latency=latency, group_byte=True),
+         (0x19, [])),
+        ('samsung_generic', SamsungV065, SamsungEmulatedConnection(latency=latency), (0x11, [])),
+        ('benq_lu9235', BenQLU9235, BenQEmulatedConnection(latency=latency), ('pow=?', None)),
+    ]
+
+
+def bench_vendor(controller_class, connection, raw_command, iterations):
+    control = controller_class(connection)
+    result = {
+        'get': measure(control.get_power_state, iterations),
+        'set': measure(lambda: control.set_power_state(DisplayGeneric.POWER_STATE_ON), iterations),
+    }
+
+    # Encoding only: the test connection does not run anything
+    encoder = controller_class(TestConnection())
+    if isinstance(raw_command[0], str):
+        result['encode'] = measure(lambda: encoder.assemble_runnable_command(*raw_command), iterations)
+    else:
+        result['encode'] = measure(lambda: encoder.command(*raw_command), iterations)
+        answer = control.command(*raw_command)
+        result['decode'] = measure(lambda: control.get_answer_data(list(answer)), iterations)
+    return result
+
+
+def bench_discovery(ports, ids, latency):
+    port_names = ['EMULATED%d' % i for i in range(ports)]
+    detectors = [
+        ('philips', PhilipsSerialDetector(PhilipsEmulatedConnection(range(1, ids + 1), latency),
+                                          port_names, range(1, ids + 1))),
+        ('samsung', SamsungSerialDetector(SamsungEmulatedConnection(range(1, ids + 1), latency),
+                                          port_names, range(1, ids + 1))),
+    ]
+    result = {}
+    for name, detector in detectors:
+        started = time.time()
+        with Silence():
+            displays = detector.detect_displays()
+        result[name] = {
+            'ports': ports,
+            'ids': ids,
+            'seconds': time.time() - started,
+            'displays': len(displays),
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Command throughput and discovery benchmark')
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='emulated seconds on the wire for every frame')
+    parser.add_argument('--ports', type=int, default=4)
+    parser.add_argument('--ids', type=int, default=4)
+    parser.add_argument('--output', default=None, help='JSON file to write, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'throughput',
+        'environment': environment(),
+        'settings': vars(args),
+        'vendors': {},
+    }
+    for name, controller_class, connection, raw_command in vendors(args.latency):
+        results['vendors'][name] = bench_vendor(controller_class, connection, raw_command, args.iterations)
+    results['discovery'] = bench_discovery(args.ports, args.ids, args.latency)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Circuit breakers that stop sending commands to displays that do not answer.
+
+After threshold commands in a row went unanswered, the breaker of a display opens:
+every command fails at once with a DisplayOfflineError instead of waiting for the
+answer window. Once the backoff passed, the next command first sends a cheap probe
+(is_ready_for_commands). If the display answers, the breaker closes again, otherwise it
+stays open and the backoff grows up to maximum_backoff.
+
+    fleet.use_breakers(threshold=3, backoff=5, on_change=log_change)
+"""
+from __future__ import absolute_import
+import threading
+import time
+
+
+class CircuitBreaker(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    # Results of check()
+    ALLOW = 'allow'
+    PROBE = 'probe'
+    REJECT = 'reject'
+
+    def __init__(self, name=None, threshold=3, backoff=5.0, maximum_backoff=300.0, factor=2.0, on_change=None):
+        self.name = name
+        self.threshold = threshold
+        self.backoff = backoff
+        self.maximum_backoff = maximum_backoff
+        self.factor = factor
+        self.listeners = [on_change] if on_change is not None else []
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.current_backoff = backoff
+        self.next_probe = None
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """ ALLOW the command, REJECT it or send a PROBE first. Only one caller gets
+        the probe, all others are rejected until the probe is done. """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.ALLOW
+            if self.state == self.OPEN and time.time() >= self.next_probe:
+                self.probes += 1
+                self.change(self.HALF_OPEN)
+                return self.PROBE
+            self.rejected += 1
+            return self.REJECT
+
+    def rejects(self):
+        """ True if check() would reject a command now, without changing anything """
+        with self._lock:
+            return self.state == self.HALF_OPEN or (self.state == self.OPEN and time.time() < self.next_probe)
+
+    def abort_probe(self):
+        """ The probe did not get to the display (e.g. its deadline passed), the breaker
+        opens again without a longer backoff and the next command probes again """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.change(self.OPEN)
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.current_backoff = self.backoff
+            if self.state != self.CLOSED:
+                self.change(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self.current_backoff = min(self.current_backoff * self.factor, self.maximum_backoff)
+                self.open()
+            elif self.state == self.CLOSED and self.consecutive_failures >= self.threshold:
+                self.open()
+
+    def open(self):
+        self.next_probe = time.time() + self.current_backoff
+        if self.state == self.CLOSED:
+            self.opened += 1
+        self.change(self.OPEN)
+
+    def change(self, state):
+        old, self.state = self.state, state
+        for listener in self.listeners:
+            try:
+                listener(self, old, state)
+            except Exception:
+                pass
+
+    def statistics(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'probes': self.probes,
+            'next_probe_in': max(0.0, self.next_probe - time.time()) if self.state == self.OPEN else None,
+        }
+
+    def __repr__(self):
+        return '<CircuitBreaker %s %s>' % (self.name, self.state)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(port, display_id, **settings):
+    """ Returns the breaker of a display, shared by all controllers of this process.
+    Settings (see CircuitBreaker) only apply when the breaker is created. """
+    key = (port, display_id)
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker('%s:%s' % key, **settings)
+        return _breakers[key]
+
+
+def statistics():
+    """ Statistics of all breakers of this process by name """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return dict((breaker.name, breaker.statistics()) for breaker in breakers)
@@ -0,0 +1,94 @@
+"""
+Thread safe helpers to avoid asking displays more often than needed.
+"""
+from __future__ import absolute_import
+import threading
+import time
+
+
+class StateCache:
+    """
+    Remembers the last read value per (display, attribute) for ttl seconds.
+
+    Every display has a generation that invalidate() bumps. A reader takes the generation
+    before it asks the display and passes it to put(), a value read before something was
+    set is then dropped instead of being cached for the whole ttl.
+    """
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._values = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, display):
+        """ The current generation of a display, to be passed to put() """
+        with self._lock:
+            return self._generations.get(display, 0)
+
+    def get(self, key, max_age=None):
+        """ Returns (True, value) if a fresh value is known, (False, None) otherwise """
+        if max_age is None:
+            max_age = self.ttl
+        with self._lock:
+            if key in self._values:
+                stored, value = self._values[key]
+                if time.time() - stored <= max_age:
+                    return True, value
+        return False, None
+
+    def put(self, key, value, generation=None):
+        """ Stores value, unless the display was invalidated since generation was taken """
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key[0], 0):
+                return
+            self._values[key] = (time.time(), value)
+
+    def invalidate(self, display):
+        """ Forget all values of a display, e.g. after something was set """
+        with self._lock:
+            self._generations[display] = self._generations.get(display, 0) + 1
+            for key in list(self._values.keys()):
+                if key[0] == display:
+                    del self._values[key]
+
+
+class RequestCoalescer:
+    """
+    Runs identical requests that arrive while one of them is in flight only once, all
+    callers get the result (or exception) of that single call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.value = func()
+            except Exception, err:
+                call.error = err
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
@@ -0,0 +1,176 @@
+"""
+Command line tool to run operations on many displays in parallel.
+
+    displaycontrol --inventory displays.json status
+    displaycontrol --vendor philips_sicp188 --port /dev/ttyUSB0 --id 1 --id 2 power on --wait 30
+    displaycontrol --port /dev/ttyUSB0 --port /dev/ttyUSB1 detect --format csv
+
+Operations:
+    power [on|off]      get or set the power state, with --wait until the displays are ready
+    input [channel]     get or set the input channel
+    status              power state, input channel and key lock
+    detect              search the selected (or all) ports for Philips and Samsung displays
+
+Results are printed as JSON (default) or CSV, including the time every display took and
+the total time. Displays on different ports run in parallel, up to --concurrency ports.
+"""
+from __future__ import absolute_import
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import OrderedDict
+
+from displaycontrol.fleet import Fleet, load_inventory, run_method, run_grouped, power_on_and_wait, build_connection
+from displaycontrol.tools import Tools
+from displaycontrol.vendors.capabilities import supports
+from displaycontrol.vendors.generic import DisplayGeneric
+
+POWER_STATES = {
+    'on': DisplayGeneric.POWER_STATE_ON,
+    'off': DisplayGeneric.POWER_STATE_OFF,
+}
+
+
+def status(controller):
+    """ Collects the most important values of a display, skipping unsupported ones """
+    values = {}
+    for key, method in [('power', 'get_power_state_hr'),
+                        ('input', 'get_input_channel_hr'),
+                        ('lock_keys', 'get_lock_keys_hr')]:
+        if not supports(controller, method):
+            values[key] = None
+            continue
+        result = run_method(controller, method, ())
+        values[key] = result['value'] if result['ok'] else None
+    return values
+
+
+def detect(port, vendors, connection=None, settings=None, display_ids=None):
+    """ Runs the detectors of the given vendors on a single port, with a connection of
+    the given class and settings (default: SerialConnection). Without display_ids, the
+    detectors try their default ids. """
+    from displaycontrol.vendors.philips import PhilipsSerialDetector
+    from displaycontrol.vendors.samsung import SamsungSerialDetector
+    detectors = {'philips': PhilipsSerialDetector, 'samsung': SamsungSerialDetector}
+    spec = {'port': port, 'connection': connection, 'settings': settings or {}}
+    displays = []
+    for vendor in vendors:
+        displays.extend(detectors[vendor](build_connection(spec), [port], display_ids).detect_displays())
+    return displays
+
+
+def selection(args):
+    """ Returns the display specifications from the inventory or the command line """
+    if args.inventory:
+        displays = load_inventory(args.inventory)
+    else:
+        displays = []
+        for port in args.port:
+            for display_id in args.id or [1]:
+                displays.append({'vendor': args.vendor, 'port': port, 'id': display_id})
+    for spec in displays:
+        if args.connection:
+            spec['connection'] = args.connection
+        if args.baudrate:
+            spec.setdefault('settings', {})['baudrate'] = args.baudrate
+    return displays
+
+
+def operation(args):
+    """ Returns method and arguments for Fleet.run """
+    if args.operation == 'power':
+        if args.value is None:
+            return 'get_power_state_hr', ()
+        if args.value.lower() not in POWER_STATES:
+            raise SystemExit('power accepts on or off')
+        if args.wait and args.value.lower() == 'on':
+            return power_on_and_wait, (args.wait,)
+        return 'set_power_state', (POWER_STATES[args.value.lower()],)
+    if args.operation == 'input':
+        if args.value is None:
+            return 'get_input_channel_hr', ()
+        return 'set_input_channel', (args.value,)
+    return status, ()
+
+
+def acknowledged(results, error):
+    """ Setters return False if the display did not acknowledge, that is a failure """
+    for result in results.values():
+        if result['ok'] and result['value'] is False:
+            result['ok'] = False
+            result['error'] = error
+    return results
+
+
+def run(args):
+    started = time.time()
+    if args.operation == 'detect':
+        ports = args.port or Tools.get_available_comports()
+        vendors = [args.detect_vendor] if args.detect_vendor else ['philips', 'samsung']
+        settings = {'baudrate': args.baudrate} if args.baudrate else {}
+        detect_args = (vendors, args.connection, settings, args.id)
+        groups = OrderedDict((port, [(port, port)]) for port in ports)
+        # The detectors print their progress, keep stdout for the results
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            results = run_grouped(groups, lambda port: run_method(port, detect, detect_args), args.concurrency)
+        finally:
+            sys.stdout = stdout
+    else:
+        method, method_args = operation(args)
+        fleet = Fleet(selection(args))
+        results = fleet.run(method, method_args, concurrency=args.concurrency)
+        if method is power_on_and_wait:
+            acknowledged(results, 'Not ready after %s seconds' % args.wait)
+        elif args.value is not None:
+            acknowledged(results, 'Not acknowledged')
+    return results, time.time() - started
+
+
+def write(results, total, output_format, stream):
+    if output_format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(['display', 'ok', 'value', 'error', 'seconds'])
+        for name, result in results.items():
+            value = result['value']
+            if not isinstance(value, basestring):
+                value = json.dumps(value, default=str)
+            writer.writerow([name, result['ok'], value, result['error'] or '', '%.3f' % result['seconds']])
+        writer.writerow(['total', all(result['ok'] for result in results.values()), '', '', '%.3f' % total])
+    else:
+        content = {
+            'results': [dict(result, display=name) for name, result in results.items()],
+            'total_seconds': total,
+        }
+        stream.write(json.dumps(content, indent=2, sort_keys=True, default=str) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='displaycontrol', description='Control many displays at once')
+    parser.add_argument('operation', choices=['power', 'input', 'status', 'detect'])
+    parser.add_argument('value', nargs='?', default=None, help='value to set, omit to read')
+    parser.add_argument('--inventory', help='JSON file with display specifications')
+    parser.add_argument('--port', action='append', default=[], help='port, can be given multiple times')
+    parser.add_argument('--id', action='append', type=int, help='display id, can be given multiple times')
+    parser.add_argument('--vendor', help='vendor key or controller class, e.g. philips_sicp188, samsung_generic, benq_lu9235')
+    parser.add_argument('--detect-vendor', choices=['philips', 'samsung'], help='limit detect to one vendor')
+    parser.add_argument('--connection', help='connection class, defaults to SerialConnection')
+    parser.add_argument('--baudrate', type=int)
+    parser.add_argument('--concurrency', type=int, default=8, help='number of ports served in parallel')
+    parser.add_argument('--wait', type=float, help='power on: wait up to this many seconds until '
+                                                   'every display accepts commands')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    args = parser.parse_args(argv)
+
+    if args.operation != 'detect' and not args.inventory and not (args.port and args.vendor):
+        parser.error('either --inventory or --port and --vendor are required')
+
+    results, total = run(args)
+    write(results, total, args.format, sys.stdout)
+    return 0 if all(result['ok'] for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,8 @@
 # read http://mikegrouchy.com/blog/2012/05/be-pythonic-__init__py.html
 from generic import *
-from serialconnection import *
+from displaycontrol.lazy import install_lazy_module
+
+# pyserial is only imported once the SerialConnection is used
+install_lazy_module(__name__, {
+    'SerialConnection': 'displaycontrol.connections.serialconnection',
+})
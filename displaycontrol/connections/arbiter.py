@@ -0,0 +1,201 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from displaycontrol.exceptions import CommandExpiredError
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 10
+
+# Number of wait times kept per priority for the statistics
+WAIT_TIME_SAMPLES = 1000
+
+_scheduling = threading.local()
+
+
+def current_scheduling():
+    """ Returns (priority, deadline) of the current thread """
+    priority, deadline = getattr(_scheduling, 'value', (None, None))
+    return PRIORITY_NORMAL if priority is None else priority, deadline
+
+
+def current_deadline():
+    """ The deadline of the current thread, None if there is none """
+    return getattr(_scheduling, 'value', (None, None))[1]
+
+
+def is_scheduled():
+    """ True within a scheduling block of the current thread that sets a priority """
+    return getattr(_scheduling, 'value', (None, None))[0] is not None
+
+
+@contextmanager
+def scheduling(priority=None, deadline=None):
+    """ Sets priority and deadline (a displaycontrol.deadline.Deadline) for all commands
+    the current thread runs within the block. None keeps the outer setting, an inner
+    deadline never extends an outer one. """
+    previous = getattr(_scheduling, 'value', (None, None))
+    if deadline is None or (previous[1] is not None and previous[1].expires_at < deadline.expires_at):
+        deadline = previous[1]
+    _scheduling.value = (previous[0] if priority is None else priority, deadline)
+    try:
+        yield
+    finally:
+        _scheduling.value = previous
+
+
+def _percentile(ordered, percent):
+    index = int(round(percent / 100.0 * len(ordered) + 0.5)) - 1
+    return ordered[max(0, min(index, len(ordered) - 1))]
+
+
+class PortArbiter(object):
+    """
+    Grants one thread at a time access to a port. Waiting threads are served by priority
+    (lower first), threads with the same priority in the order they asked. A thread whose
+    deadline passes while waiting gives up with a CommandExpiredError.
+
+    The port is held by a thread unless another holder is given. The holder may acquire
+    it again (e.g. a handshake running a command within a command), it has to release it
+    as often. A thread hands the port over to the reply of a command written with
+    sendcommand, which releases it once its answer window is over. Until then nobody
+    else gets the port, the thread that wrote the command neither.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self._condition = threading.Condition(threading.Lock())
+        self._tickets = itertools.count()
+        self._waiting = []
+        self._owner = None
+        self._depth = 0
+        self._wait_times = {}
+        self._dropped = {}
+
+    def acquire(self, priority=None, deadline=None, holder=None):
+        """ Waits for the port. Priority and deadline default to the ones of the current
+        thread (see scheduling), the holder to the current thread. """
+        if priority is None or deadline is None:
+            current = current_scheduling()
+            priority = current[0] if priority is None else priority
+            deadline = current[1] if deadline is None else deadline
+
+        me = threading.current_thread() if holder is None else holder
+        with self._condition:
+            if self._owner is me:
+                self._depth += 1
+                return
+            if deadline is not None and deadline.expired():
+                self._dropped[priority] = self._dropped.get(priority, 0) + 1
+                raise CommandExpiredError('Deadline passed before waiting for port %s' % self.port)
+            started = time.time()
+            entry = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+            while self._owner is not None or self._waiting[0] != entry:
+                if deadline is not None and deadline.expired():
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._dropped[priority] = self._dropped.get(priority, 0) + 1
+                    # The next one in line may be able to go now
+                    self._condition.notify_all()
+                    raise CommandExpiredError('Deadline passed while waiting for port %s' % self.port)
+                self._condition.wait(deadline.remaining() if deadline is not None else None)
+            heapq.heappop(self._waiting)
+            self._owner = me
+            self._depth = 1
+            if priority not in self._wait_times:
+                self._wait_times[priority] = deque(maxlen=WAIT_TIME_SAMPLES)
+            self._wait_times[priority].append(time.time() - started)
+
+    def try_acquire(self, holder=None):
+        """ Takes the port if nobody holds or waits for it, without waiting. Returns
+        whether the holder (the current thread by default) holds the port now. """
+        me = threading.current_thread() if holder is None else holder
+        with self._condition:
+            if self._owner is me:
+                self._depth += 1
+                return True
+            if self._owner is not None or self._waiting:
+                return False
+            self._owner = me
+            self._depth = 1
+            return True
+
+    def hand_over(self, holder):
+        """ Passes the port from the current thread to the holder, which has to release it.
+        Returns False if the thread holds the port more than once: it stays with the
+        thread then, which has to wait for the reply before going on. """
+        me = threading.current_thread()
+        with self._condition:
+            if self._owner is not me:
+                raise RuntimeError('Port %s handed over by %r, but held by %r' % (self.port, me, self._owner))
+            if self._depth > 1:
+                self._depth -= 1
+                return False
+            self._owner = holder
+            return True
+
+    def release(self, holder=None):
+        me = threading.current_thread() if holder is None else holder
+        with self._condition:
+            if self._depth == 0:
+                raise RuntimeError('Port %s released without being acquired' % self.port)
+            if self._owner is not me:
+                raise RuntimeError('Port %s released by %r, but held by %r' % (self.port, me, self._owner))
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._condition.notify_all()
+
+    def is_held(self):
+        return self._owner is not None
+
+    def queue_length(self):
+        return len(self._waiting)
+
+    def statistics(self):
+        """ Time spent waiting for the port per priority: number of commands, dropped
+        commands and wait time percentiles in milliseconds over the recent commands """
+        with self._condition:
+            result = {}
+            for priority in set(self._wait_times) | set(self._dropped):
+                ordered = sorted(self._wait_times.get(priority, []))
+                result[priority] = {
+                    'count': len(ordered),
+                    'dropped': self._dropped.get(priority, 0),
+                    'p50_ms': _percentile(ordered, 50) * 1000.0 if ordered else None,
+                    'p99_ms': _percentile(ordered, 99) * 1000.0 if ordered else None,
+                    'max_ms': ordered[-1] * 1000.0 if ordered else None,
+                }
+            return result
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+_arbiters = {}
+_arbiters_lock = threading.Lock()
+
+
+def arbiter_for(port):
+    """ Returns the arbiter of the given port, shared by all connections in this process """
+    with _arbiters_lock:
+        if port not in _arbiters:
+            _arbiters[port] = PortArbiter(port)
+        return _arbiters[port]
+
+
+def statistics():
+    """ Wait time statistics of all ports in this process """
+    with _arbiters_lock:
+        arbiters = list(_arbiters.values())
+    return dict((arbiter.port, arbiter.statistics()) for arbiter in arbiters)
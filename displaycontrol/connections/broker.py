@@ -0,0 +1,195 @@
+"""
+Local broker that owns a port and serves command frames to other processes over a
+Unix socket, so a poller and an operator script can share one daisy chain.
+
+Start the broker for a port:
+
+    python -m displaycontrol.connections.broker --port /dev/ttyUSB0 --socket /tmp/ttyUSB0.sock
+
+and use a BrokerConnection instead of the SerialConnection in every client:
+
+    display = PhilipsSICP188(BrokerConnection('/tmp/ttyUSB0.sock'), 1)
+
+Every request is a header (operation, payload length) followed by the payload, the
+broker answers with the length of the raw answer followed by the answer:
+
+* COMMAND runs the payload on the port and returns the raw answer
+* ACQUIRE reserves the port for this client (e.g. for handshake and command)
+* RELEASE ends the reservation
+"""
+import SocketServer
+import argparse
+import os
+import socket
+import struct
+import threading
+
+from displaycontrol.connections import GenericConnection
+
+OPERATION_COMMAND = 'C'
+OPERATION_ACQUIRE = 'A'
+OPERATION_RELEASE = 'R'
+
+REQUEST_HEADER = struct.Struct('<cI')
+REPLY_HEADER = struct.Struct('<I')
+
+
+def receive_exactly(sock, length):
+    """ Reads length bytes from the socket, returns None if the other side closed it """
+    data = ''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class BrokerRequestHandler(SocketServer.BaseRequestHandler):
+    """ Serves one client until it disconnects """
+
+    def handle(self):
+        connection = self.server.connection
+        arbiter = connection.arbiter()
+        reserved = 0
+        try:
+            while True:
+                header = receive_exactly(self.request, REQUEST_HEADER.size)
+                if header is None:
+                    break
+                operation, length = REQUEST_HEADER.unpack(header)
+                payload = receive_exactly(self.request, length)
+                if payload is None:
+                    break
+
+                out = ''
+                if operation == OPERATION_COMMAND:
+                    out = connection.runcommand(payload, with_handshake=False) or ''
+                elif operation == OPERATION_ACQUIRE:
+                    arbiter.acquire()
+                    reserved += 1
+                elif operation == OPERATION_RELEASE and reserved > 0:
+                    arbiter.release()
+                    reserved -= 1
+                self.request.sendall(REPLY_HEADER.pack(len(out)) + out)
+        finally:
+            # A client that went away does not block the port
+            while reserved > 0:
+                arbiter.release()
+                reserved -= 1
+
+
+class PortBroker(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """
+    Serves the given connection on a Unix socket. Handshake and parser are left to the
+    clients, the broker only moves raw frames.
+    """
+    daemon_threads = True
+
+    def __init__(self, connection, path):
+        connection.handshake = None
+        connection.parser = None
+        self.connection = connection
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        SocketServer.UnixStreamServer.__init__(self, path, BrokerRequestHandler)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class BrokerConnection(GenericConnection):
+    """
+    Runs commands through a PortBroker. Handshake and command are sent while the port is
+    reserved for this client, so no other client gets in between. Without a path, the
+    port is the path of the socket (e.g. in a fleet inventory).
+    """
+    port = None
+    handshake = None
+    parser = None
+    timeout = 30
+
+    def __init__(self, path=None):
+        GenericConnection.__init__(self)
+        self.path = path
+        self._socket = None
+        self._lock = threading.RLock()
+
+    def connect(self):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(self.timeout)
+            self._socket.connect(self.socket_path())
+        return self._socket
+
+    def socket_path(self):
+        return self.path if self.path is not None else self.port
+
+    def close(self):
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+    def request(self, operation, payload=''):
+        with self._lock:
+            sock = self.connect()
+            try:
+                sock.sendall(REQUEST_HEADER.pack(operation, len(payload)) + payload)
+                header = receive_exactly(sock, REPLY_HEADER.size)
+                out = receive_exactly(sock, REPLY_HEADER.unpack(header)[0]) if header is not None else None
+            except socket.error:
+                self.close()
+                raise
+            if out is None:
+                self.close()
+                raise socket.error('Broker at %s closed the connection' % self.socket_path())
+            return out
+
+    def runcommand(self, command, with_handshake=True):
+        with self._lock:
+            reserve = with_handshake and self.handshake is not None
+            if reserve:
+                self.request(OPERATION_ACQUIRE)
+            try:
+                # Perform the handshake if set
+                if reserve:
+                    self.handshake.perform_handshake(self)
+                out = self.request(OPERATION_COMMAND, command)
+            finally:
+                if reserve:
+                    self.request(OPERATION_RELEASE)
+
+        if self.parser is not None:
+            return self.parser.parse(out)
+        else:
+            return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Share a serial port with other processes')
+    parser.add_argument('--port', required=True, help='serial port, e.g. /dev/ttyUSB0')
+    parser.add_argument('--socket', required=True, help='path of the Unix socket to listen on')
+    parser.add_argument('--baudrate', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from displaycontrol.connections import SerialConnection
+    connection = SerialConnection()
+    connection.port = args.port
+    if args.baudrate:
+        connection.baudrate = args.baudrate
+
+    broker = PortBroker(connection, args.socket)
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+import os
+import threading
+import time
+from displaycontrol.connections import GenericConnection, PendingReply, PreparedPipeline
+from displaycontrol.connections.framing import StreamDemultiplexer
+from displaycontrol.connections.parser import HexParser
+from displaycontrol.connections.tracing import monotonic
+from displaycontrol.tools import Tools
+
+
+class EmulatedConnection(GenericConnection):
+    """
+    Connection that answers like a chain of real displays without any hardware attached.
+
+    Every display id in display_ids answers on every port, all others stay silent just
+    like an unconnected id on a daisy chain. The state of each display is kept per port
+    and id, so setters change what the getters return afterwards. An optional latency
+    (in seconds) is added to every frame to mimic the time on the wire.
+    """
+    port = 'EMULATED'
+    handshake = None
+    parser = None
+    latency = 0
+    display_ids = [1]
+
+    def __init__(self, display_ids=None, latency=0):
+        GenericConnection.__init__(self)
+        if display_ids is not None:
+            self.display_ids = list(display_ids)
+        self.latency = latency
+        self.states = {}
+
+    def state_for(self, display_id):
+        """ Returns the (mutable) state of the display with the given id on the current port """
+        key = (self.port, display_id)
+        if key not in self.states:
+            self.states[key] = self.initial_state()
+        return self.states[key]
+
+    def initial_state(self):
+        return {}
+
+    def respond(self, command):
+        """ Returns the raw answer for the given raw command. Has to be overridden """
+        return ''
+
+    def runcommand(self, command, with_handshake=True):
+        # Like on a real line only one exchange at a time
+        with self.arbiter():
+            # Perform the handshake if set
+            if with_handshake:
+                if self.handshake is not None:
+                    self.handshake.perform_handshake(self)
+
+            if self.tracers:
+                self.trace('write', command)
+            out = self.respond(command)
+            if self.latency:
+                # An answer that takes longer than the deadline allows is missed
+                window = self.answer_window(self.latency)
+                time.sleep(window)
+                if window < self.latency:
+                    out = ''
+            if out and self.tracers:
+                self.trace('first_byte', out[:1])
+                self.trace('frame', out)
+
+        if self.parser is not None:
+            return self.parser.parse(out)
+        else:
+            return out
+
+    def runpipeline(self, commands, framer, with_handshake=True):
+        """ All displays answer at once, the answers arrive as one stream in small chunks """
+        if framer is None:
+            return GenericConnection.runpipeline(self, commands, framer, with_handshake)
+        pipeline = self.prepare_pipeline(commands, framer, with_handshake)
+        pipeline.write()
+        return pipeline.collect()
+
+    def prepare_pipeline(self, commands, framer, with_handshake=True):
+        if framer is None:
+            return GenericConnection.prepare_pipeline(self, commands, framer, with_handshake)
+        return EmulatedPipeline(self, commands, framer, with_handshake)
+
+    def sendcommand(self, command, with_handshake=True):
+        # Perform the handshake if set
+        if with_handshake:
+            if self.handshake is not None:
+                self.handshake.perform_handshake(self)
+
+        if self.tracers:
+            self.trace('write', command)
+        out = self.respond(command)
+        if out and self.tracers:
+            self.trace('first_byte', out[:1])
+            self.trace('frame', out)
+        if self.parser is not None:
+            out = self.parser.parse(out)
+
+        # The answer is available once the latency has passed since writing
+        written = time.time()
+        return PendingReply(collector=lambda: self.wait_until(written + self.latency, out))
+
+    def wait_until(self, due, out):
+        remaining = due - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+        return out
+
+    def open_transport(self):
+        return EmulatedTransport(self)
+
+
+class EmulatedPipeline(PreparedPipeline):
+    """ Holds the port from preparing until the answers are collected, the answers are
+    there once the latency passed after writing """
+
+    def __init__(self, connection, commands, framer, with_handshake=True):
+        PreparedPipeline.__init__(self, connection, commands, framer, with_handshake)
+        self.demultiplexer = StreamDemultiplexer(framer)
+        self.tickets = [self.demultiplexer.expect_request(command) for command in commands]
+        self.arbiter = connection.arbiter()
+        self.arbiter.acquire()
+        try:
+            # Perform the handshake if set
+            if with_handshake:
+                if connection.handshake is not None:
+                    connection.handshake.perform_handshake(connection)
+        except Exception:
+            self.arbiter.release()
+            raise
+        self.stream = ''
+        self.due = None
+
+    def write(self):
+        connection = self.connection
+        self.written = monotonic()
+        self.due = time.time() + connection.latency
+        if connection.tracers:
+            for command in self.commands:
+                connection.trace('write', command)
+        self.stream = ''.join(connection.respond(command) for command in self.commands)
+
+    def collect(self):
+        connection = self.connection
+        try:
+            if self.due is not None:
+                connection.wait_until(self.due, None)
+            if self.stream and connection.tracers:
+                connection.trace('first_byte', self.stream[:1])
+            for start in range(0, len(self.stream), 3):
+                self.demultiplexer.feed(self.stream[start:start + 3])
+        finally:
+            self.arbiter.release()
+
+        answers = [self.demultiplexer.answer(ticket) for ticket in self.tickets]
+        if connection.tracers:
+            for out in answers:
+                if out:
+                    connection.trace('frame', out)
+        if connection.parser is not None:
+            return [connection.parser.parse(out) for out in answers]
+        else:
+            return answers
+
+
+class EmulatedTransport(object):
+    """
+    A pipe carrying the answers of an emulated connection, so it can be served by the
+    EventLoop like a serial port. Answers arrive after the latency of the connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._read, self._write = os.pipe()
+
+    def fileno(self):
+        return self._read
+
+    def write(self, data):
+        out = self.connection.respond(data)
+        if not out:
+            return
+        if self.connection.latency:
+            timer = threading.Timer(self.connection.latency, os.write, (self._write, out))
+            timer.daemon = True
+            timer.start()
+        else:
+            os.write(self._write, out)
+
+    def read(self):
+        return os.read(self._read, 4096)
+
+    def close(self):
+        os.close(self._read)
+        os.close(self._write)
+
+
+class PhilipsEmulatedConnection(EmulatedConnection):
+    """
+    Emulates displays speaking the Philips SICP protocol. Set group_byte for SICP 1.86 and
+    later, where every frame carries the group byte after the monitor id.
+    """
+    parser = HexParser()
+    group_byte = False
+
+    # Command codes that store their payload and the command code that reads it back
+    setters = {
+        0x18: 0x19,  # Power state
+        0xAC: 0xAD,  # Input source
+        0x1D: 0x1D,  # Lock keys / IR remote before SICP 1.86
+        0x1B: 0x1B,  # Lock keys since SICP 1.86
+        0x1C: 0x1D,  # Lock IR remote since SICP 1.88
+        0xAE: 0xAF,  # Auto detect input
+        0xA5: 0xA6,  # Failover input setting
+        0x44: 0x45,  # Volume
+        0x32: 0x33,  # Video parameters
+    }
+
+    # Texts returned by commands that take a selector as first data byte
+    labels = {
+        (0xA2, 0): 'V1.88',
+        (0xA2, 1): 'EMULATED',
+        (0xA2, 2): 'FB01.00',
+    }
+
+    def __init__(self, display_ids=None, latency=0, group_byte=False):
+        EmulatedConnection.__init__(self, display_ids, latency)
+        self.group_byte = group_byte
+
+    def initial_state(self):
+        return {
+            0x19: [0x02],
+            0xAD: [0x01, 0x0A, 0x00, 0x00],
+            0x1D: [0x01],
+            0x1B: [0x01],
+            0xAF: [0x00],
+            0xA6: [0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07,
+                   0x08, 0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x0E],
+            0x45: [0x1E, 0x1E],
+            0x33: [0x32, 0x32, 0x32, 0x32, 0x32, 0x32, 0x00],
+            0x15: [ord(c) for c in 'EMU0000001'],
+            0x2F: [0x21, 0x23],
+            0x0F: [0x00, 0x2A],
+        }
+
+    def respond(self, command):
+        frame = [ord(c) for c in command]
+        header = 3 if self.group_byte else 2
+        if len(frame) < header + 2 or frame[0] != len(frame):
+            return ''
+        display_id = frame[1]
+        if display_id not in self.display_ids:
+            return ''
+
+        code = frame[header]
+        data = frame[header + 1:-1]
+        state = self.state_for(display_id)
+
+        if (code, data[0] if data else None) in self.labels:
+            payload = [code] + [ord(c) for c in self.labels[(code, data[0])]]
+        elif code in self.setters and (len(data) > 0 or code not in state):
+            state[self.setters[code]] = data
+            payload = [0x00, 0x06]
+        elif code in state:
+            payload = [code] + state[code]
+        else:
+            # Not available
+            payload = [0x00, 0x18]
+
+        reply = frame[1:header] + payload
+        reply = [len(reply) + 2] + reply
+        xor = 0x00
+        for item in reply:
+            xor = xor ^ item
+        reply.append(xor)
+        return Tools.list_to_bytes(reply)
+
+
+class SamsungEmulatedConnection(EmulatedConnection):
+    """
+    Emulates displays speaking the Samsung MDC protocol.
+    """
+    parser = HexParser()
+
+    def initial_state(self):
+        return {
+            0x11: [0x01],
+            0x14: [0x21],
+            0x12: [0x1E],
+            0x24: [0x32],
+            0x25: [0x32],
+            0x26: [0x32],
+            0x27: [0x32],
+            0x8A: [ord(c) for c in 'EMU0000001'],
+        }
+
+    def respond(self, command):
+        frame = [ord(c) for c in command]
+        if len(frame) < 5 or frame[0] != 0xAA or frame[3] != len(frame) - 5:
+            return ''
+        code = frame[1]
+        display_id = frame[2]
+        if display_id not in self.display_ids:
+            return ''
+
+        data = frame[4:-1]
+        state = self.state_for(display_id)
+        if code not in state:
+            # Negative acknowledge
+            values = [ord('N'), code, 0x00]
+        else:
+            if len(data) > 0:
+                state[code] = data
+            values = [ord('A'), code] + state[code]
+
+        reply = [0xAA, 0xFF, display_id, len(values)] + values
+        reply.append(sum(reply[1:]) & 0xFF)
+        return Tools.list_to_bytes(reply)
+
+
+class BenQEmulatedConnection(EmulatedConnection):
+    """
+    Emulates BenQ projectors speaking the ASCII protocol (*key=value#).
+    """
+
+    def initial_state(self):
+        return {
+            'pow': 'ON',
+            'sour': 'hdmi',
+            'modelname': 'LU9235',
+            'ltim': '1234',
+            'freeze': 'OFF',
+            'blank': 'OFF',
+        }
+
+    def respond(self, command):
+        if command == '\r':
+            return '>'
+
+        echo = command.strip()
+        if echo[:1] != '*' or echo[-1:] != '#' or '=' not in echo:
+            return echo + '\r\n*Illegal format#\r\n'
+
+        key, value = echo[1:-1].split('=', 1)
+        state = self.state_for(1)
+        if key not in state:
+            return echo + '\r\n*Block item#\r\n'
+        if value != '?':
+            state[key] = value.upper() if key != 'sour' else value
+        return echo + '\r\n*' + key.upper() + '=' + state[key] + '#\r\n'
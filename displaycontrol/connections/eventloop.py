@@ -0,0 +1,461 @@
+"""
+Single threaded I/O loop over many ports.
+
+Instead of one thread per port sleeping for the answer window, the EventLoop opens all
+ports non-blocking and waits for all of them at once (epoll, poll or select, whatever the
+platform has). Every port has a PortChannel, a small state machine that writes the next
+request once the previous one got its answer. Answers of the binary protocols are
+complete as soon as the framer (see displaycontrol.connections.framing) found the
+matching frame, all other answers once no byte arrived for idle_window seconds. Timeouts
+are kept in a timer heap, so one thread serves the command rate of all ports:
+
+    loop = EventLoop()
+    requests = [loop.submit(connection, command, framer) for connection, command in work]
+    loop.run_until_complete(requests)
+    answers = [request.result() for request in requests]
+
+Like every other exchange, a request holds the PortArbiter of its port (see
+displaycontrol.connections.arbiter) from writing until its answer is complete. The loop
+never waits for an arbiter: a port held by another thread is tried again a few
+milliseconds later, while the loop serves the other ports. Between requests the port is
+not read, so answers for other threads are left alone.
+
+Fleet.run(..., event_loop=loop) uses the loop for every command of every display.
+The loop can also run in a background thread with start(), submit() may then be called
+from any thread. Errors of a port or of a callback only fail the request concerned. If
+the loop itself dies, all requests it did not answer yet (and all submitted later) get
+an empty answer, so nobody waits for them forever.
+"""
+import errno
+import fcntl
+import heapq
+import itertools
+import os
+import select
+import threading
+from collections import deque
+
+from displaycontrol.connections.framing import StreamDemultiplexer
+from displaycontrol.connections.tracing import monotonic
+
+
+class Poller(object):
+    """ Waits for readable file descriptors with epoll, poll or select """
+
+    def __init__(self):
+        if hasattr(select, 'epoll'):
+            self._epoll = select.epoll()
+            self._poll = None
+        elif hasattr(select, 'poll'):
+            self._epoll = None
+            self._poll = select.poll()
+        else:
+            self._epoll = self._poll = None
+        self._fds = set()
+
+    def register(self, fd):
+        self._fds.add(fd)
+        if self._epoll is not None:
+            self._epoll.register(fd, select.EPOLLIN)
+        elif self._poll is not None:
+            self._poll.register(fd, select.POLLIN)
+
+    def unregister(self, fd):
+        self._fds.discard(fd)
+        if self._epoll is not None:
+            self._epoll.unregister(fd)
+        elif self._poll is not None:
+            self._poll.unregister(fd)
+
+    def poll(self, timeout):
+        """ Returns the readable file descriptors, waits at most timeout seconds (None: forever) """
+        try:
+            if self._epoll is not None:
+                return [fd for fd, event in self._epoll.poll(-1 if timeout is None else timeout)]
+            if self._poll is not None:
+                return [fd for fd, event in self._poll.poll(None if timeout is None else timeout * 1000.0)]
+            return select.select(list(self._fds), [], [], timeout)[0]
+        except (IOError, OSError, select.error), err:
+            if err.args[0] == errno.EINTR:
+                return []
+            raise
+
+    def close(self):
+        if self._epoll is not None:
+            self._epoll.close()
+
+
+class SerialTransport(object):
+    """ A serial port opened non-blocking with the settings of a SerialConnection """
+
+    def __init__(self, connection):
+        import serial
+        self.serial = serial.Serial(port=connection.port,
+                                    baudrate=connection.baudrate,
+                                    timeout=0,
+                                    bytesize=connection.bytesize,
+                                    parity=connection.parity,
+                                    stopbits=connection.stopbits)
+
+    def fileno(self):
+        return self.serial.fileno()
+
+    def write(self, data):
+        self.serial.write(data)
+
+    def read(self):
+        return self.serial.read(max(1, self.serial.inWaiting()))
+
+    def close(self):
+        self.serial.close()
+
+
+class LoopRequest(object):
+    """ A command waiting for its answer, result() blocks until the loop got it. An
+    exception of the callback is kept in callback_error instead of reaching the loop. """
+
+    def __init__(self, command, framer=None, timeout=1.0, callback=None):
+        self.command = command
+        self.framer = framer
+        self.timeout = timeout
+        self.callback = callback
+        self.answer = None
+        self.written = None
+        self.seconds = None
+        self.callback_error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def set_answer(self, answer):
+        if self.done():
+            return
+        self.answer = answer
+        self.seconds = monotonic() - self.written if self.written is not None else None
+        self._done.set()
+        if self.callback is not None:
+            try:
+                self.callback(self)
+            except Exception, err:
+                self.callback_error = err
+
+    def result(self, timeout=None):
+        """ The raw answer, an empty string if the display did not answer """
+        self._done.wait(timeout)
+        return self.answer
+
+
+class PortChannel(object):
+    """
+    State machine of a port: IDLE until a request is queued, RESERVING while another
+    thread holds the arbiter of the port, WAITING while its answer is read. Requests are
+    served in the order they were submitted.
+    """
+    IDLE = 'idle'
+    RESERVING = 'reserving'
+    WAITING = 'waiting'
+
+    # Seconds until the arbiter of a port held by another thread is tried again
+    retry_interval = 0.005
+
+    def __init__(self, loop, connection, transport, idle_window=0.05):
+        self.loop = loop
+        self.connection = connection
+        self.transport = transport
+        self.idle_window = idle_window
+        self.arbiter = connection.arbiter()
+        self.state = self.IDLE
+        self.queue = deque()
+        self.current = None
+        self._received = ''
+        self._demultiplexer = None
+        self._ticket = None
+        self._timer = None
+        self._idle_timer = None
+
+    def enqueue(self, request):
+        self.queue.append(request)
+        if self.state == self.IDLE:
+            self.send_next()
+
+    def send_next(self):
+        if not self.queue:
+            self.state = self.IDLE
+            return
+        if not self.arbiter.try_acquire(self):
+            self.state = self.RESERVING
+            self.loop.call_later(self.retry_interval, self.send_next)
+            return
+        self.discard_stale()
+        self.loop.poller.register(self.transport.fileno())
+        request = self.current = self.queue.popleft()
+        self.state = self.WAITING
+        self._received = ''
+        self._demultiplexer = None
+        if request.framer is not None:
+            request.framer.reset()
+            self._demultiplexer = StreamDemultiplexer(request.framer)
+            self._ticket = self._demultiplexer.expect_request(request.command)
+        try:
+            self.transport.write(request.command)
+        except (IOError, OSError), err:
+            self.trace('error', str(err))
+            self.finish('')
+            return
+        request.written = monotonic()
+        self.trace('write', request.command)
+        self._timer = self.loop.call_later(request.timeout, self.on_timeout)
+
+    def on_readable(self):
+        try:
+            data = self.transport.read()
+        except (IOError, OSError), err:
+            self.trace('error', str(err))
+            return
+        if not data or self.state != self.WAITING:
+            # Nobody asked, e.g. the late answer of a request that timed out
+            return
+        if not self._received:
+            self.trace('first_byte', data[:1])
+        self._received += data
+        if self._demultiplexer is not None:
+            if self._demultiplexer.feed(data):
+                self.finish(self._demultiplexer.answer(self._ticket))
+            return
+        # Without a framer the answer is complete once the line stays quiet
+        self.loop.cancel(self._idle_timer)
+        self._idle_timer = self.loop.call_later(self.idle_window, self.on_idle)
+
+    def on_idle(self):
+        self._idle_timer = None
+        self.finish(self._received)
+
+    def on_error(self, err):
+        """ Ends the current request without answer, e.g. after a framer failed """
+        self.trace('error', '%s: %s' % (type(err).__name__, err))
+        if self.state == self.WAITING:
+            self.finish('')
+
+    def on_timeout(self):
+        self._timer = None
+        self.finish('' if self._demultiplexer is not None else self._received)
+
+    def finish(self, answer):
+        self.loop.cancel(self._timer)
+        self.loop.cancel(self._idle_timer)
+        self._timer = self._idle_timer = None
+        request, self.current = self.current, None
+        if answer:
+            self.trace('frame', answer)
+        self.state = self.IDLE
+        self.loop.poller.unregister(self.transport.fileno())
+        self.arbiter.release(self)
+        request.set_answer(answer)
+        self.send_next()
+
+    def discard_stale(self):
+        """ Drops what arrived while the port was not read, e.g. the late answer of a
+        request that timed out """
+        fd = self.transport.fileno()
+        while select.select([fd], [], [], 0)[0]:
+            try:
+                if not self.transport.read():
+                    break
+            except (IOError, OSError):
+                break
+
+    def trace(self, event, data):
+        if self.connection.tracers:
+            self.connection.trace(event, data)
+
+    def fail(self):
+        """ Gives up the current and all queued requests, they get an empty answer """
+        self.loop.cancel(self._timer)
+        self.loop.cancel(self._idle_timer)
+        self._timer = self._idle_timer = None
+        if self.state == self.WAITING:
+            self.loop.poller.unregister(self.transport.fileno())
+            self.arbiter.release(self)
+        requests = [self.current] + list(self.queue)
+        self.current = None
+        self.queue.clear()
+        self.state = self.IDLE
+        for request in requests:
+            if request is not None:
+                request.set_answer('')
+
+    def close(self):
+        self.fail()
+        self.transport.close()
+
+
+class EventLoop(object):
+    """
+    Serves the PortChannels of any number of ports in a single thread.
+    """
+    # Seconds without a new byte that end an answer without framer
+    idle_window = 0.05
+
+    def __init__(self):
+        self.poller = Poller()
+        self.channels = {}
+        self._fds = {}
+        self._timers = []
+        self._tickets = itertools.count()
+        self._incoming = deque()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        for fd in (self._wakeup_read, self._wakeup_write):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.poller.register(self._wakeup_read)
+        self._thread = None
+        self._stopped = False
+        self._dead = False
+
+    def channel(self, connection):
+        """ The channel of the port of the connection, the port is opened on first use
+        with the transport of the connection (see SerialConnection.open_transport) """
+        port = connection.port
+        if port not in self.channels:
+            transport = connection.open_transport()
+            channel = PortChannel(self, connection, transport, self.idle_window)
+            self.channels[port] = channel
+            self._fds[transport.fileno()] = channel
+        return self.channels[port]
+
+    def submit(self, connection, command, framer=None, timeout=None, callback=None):
+        """ Queues a raw command for the port of the connection. The timeout defaults to
+        the answer window of the connection. Returns a LoopRequest. """
+        if timeout is None:
+            timeout = connection.answer_window(getattr(connection, 'sleep', 1))
+        request = LoopRequest(command, framer, timeout, callback)
+        self._incoming.append((connection, request))
+        if self._dead:
+            self.fail_incoming()
+        else:
+            self.wakeup()
+        return request
+
+    def wakeup(self):
+        """ Ends the current wait of the loop """
+        try:
+            os.write(self._wakeup_write, 'x')
+        except OSError, err:
+            # A full pipe wakes the loop up as well
+            if err.errno != errno.EAGAIN:
+                raise
+
+    def call_later(self, seconds, callback):
+        """ Calls callback from the loop after the given seconds, returns the timer """
+        timer = [monotonic() + seconds, next(self._tickets), callback]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer is not None:
+            timer[2] = None
+
+    def run_once(self, timeout=None):
+        """ Waits for readable ports or the next timer (at most timeout seconds) and
+        handles whatever happened """
+        while self._incoming:
+            connection, request = self._incoming.popleft()
+            try:
+                channel = self.channel(connection)
+            except Exception, err:
+                if connection.tracers:
+                    connection.trace('error', str(err))
+                request.set_answer('')
+                continue
+            channel.enqueue(request)
+
+        while self._timers and self._timers[0][2] is None:
+            heapq.heappop(self._timers)
+        if self._timers:
+            wait = max(0.0, self._timers[0][0] - monotonic())
+            timeout = wait if timeout is None else min(timeout, wait)
+
+        for fd in self.poller.poll(timeout):
+            if fd == self._wakeup_read:
+                try:
+                    os.read(self._wakeup_read, 4096)
+                except OSError:
+                    pass
+            elif fd in self._fds:
+                channel = self._fds[fd]
+                try:
+                    channel.on_readable()
+                except Exception, err:
+                    channel.on_error(err)
+
+        now = monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            due, ticket, callback = heapq.heappop(self._timers)
+            if callback is not None:
+                callback()
+
+    def run_until_complete(self, requests):
+        """ Runs the loop in the current thread until all requests are answered """
+        self._dead = False
+        try:
+            while not all(request.done() for request in requests):
+                self.run_once()
+        except BaseException:
+            self.die()
+            raise
+
+    def run_forever(self):
+        self._dead = False
+        try:
+            while not self._stopped:
+                self.run_once()
+        except BaseException:
+            self.die()
+            raise
+
+    def die(self):
+        """ Answers every request of the loop with an empty answer, after an error
+        stopped the loop. Requests submitted afterwards fail at once, until the loop
+        runs again. """
+        self._dead = True
+        for channel in self.channels.values():
+            channel.fail()
+        self.fail_incoming()
+
+    def fail_incoming(self):
+        while self._incoming:
+            try:
+                connection, request = self._incoming.popleft()
+            except IndexError:
+                break
+            request.set_answer('')
+
+    def start(self):
+        """ Runs the loop in a background thread """
+        self._stopped = False
+        self._thread = threading.Thread(target=self.run_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self.wakeup()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for channel in self._fds.values():
+            channel.close()
+        self._fds = {}
+        self.channels = {}
+        self.poller.close()
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,238 @@
+"""
+Incremental frame parsing for the binary protocols.
+
+A framer consumes the raw byte stream of a port in arbitrary chunks and returns the
+complete frames it contains. Bytes that do not start a valid frame (noise on the
+line, a frame with a wrong checksum, the rest of a frame that was cut off) are skipped
+until the next valid frame starts. decode() does the same for a complete answer in a
+single pass.
+
+The StreamDemultiplexer hands every frame to the request waiting for it, matched by
+display id and command code. That way several requests to the displays of a daisy chain
+can be written at once and their answers are picked from the stream as they arrive.
+"""
+import itertools
+from collections import deque, namedtuple
+
+# A complete frame: display id, command code, the frame as list of byte values and the raw bytes
+Frame = namedtuple('Frame', ['display_id', 'command', 'values', 'raw'])
+
+# Command code of the Philips ACK / NACK / NAV reports
+REPORT = 0x00
+
+
+class GenericFramer(object):
+    """
+    Base class of the framers, collects the bytes fed in and cuts frames off the front.
+    """
+    # Frames are never shorter / longer than this (in bytes)
+    minimum_length = 1
+    maximum_length = 255
+
+    def __init__(self, checksum=None):
+        self._buffer = []
+        self.skipped = 0
+        if checksum is not None:
+            self.checksum = checksum
+
+    def reset(self):
+        self._buffer = []
+
+    def feed(self, data):
+        """ Consumes the raw bytes and returns a list of the frames completed by them """
+        self._buffer.extend(ord(c) for c in data)
+        frames = []
+        while self._buffer:
+            length = self.frame_length(self._buffer)
+            if length is None:
+                # Need more bytes to tell
+                break
+            if length < self.minimum_length or length > self.maximum_length or not self.starts_frame(self._buffer):
+                self.skip()
+                continue
+            if len(self._buffer) < length:
+                # A damaged length byte must not hold back a valid frame behind it
+                if self.complete_frame_after_start():
+                    self.skip()
+                    continue
+                break
+            values = self._buffer[:length]
+            if not self.is_valid(values):
+                self.skip()
+                continue
+            del self._buffer[:length]
+            frames.append(self.frame(values))
+        return frames
+
+    def complete_frame_after_start(self):
+        """ True if a complete and valid frame starts somewhere after the first byte """
+        for offset in range(1, len(self._buffer)):
+            values = self._buffer[offset:]
+            length = self.frame_length(values)
+            if length is None or length < self.minimum_length or length > len(values):
+                continue
+            if self.starts_frame(values) and self.is_valid(values[:length]):
+                return True
+        return False
+
+    def skip(self):
+        """ Drops the first byte to resynchronize on the next one """
+        del self._buffer[0]
+        self.skipped += 1
+
+    def frame(self, values):
+        display_id, command = self.reply_key(values)
+        return Frame(display_id, command, values, ''.join(chr(value) for value in values))
+
+    def decode(self, data):
+        """ Returns the valid frames of a complete answer (a string or bytearray) in one
+        pass. Bytes that do not start a valid frame are skipped and counted, a frame cut
+        off at the end is dropped as well, no more bytes will follow. """
+        values = bytearray(data)
+        end = len(values)
+        frames = []
+        position = 0
+        while position < end:
+            length = self.frame_length(values, position)
+            if length is not None and self.minimum_length <= length <= min(self.maximum_length, end - position) \
+                    and self.starts_frame(values, position):
+                frame = values[position:position + length]
+                if self.is_valid(frame):
+                    frames.append(self.frame(list(frame)))
+                    position += length
+                    continue
+            position += 1
+            self.skipped += 1
+        return frames
+
+    def starts_frame(self, values, offset=0):
+        return True
+
+    def frame_length(self, values, offset=0):
+        """ Total length of the frame starting at values[offset], None if not known yet """
+        raise NotImplementedError()
+
+    def is_valid(self, values):
+        """ Checks the checksum of a complete frame """
+        return self.checksum(values[:-1]) & 0xFF == values[-1]
+
+    def checksum(self, values):
+        raise NotImplementedError()
+
+    def reply_key(self, values):
+        """ (display id, command code) of an answer frame """
+        raise NotImplementedError()
+
+    def request_key(self, command):
+        """ (display id, command code) of a raw request frame, the answer carries the same """
+        raise NotImplementedError()
+
+    def matches(self, key, frame):
+        return key == (frame.display_id, frame.command)
+
+
+class PhilipsFramer(GenericFramer):
+    """
+    SICP frames: message size, monitor id, (group since SICP 1.86), data, xor checksum.
+    The first data byte of an answer is the command code, or 0x00 for an ACK / NACK / NAV
+    report which answers whatever command the display got.
+    """
+    minimum_length = 4
+    maximum_length = 40
+
+    def __init__(self, group_byte=False, checksum=None):
+        GenericFramer.__init__(self, checksum)
+        self.header_length = 3 if group_byte else 2
+        self.minimum_length = self.header_length + 2
+
+    def frame_length(self, values, offset=0):
+        return values[offset]
+
+    def checksum(self, values):
+        xor = 0x00
+        for value in values:
+            xor = xor ^ value
+        return xor
+
+    def reply_key(self, values):
+        return values[1], values[self.header_length]
+
+    def request_key(self, command):
+        values = [ord(c) for c in command]
+        return values[1], values[self.header_length]
+
+    def matches(self, key, frame):
+        return frame.display_id == key[0] and frame.command in (key[1], REPORT)
+
+
+class SamsungFramer(GenericFramer):
+    """
+    MDC answers: header 0xAA, 0xFF, display id, data length, 'A' or 'N', command code,
+    values, checksum (sum of all bytes but the header, lowest byte).
+    """
+    minimum_length = 7
+
+    def starts_frame(self, values, offset=0):
+        return values[offset] == 0xAA
+
+    def frame_length(self, values, offset=0):
+        if values[offset] != 0xAA:
+            return 0
+        if len(values) - offset < 4:
+            return None
+        return values[offset + 3] + 5
+
+    def checksum(self, values):
+        return sum(values[1:])
+
+    def reply_key(self, values):
+        return values[2], values[5]
+
+    def request_key(self, command):
+        return ord(command[2]), ord(command[1])
+
+
+class StreamDemultiplexer(object):
+    """
+    Routes the frames of a byte stream to the requests waiting for them. Every request
+    gets the first matching frame after it was registered with expect(), requests
+    waiting for the same key are served in order. Frames nobody waits for are counted
+    and dropped.
+    """
+
+    def __init__(self, framer):
+        self.framer = framer
+        self._waiting = deque()
+        self._tickets = itertools.count()
+        self.answers = {}
+        self.unclaimed = 0
+
+    def expect(self, key):
+        """ Registers a request for the given (display id, command code), returns a ticket """
+        ticket = next(self._tickets)
+        self._waiting.append((ticket, key))
+        return ticket
+
+    def expect_request(self, command):
+        return self.expect(self.framer.request_key(command))
+
+    def feed(self, data):
+        """ Consumes raw bytes, returns the number of requests answered by them """
+        answered = 0
+        for frame in self.framer.feed(data):
+            for index, (ticket, key) in enumerate(self._waiting):
+                if self.framer.matches(key, frame):
+                    del self._waiting[index]
+                    self.answers[ticket] = frame.raw
+                    answered += 1
+                    break
+            else:
+                self.unclaimed += 1
+        return answered
+
+    def is_complete(self):
+        return len(self._waiting) == 0
+
+    def answer(self, ticket):
+        """ The raw answer of a request, an empty string if there was none """
+        return self.answers.get(ticket, '')
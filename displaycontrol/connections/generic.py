@@ -1,10 +1,158 @@
 from displaycontrol.exceptions import *
+from displaycontrol.connections.tracing import monotonic
+
+
+class PendingReply(object):
+    """
+    Handle for a command that was written without waiting for the answer.
+
+    collect() returns the answer, waiting for the rest of the answer window if it is not
+    there yet. The handle can be used like the answer itself (len(), indexing, ...), which
+    collects it on first access. Controllers set the parser of their protocol and the
+    checker, so acknowledged() tells whether the display answered with an ACK.
+    """
+    ACK = 'ack'
+    NAK = 'nak'
+    MISSING = 'missing'
+
+    def __init__(self, collector=None, result=None):
+        self._collector = collector
+        self._result = result
+        self.parser = None
+        self.checker = None
+
+    def is_collected(self):
+        return self._collector is None
+
+    def collect(self):
+        if self._collector is not None:
+            collector = self._collector
+            self._collector = None
+            self._result = collector()
+        if self.parser is not None:
+            self._result = self.parser(self._result)
+            self.parser = None
+        return self._result
+
+    def status(self):
+        """ Returns ACK, NAK or MISSING (no answer at all) """
+        data = self.collect()
+        if not data:
+            return self.MISSING
+        if self.checker is None:
+            return self.ACK
+        try:
+            return self.ACK if self.checker(data) else self.NAK
+        except Exception:
+            return self.NAK
+
+    def acknowledged(self):
+        return self.status() == self.ACK
+
+    def __len__(self):
+        return len(self.collect())
+
+    def __getitem__(self, key):
+        return self.collect()[key]
+
+    def __delitem__(self, key):
+        del self.collect()[key]
+
+    def __iter__(self):
+        return iter(self.collect())
+
+    def __eq__(self, other):
+        return self.collect() == other
+
+    def __ne__(self, other):
+        return self.collect() != other
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.collect(), name)
+
+
+class PreparedPipeline(object):
+    """
+    Commands for the displays of a port, prepared to be written at once: write() sends
+    them (and records when in written, a monotonic timestamp), collect() returns their
+    answers in the same order. Connections that can hold the port open in between do all
+    the slow work (reserving and opening the port, handshake) before write(), so writes
+    on many ports follow each other closely. This one simply runs the pipeline on write().
+    """
+
+    def __init__(self, connection, commands, framer, with_handshake=True):
+        self.connection = connection
+        self.commands = commands
+        self.framer = framer
+        self.with_handshake = with_handshake
+        self.written = None
+        self._answers = None
+
+    def write(self):
+        self.written = monotonic()
+        self._answers = self.connection.runpipeline(self.commands, self.framer, self.with_handshake)
+
+    def collect(self):
+        return self._answers
 
 
 class GenericConnection:
+    # Tracers get every event on the wire (see displaycontrol.connections.tracing)
+    tracers = ()
 
     def __init__(self):
         pass
 
+    def add_tracer(self, tracer):
+        self.tracers = self.tracers + (tracer,)
+
+    def remove_tracer(self, tracer):
+        self.tracers = tuple(existing for existing in self.tracers if existing is not tracer)
+
+    def trace(self, event, data=''):
+        """ Hands an event to the tracers. Callers check self.tracers first, so there is
+        no cost without tracers. """
+        timestamp = monotonic()
+        for tracer in self.tracers:
+            tracer.trace(self, event, timestamp, data)
+
+    def answer_window(self, seconds):
+        """ Seconds to wait for an answer, shortened to what is left of the deadline of
+        the current thread (see displaycontrol.connections.arbiter.scheduling) """
+        from displaycontrol.connections.arbiter import current_deadline
+        deadline = current_deadline()
+        if deadline is None:
+            return seconds
+        return min(seconds, deadline.remaining())
+
+    def arbiter(self):
+        """ The arbiter of the current port, hold it for every exchange on the wire """
+        from displaycontrol.connections.arbiter import arbiter_for
+        return arbiter_for(getattr(self, 'port', None))
+
     def runcommand(self, command, with_handshake=True):
         raise CommandNotImplementedError()
+
+    def open_transport(self):
+        """ Opens the port non-blocking for the EventLoop (see
+        displaycontrol.connections.eventloop), an object with fileno, write, read and close """
+        raise CommandNotImplementedError()
+
+    def sendcommand(self, command, with_handshake=True):
+        """ Write the command and return a PendingReply instead of waiting for the answer.
+        Connections that can not split writing and reading simply run the command. """
+        return PendingReply(result=self.runcommand(command, with_handshake))
+
+    def prepare_pipeline(self, commands, framer, with_handshake=True):
+        """ Returns a PreparedPipeline for the commands, the port stays reserved until its
+        answers are collected """
+        return PreparedPipeline(self, commands, framer, with_handshake)
+
+    def runpipeline(self, commands, framer, with_handshake=True):
+        """ Runs several commands and returns their answers in the same order. Connections
+        that read a byte stream write all commands at once and use the framer (see
+        displaycontrol.connections.framing) to pick the answers, all others run one
+        command after the other. """
+        return [self.runcommand(command, with_handshake) for command in commands]
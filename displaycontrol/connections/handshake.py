@@ -14,16 +14,30 @@ class GenericHandshake:
 class WaitHandshake(GenericHandshake):
     """
     Perform a handshake by simply waiting a given amount of seconds (int).
+
+    With a ready_check (called with the connection, returns True once the other side
+    accepts commands) the handshake polls in short, growing intervals instead and ends
+    as soon as the check succeeds, waiting at most the given seconds.
     """
     seconds = 1
+    ready_check = None
 
-    def __init__(self, seconds=1):
+    def __init__(self, seconds=1, ready_check=None):
         GenericHandshake.__init__(self)
         self.seconds = seconds
+        self.ready_check = ready_check
 
     def perform_handshake(self, connection):
-        from time import sleep
-        sleep(self.seconds)
+        # Never wait longer than the deadline of the current command allows
+        seconds = self.seconds
+        if hasattr(connection, 'answer_window'):
+            seconds = connection.answer_window(seconds)
+        if self.ready_check is None:
+            from time import sleep
+            sleep(seconds)
+        else:
+            from displaycontrol.deadline import poll_until
+            poll_until(lambda: self.ready_check(connection), seconds)
 
 
 class SendAndReceiveHandshake(GenericHandshake):
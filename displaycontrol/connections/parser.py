@@ -1,3 +1,4 @@
+from displaycontrol.exceptions import CommandResponseMalformedError
 
 
 class GenericParser:
@@ -9,3 +10,40 @@ class GenericParser:
 
     def parse(self, data):
         return data
+
+
+class HexParser(GenericParser):
+    """
+    Turns the raw answer into a list of two digit hex strings (e.g. ['05', '01', '00', '06', '02']),
+    which is the format the binary protocols (Philips SICP, Samsung MDC) work on.
+    """
+    def __init__(self):
+        GenericParser.__init__(self)
+
+    def parse(self, data):
+        if data is None:
+            return list()
+        return ['%02X' % ord(c) for c in data]
+
+
+class FrameParser(HexParser):
+    """
+    Checks length and checksum of the answer with the framer of the protocol (see
+    displaycontrol.connections.framing) before turning it into a hex list. Noise around
+    the frame and corrupt frames are dropped, the first valid frame is the answer. Raises
+    a CommandResponseMalformedError if bytes arrived, but not a single valid frame. The
+    answer may be a hex list already, e.g. of a connection with a HexParser.
+    """
+    def __init__(self, framer):
+        HexParser.__init__(self)
+        self.framer = framer
+
+    def parse(self, data):
+        if not data:
+            return list()
+        if isinstance(data, list):
+            data = bytearray(int(value, 16) for value in data)
+        frames = self.framer.decode(data)
+        if not frames:
+            raise CommandResponseMalformedError('No valid frame in the answer %r' % data)
+        return ['%02X' % value for value in frames[0].values]
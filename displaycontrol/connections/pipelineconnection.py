@@ -0,0 +1,54 @@
+from collections import deque
+from displaycontrol.connections import GenericConnection
+
+
+class FrameCaptured(BaseException):
+    """ Ends the capture pass of a method. No Exception, so the method does not handle
+    it like a display that did not answer (e.g. by polling again) """
+
+
+class CaptureConnection(GenericConnection):
+    """
+    Keeps the first command frame a controller tries to run instead of running it, so
+    the frames of several controllers can be written at once with runpipeline. Answers
+    given in advance are handed out to the first frames in order, the frame after them
+    is kept.
+    """
+    port = None
+    handshake = None
+    parser = None
+
+    def __init__(self, answers=()):
+        GenericConnection.__init__(self)
+        self.frames = []
+        self._answers = deque(answers)
+
+    def runcommand(self, command, with_handshake=True):
+        if self._answers:
+            answer = self._answers.popleft()
+            # get_answer_data cuts parsed answers in place, the caller may hand them out again
+            return answer[:] if isinstance(answer, list) else answer
+        self.frames.append(command)
+        raise FrameCaptured()
+
+
+class PrefetchConnection(GenericConnection):
+    """
+    Hands out answers that were fetched in advance (e.g. with runpipeline), every other
+    command runs on the wrapped connection.
+    """
+    handshake = None
+    parser = None
+
+    def __init__(self, connection, answers):
+        GenericConnection.__init__(self)
+        self.connection = connection
+        self.port = getattr(connection, 'port', None)
+        self._answers = {}
+        for command, answer in answers:
+            self._answers.setdefault(command, deque()).append(answer)
+
+    def runcommand(self, command, with_handshake=True):
+        if self._answers.get(command):
+            return self._answers[command].popleft()
+        return self.connection.runcommand(command, with_handshake)
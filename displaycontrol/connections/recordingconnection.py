@@ -0,0 +1,89 @@
+import struct
+import time
+from displaycontrol.connections import GenericConnection
+from displaycontrol.tools import Tools
+
+# Every recording starts with the magic and a format version
+RECORDING_MAGIC = 'DCREC'
+RECORDING_VERSION = 1
+
+# Offset since start of recording, duration (both seconds), request length, response length
+RECORD_HEADER = struct.Struct('<ddII')
+
+
+def read_recording(filename):
+    """ Returns the records of a recording as list of (offset, duration, request, response) tuples """
+    records = []
+    with open(filename, 'rb') as handle:
+        if handle.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise IOError('%s is not a displaycontrol recording' % filename)
+        version = struct.unpack('<B', handle.read(1))[0]
+        if version != RECORDING_VERSION:
+            raise IOError('Recording format version %d is not supported' % version)
+        while True:
+            header = handle.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            offset, duration, request_length, response_length = RECORD_HEADER.unpack(header)
+            request = handle.read(request_length)
+            response = handle.read(response_length)
+            records.append((offset, duration, request, response))
+    return records
+
+
+class RecordingConnection(GenericConnection):
+    """
+    Wraps any connection and records every request frame, the raw response and the time
+    it took to a compact binary file, so the session can be replayed later with the
+    ReplayConnection.
+
+    The wrapped connection should not have a parser, since the raw bytes are recorded.
+    Parser and handshake are set on the recording connection instead (the vendor classes
+    do that on their own when the connection is handed over).
+    """
+    port = None
+    handshake = None
+    parser = None
+
+    def __init__(self, connection, filename):
+        GenericConnection.__init__(self)
+        self.connection = connection
+        self.filename = filename
+        self._started = time.time()
+        self._file = open(filename, 'wb')
+        self._file.write(RECORDING_MAGIC + struct.pack('<B', RECORDING_VERSION))
+
+    def runcommand(self, command, with_handshake=True):
+        # Perform the handshake if set
+        if with_handshake:
+            if self.handshake is not None:
+                self.handshake.perform_handshake(self)
+
+        # Forward a changed port (e.g. by the detectors) to the wrapped connection
+        if self.port is not None:
+            self.connection.port = self.port
+
+        begin = time.time()
+        out = self.connection.runcommand(command, with_handshake=False)
+        duration = time.time() - begin
+
+        # A wrapped connection with parser delivers hex lists, record them as bytes anyway
+        if out is None:
+            out = ''
+        elif isinstance(out, list):
+            out = Tools.ascii_hex_list_to_string(out)
+        self.record(command, out, begin - self._started, duration)
+
+        if self.parser is not None:
+            return self.parser.parse(out)
+        else:
+            return out
+
+    def record(self, command, response, offset, duration):
+        self._file.write(RECORD_HEADER.pack(offset, duration, len(command), len(response)))
+        self._file.write(command)
+        self._file.write(response)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,54 @@
+import time
+from collections import deque
+from displaycontrol.connections import GenericConnection
+from displaycontrol.connections.recordingconnection import read_recording
+
+
+class ReplayConnection(GenericConnection):
+    """
+    Serves the responses of a recording made with the RecordingConnection.
+
+    Responses are looked up by the request frame and handed out in recorded order, so
+    the replay still works if the code sends the same frames in a different order. A
+    frame that was never recorded gets no answer, just like a display that does not
+    respond. With realtime enabled every response takes as long as it did when recorded,
+    otherwise the responses are served as fast as possible. With loop enabled the
+    responses of a request start over once all of them have been served.
+    """
+    port = None
+    handshake = None
+    parser = None
+
+    def __init__(self, filename, realtime=False, loop=False):
+        GenericConnection.__init__(self)
+        self.filename = filename
+        self.realtime = realtime
+        self.loop = loop
+        self.records = read_recording(filename)
+        self.rewind()
+
+    def rewind(self):
+        """ Start serving the recorded responses from the beginning """
+        self._responses = {}
+        for offset, duration, request, response in self.records:
+            self._responses.setdefault(request, deque()).append((duration, response))
+
+    def runcommand(self, command, with_handshake=True):
+        # Perform the handshake if set
+        if with_handshake:
+            if self.handshake is not None:
+                self.handshake.perform_handshake(self)
+
+        out = ''
+        responses = self._responses.get(command)
+        if responses:
+            duration, out = responses.popleft()
+            if self.loop:
+                responses.append((duration, out))
+            if self.realtime:
+                time.sleep(duration)
+
+        if self.parser is not None:
+            return self.parser.parse(out)
+        else:
+            return out
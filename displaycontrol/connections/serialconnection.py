@@ -1,6 +1,9 @@
 import serial
+import threading
 import time
-from displaycontrol.connections import GenericConnection
+from displaycontrol.connections import GenericConnection, PendingReply, PreparedPipeline
+from displaycontrol.connections.tracing import monotonic
+from displaycontrol.connections.framing import StreamDemultiplexer
 
 
 class SerialConnection(GenericConnection):
@@ -13,38 +16,272 @@ class SerialConnection(GenericConnection):
     stopbits = 1
     parity = 'N'
     bytesize = 8
+    # Seconds between two checks for incoming bytes
+    poll_interval = 0.005
 
     def __init__(self):
         GenericConnection.__init__(self)
+        self._pending = None
+
+    def open(self):
+        """ Open serial port with the current settings """
+        return serial.Serial(port=self.port,
+                             baudrate=self.baudrate,
+                             timeout=self.answer_window(self.timeout),
+                             bytesize=self.bytesize,
+                             parity=self.parity,
+                             stopbits=self.stopbits
+                             )
+
+    def open_transport(self):
+        from displaycontrol.connections.eventloop import SerialTransport
+        return SerialTransport(self)
+
+    def collect_pending(self):
+        """ Collect the answer of a command sent with sendcommand, so that it does not mix
+        with the answer of the next command """
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.collect()
 
     def runcommand(self, command, with_handshake=True):
+        self.collect_pending()
+
+        # Other threads have to wait until the answer is read
+        with self.arbiter():
+            # Perform the handshake if set
+            if with_handshake:
+                if self.handshake is not None:
+                    self.handshake.perform_handshake(self)
+
+            # Open serial port with default settings
+            out = ''
+            ser = None
+            try:
+                ser = self.open()
+                ser.write(command)
+                if self.tracers:
+                    self.trace('write', command)
+                due = time.time() + self.answer_window(self.sleep)
+
+                # Read as the bytes arrive, so the first byte is traced when it is there
+                while True:
+                    waiting = ser.inWaiting()
+                    if waiting > 0:
+                        data = ser.read(waiting)
+                        if self.tracers and not out:
+                            self.trace('first_byte', data[:1])
+                        out += data
+                    elif time.time() >= due:
+                        break
+                    else:
+                        time.sleep(min(self.poll_interval, max(0, due - time.time())))
+            except Exception, err:
+                print(err)
+                if self.tracers:
+                    self.trace('error', str(err))
+            finally:
+                if ser is not None:
+                    ser.close()
+            if out and self.tracers:
+                self.trace('frame', out)
+
+        if self.parser is not None:
+            return self.parser.parse(out)
+        else:
+            return out
+
+    def runpipeline(self, commands, framer, with_handshake=True):
+        """ Writes all commands at once and picks the answers from the stream as they
+        arrive. Only if answers are missing, the answer window passes after the last byte. """
+        if framer is None:
+            return GenericConnection.runpipeline(self, commands, framer, with_handshake)
+        pipeline = self.prepare_pipeline(commands, framer, with_handshake)
+        pipeline.write()
+        return pipeline.collect()
+
+    def prepare_pipeline(self, commands, framer, with_handshake=True):
+        if framer is None:
+            return GenericConnection.prepare_pipeline(self, commands, framer, with_handshake)
+        return SerialPipeline(self, commands, framer, with_handshake)
+
+    def sendcommand(self, command, with_handshake=True):
+        self.collect_pending()
+
+        # The port stays reserved until the answer window is over
+        arbiter = self.arbiter()
+        arbiter.acquire()
+
         # Perform the handshake if set
-        if with_handshake:
-            if self.handshake is not None:
-                self.handshake.perform_handshake(self)
+        try:
+            if with_handshake:
+                if self.handshake is not None:
+                    self.handshake.perform_handshake(self)
+        except Exception:
+            arbiter.release()
+            raise
 
-        # Open serial port with default settings
-        out = ''
+        # Keep the port open until the answer is read
         try:
-            ser = serial.Serial(port=self.port,
-                                baudrate=self.baudrate,
-                                timeout=self.timeout,
-                                bytesize=self.bytesize,
-                                parity=self.parity,
-                                stopbits=self.stopbits
-                                )
+            ser = self.open()
             ser.write(command)
-            time.sleep(self.sleep)
-
-            while ser.inWaiting() > 0:
-                out += ser.read(1)
-            ser.close()
+            if self.tracers:
+                self.trace('write', command)
         except Exception, err:
             print(err)
-        else:
-            ser.close()
+            if self.tracers:
+                self.trace('error', str(err))
+            arbiter.release()
+            return PendingReply(result=self.parser.parse('') if self.parser is not None else '')
 
-        if self.parser is not None:
-            return self.parser.parse(out)
+        pending = PendingRead(self, ser, time.time() + self.answer_window(self.sleep), arbiter)
+        if not arbiter.hand_over(pending):
+            # The thread reserved the port around the command, the answer is read right away
+            pending.collect()
+            return PendingReply(result=pending.answer)
+        pending.start()
+        self._pending = PendingReply(collector=pending.collect)
+        return self._pending
+
+
+class PendingRead(object):
+    """
+    Reads the answer of a command sent with sendcommand once the answer window is over
+    and releases the port, which the writing thread handed over to it. A timer does it if
+    nobody collected the answer by then, so a reply that is never collected does not
+    block the port.
+    """
+
+    def __init__(self, connection, serial, due, arbiter):
+        self.connection = connection
+        self.serial = serial
+        self.due = due
+        self.arbiter = arbiter
+        self.answer = None
+        self._lock = threading.Lock()
+        self._done = False
+        self._timer = threading.Timer(max(0, due - time.time()), self.read)
+        self._timer.daemon = True
+        self._owned = False
+
+    def start(self):
+        """ Takes over the port and starts the timer """
+        self._owned = True
+        self._timer.start()
+
+    def collect(self):
+        """ Waits for the part of the answer window that has not already passed """
+        remaining = self.due - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+        self.read()
+        return self.answer
+
+    def read(self):
+        connection = self.connection
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            self._timer.cancel()
+            out = ''
+            try:
+                while self.serial.inWaiting() > 0:
+                    out += self.serial.read(1)
+                    if connection.tracers and len(out) == 1:
+                        connection.trace('first_byte', out)
+            except Exception, err:
+                print(err)
+                if connection.tracers:
+                    connection.trace('error', str(err))
+            finally:
+                self.serial.close()
+                # Otherwise the port stays with the thread that reserved it around the command
+                if self._owned:
+                    self.arbiter.release(self)
+            if out and connection.tracers:
+                connection.trace('frame', out)
+            self.answer = connection.parser.parse(out) if connection.parser is not None else out
+
+
+class SerialPipeline(PreparedPipeline):
+    """
+    Reserves and opens the port right away, so write() only writes. The port is released
+    once the answers are collected.
+    """
+
+    def __init__(self, connection, commands, framer, with_handshake=True):
+        PreparedPipeline.__init__(self, connection, commands, framer, with_handshake)
+        connection.collect_pending()
+        self.demultiplexer = StreamDemultiplexer(framer)
+        self.tickets = [self.demultiplexer.expect_request(command) for command in commands]
+        self.arbiter = connection.arbiter()
+        self.arbiter.acquire()
+        self.serial = None
+        try:
+            # Perform the handshake if set
+            if with_handshake:
+                if connection.handshake is not None:
+                    connection.handshake.perform_handshake(connection)
+        except Exception:
+            self.arbiter.release()
+            raise
+        try:
+            self.serial = connection.open()
+        except Exception, err:
+            self.error(err)
+
+    def error(self, err):
+        print(err)
+        if self.connection.tracers:
+            self.connection.trace('error', str(err))
+
+    def write(self):
+        if self.serial is None:
+            return
+        try:
+            self.serial.write(''.join(self.commands))
+        except Exception, err:
+            self.error(err)
+            self.serial.close()
+            self.serial = None
+            return
+        self.written = monotonic()
+        if self.connection.tracers:
+            for command in self.commands:
+                self.connection.trace('write', command)
+
+    def collect(self):
+        connection = self.connection
+        try:
+            if self.serial is not None:
+                last = time.time()
+                received = False
+                while not self.demultiplexer.is_complete() and \
+                        time.time() - last < connection.answer_window(connection.sleep):
+                    waiting = self.serial.inWaiting()
+                    if waiting > 0:
+                        data = self.serial.read(waiting)
+                        if connection.tracers and not received:
+                            connection.trace('first_byte', data[:1])
+                        received = True
+                        self.demultiplexer.feed(data)
+                        last = time.time()
+                    else:
+                        time.sleep(connection.poll_interval)
+                self.serial.close()
+        except Exception, err:
+            self.error(err)
+        finally:
+            self.serial = None
+            self.arbiter.release()
+
+        answers = [self.demultiplexer.answer(ticket) for ticket in self.tickets]
+        if connection.tracers:
+            for out in answers:
+                if out:
+                    connection.trace('frame', out)
+        if connection.parser is not None:
+            return [connection.parser.parse(out) for out in answers]
         else:
-            return out
+            return answers
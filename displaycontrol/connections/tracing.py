@@ -0,0 +1,199 @@
+"""
+Tracing of the traffic on the wire.
+
+Tracers are registered on a connection and get every event with a monotonic timestamp:
+
+* write: a command frame was written
+* first_byte: the first byte of the answer arrived
+* frame: a complete answer was read
+* error: the port failed (the data is the error message)
+
+Subclass Tracer and override on_write, on_first_byte, on_frame and on_error, or pass
+functions to a CallbackTracer. Connections without tracers only check an empty tuple.
+
+The RingBufferTracer keeps the latest events as fixed size binary records, cheap enough
+to stay registered all the time, and writes them to a file on demand:
+
+    tracer = RingBufferTracer(4096)
+    connection.add_tracer(tracer)
+    ...
+    tracer.dump('ttyUSB0.trace')
+    for event in load_trace('ttyUSB0.trace'):
+        print event.timestamp, event.event, event.port, event.data.encode('hex')
+"""
+import sys
+import struct
+import threading
+import time
+from collections import namedtuple
+
+TRACE_WRITE = 'write'
+TRACE_FIRST_BYTE = 'first_byte'
+TRACE_FRAME = 'frame'
+TRACE_ERROR = 'error'
+
+EVENTS = [TRACE_WRITE, TRACE_FIRST_BYTE, TRACE_FRAME, TRACE_ERROR]
+EVENT_CODES = dict((event, code) for code, event in enumerate(EVENTS))
+
+TRACE_MAGIC = 'DCTRC'
+TRACE_VERSION = 2
+
+# Magic, version, capacity, number of records
+TRACE_HEADER = struct.Struct('<5sBxxQQ')
+# Timestamp, length of the data, event, port number, the first bytes of the data
+TRACE_RECORD = struct.Struct('<dHBxI48s')
+TRACE_DATA_LENGTH = 48
+
+# A decoded record, data is cut off after TRACE_DATA_LENGTH bytes, length is the full length
+TraceEvent = namedtuple('TraceEvent', ['timestamp', 'event', 'port', 'data', 'length'])
+
+
+def _clock_gettime_monotonic():
+    """ time.monotonic is not there before Python 3.3, use clock_gettime on Linux """
+    import ctypes
+    import ctypes.util
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    library = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+    clock_gettime = library.clock_gettime
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def monotonic():
+        value = timespec()
+        clock_gettime(1, ctypes.byref(value))
+        return value.tv_sec + value.tv_nsec * 1e-9
+    monotonic()
+    return monotonic
+
+
+try:
+    from time import monotonic
+except ImportError:
+    monotonic = time.time
+    if sys.platform.startswith('linux'):
+        try:
+            monotonic = _clock_gettime_monotonic()
+        except (OSError, AttributeError, TypeError):
+            pass
+
+
+class Tracer(object):
+    """ Base class of the tracers, every event goes to the on_<event> method """
+
+    def trace(self, connection, event, timestamp, data):
+        getattr(self, 'on_' + event)(connection, timestamp, data)
+
+    def on_write(self, connection, timestamp, data):
+        pass
+
+    def on_first_byte(self, connection, timestamp, data):
+        pass
+
+    def on_frame(self, connection, timestamp, data):
+        pass
+
+    def on_error(self, connection, timestamp, data):
+        pass
+
+
+class CallbackTracer(Tracer):
+    """ Calls the given functions with (connection, timestamp, data) """
+
+    def __init__(self, on_write=None, on_first_byte=None, on_frame=None, on_error=None):
+        self.callbacks = {
+            TRACE_WRITE: on_write,
+            TRACE_FIRST_BYTE: on_first_byte,
+            TRACE_FRAME: on_frame,
+            TRACE_ERROR: on_error,
+        }
+
+    def trace(self, connection, event, timestamp, data):
+        callback = self.callbacks[event]
+        if callback is not None:
+            callback(connection, timestamp, data)
+
+
+class RingBufferTracer(Tracer):
+    """
+    Keeps the latest capacity events as binary records of TRACE_RECORD.size bytes in a
+    preallocated buffer. Ports are stored as numbers, see ports for the names.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * TRACE_RECORD.size)
+        self.count = 0
+        self.head = 0
+        self.ports = []
+        self._port_numbers = {}
+        self._lock = threading.Lock()
+
+    def port_number(self, port):
+        number = self._port_numbers.get(port)
+        if number is None:
+            number = self._port_numbers[port] = len(self.ports)
+            self.ports.append(port)
+        return number
+
+    def trace(self, connection, event, timestamp, data):
+        with self._lock:
+            port = self.port_number(getattr(connection, 'port', None))
+            TRACE_RECORD.pack_into(self.buffer, self.head * TRACE_RECORD.size, timestamp,
+                                   min(len(data), 0xFFFF), EVENT_CODES[event], port, data[:TRACE_DATA_LENGTH])
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def records(self):
+        """ The raw records, oldest first """
+        with self._lock:
+            size = TRACE_RECORD.size
+            first = (self.head - self.count) % self.capacity
+            if first + self.count <= self.capacity:
+                return bytes(self.buffer[first * size:(first + self.count) * size]), self.count
+            return bytes(self.buffer[first * size:] + self.buffer[:self.head * size]), self.count
+
+    def events(self):
+        records, count = self.records()
+        return decode_records(records, count, self.ports)
+
+    def dump(self, target):
+        """ Writes header, port names (one per line) and records to a file name or file object """
+        records, count = self.records()
+        ports = '\n'.join(str(port) for port in self.ports)
+        content = TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, self.capacity, count) + \
+            struct.pack('<I', len(ports)) + ports + records
+        if hasattr(target, 'write'):
+            target.write(content)
+        else:
+            with open(target, 'wb') as handle:
+                handle.write(content)
+
+    def clear(self):
+        with self._lock:
+            self.count = 0
+            self.head = 0
+
+
+def decode_records(records, count, ports):
+    events = []
+    for index in xrange(count):
+        timestamp, length, code, port, data = TRACE_RECORD.unpack_from(records, index * TRACE_RECORD.size)
+        events.append(TraceEvent(timestamp, EVENTS[code], ports[port] if port < len(ports) else port,
+                                 data[:min(length, TRACE_DATA_LENGTH)], length))
+    return events
+
+
+def load_trace(filename):
+    """ Reads a file written by RingBufferTracer.dump, returns the TraceEvents oldest first """
+    with open(filename, 'rb') as handle:
+        content = handle.read()
+    magic, version, capacity, count = TRACE_HEADER.unpack_from(content, 0)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise IOError('%s is not a trace file' % filename)
+    offset = TRACE_HEADER.size
+    length = struct.unpack_from('<I', content, offset)[0]
+    offset += 4
+    ports = content[offset:offset + length].split('\n') if length else []
+    return decode_records(content[offset + length:], count, ports)
@@ -0,0 +1,63 @@
+"""
+Deadlines for commands that are worthless when they are answered too late.
+"""
+from __future__ import absolute_import
+import time
+
+from displaycontrol.exceptions import CommandResponseMalformedError
+
+
+class Deadline(object):
+    """
+    A point in time, given in seconds from now.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.time() + seconds
+
+    @classmethod
+    def at(cls, timestamp):
+        deadline = cls(0)
+        deadline.expires_at = timestamp
+        return deadline
+
+    def remaining(self):
+        """ Seconds left, never below zero """
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    def __repr__(self):
+        return '<Deadline in %.3fs>' % (self.expires_at - time.time())
+
+
+def as_deadline(deadline):
+    """ Accepts a Deadline, seconds from now or None (no deadline) """
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+def poll_until(check, deadline, interval=0.05, maximum_interval=1.0, factor=2.0,
+               retry_on=(CommandResponseMalformedError,)):
+    """ Calls check until it returns something true, waiting interval seconds in between.
+    The interval grows by factor up to maximum_interval, so a quick answer is noticed at
+    once while a long wait costs only a few calls. The exceptions in retry_on (e.g. the
+    garbled answer of a booting display) count as not true, all others are passed on,
+    like a CommandNotImplementedError. Returns whether check succeeded before the
+    deadline (a Deadline or seconds). """
+    deadline = as_deadline(deadline)
+    while True:
+        try:
+            if check():
+                return True
+        except retry_on:
+            pass
+        if deadline is not None:
+            if deadline.expired():
+                return False
+            time.sleep(min(interval, deadline.remaining()))
+        else:
+            time.sleep(interval)
+        interval = min(interval * factor, maximum_interval)
@@ -0,0 +1,62 @@
+from __future__ import absolute_import
+from displaycontrol.connections import PendingReply
+
+
+class DeferredBatch:
+    """
+    Runs setters on many displays without waiting for every single answer, e.g. to blank
+    a whole room. verify() collects the acks afterwards and runs the setters again (this
+    time waiting for the answer) only for displays whose ack was missing or negative.
+
+        batch = DeferredBatch()
+        for control in controls:
+            batch.add(control, 'set_blank_status', DisplayGeneric.GENERIC_ENABLED)
+        failed = batch.verify()
+    """
+
+    def __init__(self, retries=1):
+        self.retries = retries
+        self.entries = []
+
+    def add(self, control, method, *args):
+        """ Runs the setter in fire and forget mode and returns its PendingReply """
+        previous = control.fire_and_forget
+        control.set_fire_and_forget(True)
+        try:
+            result = getattr(control, method)(*args)
+        finally:
+            control.set_fire_and_forget(previous)
+        self.entries.append((control, method, args, result))
+        return result
+
+    def statuses(self):
+        """ Collects all answers, returns a list of (control, method, args, status) """
+        return [(control, method, args, self.status(result))
+                for control, method, args, result in self.entries]
+
+    def verify(self):
+        """ Collects all answers and repeats the setters that were not acknowledged.
+        Returns the list of (control, method, args) that still failed. """
+        failed = [(control, method, args)
+                  for control, method, args, status in self.statuses()
+                  if status != PendingReply.ACK]
+        self.entries = []
+
+        for attempt in range(self.retries):
+            if not failed:
+                break
+            remaining = []
+            for control, method, args in failed:
+                try:
+                    if not getattr(control, method)(*args):
+                        remaining.append((control, method, args))
+                except Exception:
+                    remaining.append((control, method, args))
+            failed = remaining
+        return failed
+
+    @staticmethod
+    def status(result):
+        if isinstance(result, PendingReply):
+            return result.status()
+        return PendingReply.ACK if result else PendingReply.NAK
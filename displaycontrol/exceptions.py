@@ -20,3 +20,15 @@ class CommandArgumentsNotSupportedError(Exception):
 
 class HandshakeNotSuccessfullError(Exception):
     pass
+
+
+class WorkerCrashedError(Exception):
+    pass
+
+
+class CommandExpiredError(Exception):
+    pass
+
+
+class DisplayOfflineError(Exception):
+    pass
@@ -0,0 +1,487 @@
+"""
+Running commands on many displays at once.
+
+A fleet is built from a list of display specifications (plain dicts, e.g. loaded from
+a JSON inventory file):
+
+    {"name": "lobby-1", "vendor": "philips_sicp188", "port": "/dev/ttyUSB0", "id": 1,
+     "connection": "SerialConnection", "settings": {"baudrate": 9600}}
+
+Only vendor and port are required. Vendor and connection are class names (or the
+classes themselves), settings are set as attributes on the connection. All displays on
+the same port share one connection. Vendor is a key of the vendor registry (see
+displaycontrol.vendors.registry), a class name or the class itself.
+"""
+from __future__ import absolute_import
+import copy
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from Queue import Empty, Queue
+
+from displaycontrol.breaker import breaker_for
+from displaycontrol.connections.arbiter import scheduling
+from displaycontrol.connections.pipelineconnection import CaptureConnection, PrefetchConnection, FrameCaptured
+from displaycontrol.deadline import Deadline, as_deadline
+from displaycontrol.exceptions import VendorUnknownError, ConnectionUnknownError, WorkerCrashedError, \
+    CommandNotImplementedError
+from displaycontrol.vendors.capabilities import supports
+
+# Frames a method may send per display in run_evented, every frame replays the method
+EVENTED_MAX_ROUNDS = 32
+
+
+def display_name(spec):
+    """ The name of a display, defaults to port:id """
+    if spec.get('name'):
+        return spec['name']
+    return '%s:%s' % (spec.get('port'), spec.get('id', 1))
+
+
+def load_inventory(filename):
+    """ Loads display specifications from a JSON file, either a list or {"displays": [...]} """
+    with open(filename) as handle:
+        content = json.load(handle)
+    if isinstance(content, dict):
+        content = content.get('displays', [])
+    return content
+
+
+def resolve_vendor(vendor):
+    """ Returns the controller class for a class, a registry key (e.g. philips_sicp188)
+    or a class name (e.g. PhilipsSICP188) """
+    if not isinstance(vendor, basestring):
+        return vendor
+    from displaycontrol.vendors import registry
+    try:
+        return registry.get_vendor(vendor)
+    except VendorUnknownError:
+        import displaycontrol.vendors
+        if vendor in displaycontrol.vendors.__all__:
+            return getattr(displaycontrol.vendors, vendor)
+        raise
+
+
+def resolve_connection(connection):
+    """ Returns the connection class for a class or a class name """
+    if connection is None:
+        connection = 'SerialConnection'
+    if not isinstance(connection, basestring):
+        return connection
+    import displaycontrol.connections
+    import displaycontrol.connections.broker
+    import displaycontrol.connections.emulatedconnection
+    for module in [displaycontrol.connections, displaycontrol.connections.broker,
+                   displaycontrol.connections.emulatedconnection]:
+        if hasattr(module, connection):
+            return getattr(module, connection)
+    raise ConnectionUnknownError(connection)
+
+
+def build_connection(spec):
+    connection = resolve_connection(spec.get('connection'))()
+    connection.port = spec['port']
+    for key, value in spec.get('settings', {}).items():
+        setattr(connection, key, value)
+    return connection
+
+
+def build_controller(spec, connection):
+    return resolve_vendor(spec['vendor'])(connection, spec.get('id', 1))
+
+
+def run_method(controller, method, args):
+    """ Calls the method (a method name or a function taking the controller as first
+    argument) and returns a result dict with ok, value, error and seconds """
+    started = time.time()
+    try:
+        if callable(method):
+            value = method(controller, *args)
+        else:
+            value = getattr(controller, method)(*args)
+        return {'ok': True, 'value': value, 'error': None, 'seconds': time.time() - started}
+    except Exception, err:
+        return {'ok': False, 'value': None, 'error': '%s: %s' % (type(err).__name__, err),
+                'seconds': time.time() - started}
+
+
+def run_grouped(groups, func, concurrency=1):
+    """ Calls func(item) for every item. groups maps a key (e.g. a port) to a list of
+    (name, item) tuples. Items of one group run one after another, up to concurrency
+    groups run in parallel threads. Returns an OrderedDict name -> return value. """
+    results = OrderedDict()
+    queue = Queue()
+    for items in groups.values():
+        for name, item in items:
+            results[name] = None
+        queue.put(items)
+
+    def work():
+        while True:
+            try:
+                items = queue.get_nowait()
+            except Empty:
+                return
+            for name, item in items:
+                results[name] = func(item)
+
+    threads = [threading.Thread(target=work) for i in range(max(1, min(concurrency, len(groups))) - 1)]
+    for thread in threads:
+        thread.start()
+    work()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def power_on_and_wait(controller, deadline):
+    """ Switches the display on and waits until it accepts commands (at most deadline
+    seconds). Returns whether it got ready in time. """
+    controller.set_power_state(controller.POWER_STATE_ON)
+    return controller.wait_until_ready(deadline)
+
+
+def run_pipelined(items, method, args):
+    """ Calls the method for a list of (name, controller) on the same port, writing the
+    first command frame of all controllers at once. Returns an OrderedDict name -> result
+    dict. Every method runs twice: first to capture the frame it sends, then again with
+    the answer fetched by the pipeline. Further frames of a method run one by one. """
+    results = OrderedDict((name, None) for name, controller in items)
+    batches = OrderedDict()
+    for name, controller in items:
+        framer = controller.framer()
+        if framer is None:
+            results[name] = run_method(controller, method, args)
+            continue
+        frame, result = capture_first_frame(controller, method, args)
+        if frame is None:
+            # Answered without the display (e.g. from a cache)
+            results[name] = result
+            continue
+        connection = controller.connection
+        key = (type(framer), getattr(framer, 'header_length', None), id(connection))
+        batches.setdefault(key, (framer, connection, []))[2].append((name, controller, frame))
+
+    for framer, connection, captured in batches.values():
+        frames = [frame for name, controller, frame in captured]
+        answers = connection.runpipeline(frames, framer)
+        for (name, controller, frame), answer in zip(captured, answers):
+            results[name] = run_prefetched(controller, method, args, frame, answer)
+    return results
+
+
+def bind(controller, connection):
+    """ A copy of the controller running its commands on the given connection. The
+    controller itself is left alone, other threads may use it meanwhile. """
+    bound = copy.copy(controller)
+    bound.connection = connection
+    return bound
+
+
+def capture_first_frame(controller, method, args, answers=()):
+    """ Runs the method without sending anything and returns the first command frame it
+    tried to send, or None and the result if it did not need the display at all. The
+    first frames get the given answers, the frame after them is returned. """
+    capture = CaptureConnection(answers)
+    bound = bind(controller, capture)
+    # A probe of the breaker is sent by the run with the answers, not captured
+    if bound.breaker is not None and not bound.breaker.rejects():
+        bound.breaker = None
+    try:
+        result = run_method(bound, method, args)
+    except FrameCaptured:
+        result = None
+    if not capture.frames:
+        return None, result
+    return capture.frames[0], None
+
+
+def run_prefetched(controller, method, args, frame, answer):
+    """ Runs the method again with the answer of its first frame fetched already """
+    return run_method(bind(controller, PrefetchConnection(controller.connection, [(frame, answer)])), method, args)
+
+
+def run_evented(items, method, args, loop, max_rounds=EVENTED_MAX_ROUNDS):
+    """ Calls the method for a list of (name, controller), the command frames of all
+    controllers are served by the EventLoop (see displaycontrol.connections.eventloop) in
+    the current thread, all ports at once. Methods sending several frames run in rounds:
+    every round runs them again with the answers they got so far and submits the next
+    frame of all controllers at once, so a method that pauses between its frames (e.g.
+    wait_until_ready) pauses again in every round.
+
+    A method sending n frames is thus run n + 1 times and costs about n * n / 2 times
+    the work (and pauses) of a single run, while the wire sees every frame only once.
+    Displays whose method still wants to send after max_rounds frames fail instead.
+    Returns an OrderedDict name -> result dict. """
+    results = OrderedDict((name, None) for name, controller in items)
+    pending = [(name, controller, []) for name, controller in items]
+    while pending:
+        if len(pending[0][2]) >= max_rounds:
+            for name, controller, answers in pending:
+                results[name] = error_result(RuntimeError('%s sent more than %d frames' % (method, max_rounds)))
+            break
+        submitted = []
+        for name, controller, answers in pending:
+            frame, result = capture_first_frame(controller, method, args, answers)
+            if frame is None:
+                results[name] = result
+                continue
+            connection = controller.connection
+            parser = getattr(connection, 'parser', None)
+            submitted.append((name, controller, answers, parser,
+                              loop.submit(connection, frame, controller.framer())))
+
+        loop.run_until_complete([request for name, controller, answers, parser, request in submitted])
+        pending = []
+        for name, controller, answers, parser, request in submitted:
+            answer = request.result()
+            if parser is not None:
+                try:
+                    answer = parser.parse(answer)
+                except Exception, err:
+                    results[name] = error_result(err)
+                    continue
+            pending.append((name, controller, answers + [answer]))
+    return results
+
+
+def error_result(error):
+    return {'ok': False, 'value': None, 'error': '%s: %s' % (type(error).__name__, error), 'seconds': 0}
+
+
+class Fleet:
+    """
+    Controllers for a list of display specifications in the current process.
+    """
+
+    def __init__(self, displays):
+        self.displays = OrderedDict()
+        self.connections = {}
+        self.controllers = OrderedDict()
+        for spec in displays:
+            name = display_name(spec)
+            port = spec['port']
+            if port not in self.connections:
+                self.connections[port] = build_connection(spec)
+            self.displays[name] = spec
+            self.controllers[name] = build_controller(spec, self.connections[port])
+
+    def names(self):
+        return list(self.controllers.keys())
+
+    def controller(self, name):
+        return self.controllers[name]
+
+    def supporting(self, method, names=None):
+        """ The (given) displays whose controller implements the method """
+        if names is None:
+            names = self.names()
+        return [name for name in names if supports(self.controllers[name], method)]
+
+    def call(self, name, method, *args):
+        """ Calls the method on a single display, exceptions are passed on """
+        return getattr(self.controllers[name], method)(*args)
+
+    def run(self, method, args=(), names=None, concurrency=1, priority=None, deadline=None, pipelined=False,
+            display_deadline=None, event_loop=None):
+        """ Calls the method on all (or the given) displays. Returns an OrderedDict with a
+        result dict (ok, value, error, seconds) per display name. With a concurrency above
+        one, up to that many ports are served in parallel threads.
+
+        Priority (see displaycontrol.connections.arbiter) decides who goes first if other
+        threads use the same ports, e.g. PRIORITY_BACKGROUND for polling. Deadline is the
+        time in seconds for the whole run, display_deadline the time one display may take.
+        Commands are not sent once their deadline passed and fail with a
+        CommandExpiredError, waiting for an answer never takes longer than what is left.
+
+        Pipelined writes the commands to all displays of a port at once and picks the
+        answers from the stream (see run_pipelined), instead of waiting for every answer
+        before sending the next command.
+
+        With an event_loop (a displaycontrol.connections.eventloop.EventLoop) the current
+        thread serves the commands of every display on all ports at once (see
+        run_evented).
+
+        Displays that do not implement the method (see displaycontrol.vendors.capabilities)
+        fail with a CommandNotImplementedError without sending anything. """
+        if names is None:
+            names = self.names()
+        if not callable(method):
+            capable = self.supporting(method, names)
+            if len(capable) < len(names):
+                results = self.run(method, args, capable, concurrency, priority, deadline, pipelined,
+                                   display_deadline, event_loop)
+                return OrderedDict((name, results[name] if name in results else
+                                    error_result(CommandNotImplementedError('%s is not supported by %s' %
+                                                                            (method, name))))
+                                   for name in names)
+        if deadline is not None:
+            deadline = Deadline(deadline)
+        if event_loop is not None:
+            with scheduling(priority, deadline):
+                return run_evented([(name, self.controllers[name]) for name in names], method, args, event_loop)
+        groups = OrderedDict()
+        for name in names:
+            groups.setdefault(self.displays[name]['port'], []).append((name, self.controllers[name]))
+
+        if pipelined:
+            def run_port(items):
+                with scheduling(priority, deadline):
+                    return run_pipelined(items, method, args)
+            results = OrderedDict((name, None) for name in names)
+            batches = OrderedDict((port, [(port, items)]) for port, items in groups.items())
+            for batch in run_grouped(batches, run_port, concurrency).values():
+                results.update(batch)
+            return results
+
+        def run(controller):
+            with scheduling(priority, deadline), scheduling(None, as_deadline(display_deadline)):
+                return run_method(controller, method, args)
+        return run_grouped(groups, run, concurrency)
+
+    def use_breakers(self, threshold=3, backoff=5.0, maximum_backoff=300.0, on_change=None):
+        """ Gives every display a circuit breaker (see displaycontrol.breaker): after
+        threshold unanswered commands in a row the display fails at once with a
+        DisplayOfflineError until a probe sent every backoff seconds gets an answer.
+        On_change is called with (breaker, old state, new state). Returns the breakers
+        by display name. """
+        breakers = OrderedDict()
+        for name, controller in self.controllers.items():
+            breaker = breaker_for(self.displays[name]['port'], controller.display_id, threshold=threshold,
+                                  backoff=backoff, maximum_backoff=maximum_backoff)
+            if on_change is not None and on_change not in breaker.listeners:
+                breaker.listeners.append(on_change)
+            controller.set_breaker(breaker)
+            breakers[name] = breaker
+        return breakers
+
+    def power_on(self, names=None, deadline=60, concurrency=1):
+        """ Switches the displays on, every display is done as soon as it accepts commands
+        instead of waiting the worst case time for all of them. The value of a result is
+        whether the display got ready within deadline seconds. """
+        return self.run(power_on_and_wait, (deadline,), names, concurrency)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _worker_main(displays, tasks, results):
+    """ Main loop of a worker process, owning the ports of its shard exclusively """
+    fleet = Fleet(displays)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job, name, method, args = task
+        results.put((job, run_method(fleet.controller(name), method, args)))
+
+
+class ShardedFleet:
+    """
+    Runs the displays in a pool of worker processes. The ports are sharded across the
+    workers, every worker owns its ports (and so all displays on them) exclusively, so no
+    two processes ever talk to the same port.
+
+    A crashed worker is restarted. The jobs it had not finished are submitted once more,
+    if the worker crashes again they are reported with a WorkerCrashedError.
+    """
+    poll_interval = 0.2
+
+    def __init__(self, displays, processes=None, retries=1):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.retries = retries
+        self.displays = OrderedDict((display_name(spec), spec) for spec in displays)
+
+        # Shard by port, so every port belongs to exactly one worker
+        ports = sorted(set(spec['port'] for spec in self.displays.values()))
+        processes = max(1, min(processes, len(ports)))
+        self.shard_of_port = dict((port, index % processes) for index, port in enumerate(ports))
+        self.shards = [[] for i in range(processes)]
+        for spec in self.displays.values():
+            self.shards[self.shard_of_port[spec['port']]].append(spec)
+
+        self.results = multiprocessing.Queue()
+        self.workers = [None] * processes
+        self.tasks = [None] * processes
+        self.restarts = 0
+        self._job = 0
+        for index in range(processes):
+            self.start_worker(index)
+
+    def start_worker(self, index):
+        self.tasks[index] = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=_worker_main,
+                                         args=(self.shards[index], self.tasks[index], self.results))
+        worker.daemon = True
+        worker.start()
+        self.workers[index] = worker
+
+    def names(self):
+        return list(self.displays.keys())
+
+    def shard_of(self, name):
+        return self.shard_of_port[self.displays[name]['port']]
+
+    def run(self, method, args=(), names=None):
+        """ Same as Fleet.run, but executed by the worker processes """
+        if names is None:
+            names = self.names()
+        results = OrderedDict((name, None) for name in names)
+        pending = {}
+        for name in names:
+            pending[self.submit(name, method, args)] = (name, 0)
+
+        while pending:
+            try:
+                job, result = self.results.get(timeout=self.poll_interval)
+            except Empty:
+                self.check_workers(pending, method, args, results)
+                continue
+            if job in pending:
+                name, attempts = pending.pop(job)
+                results[name] = result
+        return results
+
+    def submit(self, name, method, args):
+        self._job += 1
+        self.tasks[self.shard_of(name)].put((self._job, name, method, tuple(args)))
+        return self._job
+
+    def check_workers(self, pending, method, args, results):
+        """ Restart crashed workers and resubmit (or fail) the jobs they had not finished """
+        for index, worker in enumerate(self.workers):
+            if worker.is_alive():
+                continue
+            self.restarts += 1
+            self.start_worker(index)
+            for job, (name, attempts) in list(pending.items()):
+                if self.shard_of(name) != index:
+                    continue
+                del pending[job]
+                if attempts < self.retries:
+                    pending[self.submit(name, method, args)] = (name, attempts + 1)
+                else:
+                    results[name] = error_result(WorkerCrashedError('worker %d exited with code %s'
+                                                                    % (index, worker.exitcode)))
+
+    def close(self):
+        for index, worker in enumerate(self.workers):
+            if worker.is_alive():
+                self.tasks[index].put(None)
+        for worker in self.workers:
+            worker.join(5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,220 @@
+"""
+Long running HTTP/JSON gateway that keeps controllers and connections warm.
+
+    displaycontrol-gateway --inventory displays.json --port 8080
+
+    GET  /displays                          names and specifications of all displays
+    GET  /displays/<name>/<attribute>       e.g. /displays/lobby-1/power_state
+    PUT  /displays/<name>/<attribute>       body {"value": 1}, calls set_<attribute>
+    GET  /groups                            group names and their displays
+    GET  /groups/<group>/<attribute>        value of every display in the group
+    PUT  /groups/<group>/<attribute>        set the value on every display in the group
+    GET  /statistics                        time commands waited for their port
+
+Reads are served from the state cache while fresh (?max_age=<seconds> overrides the
+default), identical reads that arrive at the same time share one query on the wire.
+Writes go ahead of reads waiting for the same port.
+"""
+from __future__ import absolute_import
+import argparse
+import json
+import re
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from urlparse import urlparse, parse_qs
+
+from displaycontrol.cache import StateCache, RequestCoalescer
+from displaycontrol.connections.arbiter import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, scheduling
+from displaycontrol.exceptions import CommandNotImplementedError, CommandArgumentsNotSupportedError
+from displaycontrol.fleet import Fleet, load_inventory
+from displaycontrol.vendors.capabilities import COMMANDS, supports
+
+ATTRIBUTE_PATTERN = re.compile(r'^[a-z][a-z0-9_]*$')
+
+
+class GatewayError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class Gateway:
+    """
+    Reads and writes attributes of the displays of a fleet. Commands on the same port are
+    serialized (writes first), commands on different ports run in parallel.
+    """
+    read_priority = PRIORITY_NORMAL
+    write_priority = PRIORITY_INTERACTIVE
+
+    def __init__(self, displays, ttl=5.0):
+        self.fleet = Fleet(displays)
+        self.cache = StateCache(ttl)
+        self.coalescer = RequestCoalescer()
+        self.groups = {}
+        for name, spec in self.fleet.displays.items():
+            for group in spec.get('groups', []):
+                self.groups.setdefault(group, []).append(name)
+
+    def method(self, name, prefix, attribute):
+        if name not in self.fleet.controllers:
+            raise GatewayError(404, 'Unknown display %s' % name)
+        # Only commands, helpers like set_connection or get_static_value are not reachable
+        if not ATTRIBUTE_PATTERN.match(attribute) or prefix + attribute not in COMMANDS:
+            raise GatewayError(404, 'Unknown attribute %s' % attribute)
+        return prefix + attribute
+
+    def call(self, name, method, priority, *args):
+        if not supports(self.fleet.controller(name), method):
+            raise GatewayError(501, '%s is not supported by %s' % (method, name))
+        connection = self.fleet.connections[self.fleet.displays[name]['port']]
+        with scheduling(priority), connection.arbiter():
+            try:
+                return self.fleet.call(name, method, *args)
+            except CommandNotImplementedError:
+                raise GatewayError(501, '%s is not supported by %s' % (method, name))
+            except CommandArgumentsNotSupportedError:
+                raise GatewayError(400, 'Arguments %r are not supported by %s' % (args, method))
+
+    def read(self, name, attribute, max_age=None):
+        """ Returns (value, cached) """
+        method = self.method(name, 'get_', attribute)
+        key = (name, attribute)
+        hit, value = self.cache.get(key, max_age)
+        if hit:
+            return value, True
+
+        def query():
+            generation = self.cache.generation(name)
+            result = self.call(name, method, self.read_priority)
+            self.cache.put(key, result, generation)
+            return result
+        return self.coalescer.do(key, query), False
+
+    def write(self, name, attribute, value):
+        method = self.method(name, 'set_', attribute)
+        try:
+            return self.call(name, method, self.write_priority, value)
+        finally:
+            self.cache.invalidate(name)
+
+    def statistics(self):
+        """ Wait time statistics of the ports of the fleet, per priority """
+        return dict((port, connection.arbiter().statistics())
+                    for port, connection in self.fleet.connections.items())
+
+    def group(self, group):
+        if group not in self.groups:
+            raise GatewayError(404, 'Unknown group %s' % group)
+        return self.groups[group]
+
+    def for_group(self, group, func):
+        """ Runs func(name) for every display of the group, one thread per display """
+        results = {}
+
+        def run(name):
+            try:
+                results[name] = {'ok': True, 'value': func(name)}
+            except GatewayError, err:
+                results[name] = {'ok': False, 'status': err.status, 'error': str(err)}
+            except Exception, err:
+                results[name] = {'ok': False, 'status': 502, 'error': '%s: %s' % (type(err).__name__, err)}
+
+        threads = [threading.Thread(target=run, args=(name,)) for name in self.group(group)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.handle_request(self.get)
+
+    def do_PUT(self):
+        self.handle_request(self.put)
+
+    def do_POST(self):
+        self.handle_request(self.put)
+
+    def handle_request(self, handler):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            self.respond(200, handler(parts, parse_qs(url.query)))
+        except GatewayError, err:
+            self.respond(err.status, {'error': str(err)})
+        except ValueError, err:
+            self.respond(400, {'error': str(err)})
+        except Exception, err:
+            self.respond(502, {'error': '%s: %s' % (type(err).__name__, err)})
+
+    def get(self, parts, query):
+        gateway = self.server.gateway
+        max_age = float(query['max_age'][0]) if 'max_age' in query else None
+        if parts == ['displays']:
+            return gateway.fleet.displays
+        if parts == ['groups']:
+            return gateway.groups
+        if parts == ['statistics']:
+            return gateway.statistics()
+        if len(parts) == 3 and parts[0] == 'displays':
+            value, cached = gateway.read(parts[1], parts[2], max_age)
+            return {'display': parts[1], 'attribute': parts[2], 'value': value, 'cached': cached}
+        if len(parts) == 3 and parts[0] == 'groups':
+            return gateway.for_group(parts[1], lambda name: gateway.read(name, parts[2], max_age)[0])
+        raise GatewayError(404, 'Not found')
+
+    def put(self, parts, query):
+        gateway = self.server.gateway
+        length = int(self.headers.getheader('content-length') or 0)
+        body = json.loads(self.rfile.read(length) or '{}')
+        if 'value' not in body:
+            raise ValueError('The body needs a value')
+        if len(parts) == 3 and parts[0] == 'displays':
+            result = gateway.write(parts[1], parts[2], body['value'])
+            return {'display': parts[1], 'attribute': parts[2], 'result': result}
+        if len(parts) == 3 and parts[0] == 'groups':
+            return gateway.for_group(parts[1], lambda name: gateway.write(name, parts[2], body['value']))
+        raise GatewayError(404, 'Not found')
+
+    def respond(self, status, content):
+        text = json.dumps(content, default=str)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GatewayServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, gateway):
+        HTTPServer.__init__(self, address, GatewayRequestHandler)
+        self.gateway = gateway
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP/JSON gateway for displays')
+    parser.add_argument('--inventory', required=True, help='JSON file with the display specifications')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--ttl', type=float, default=5.0, help='seconds a read value is served from cache')
+    args = parser.parse_args(argv)
+
+    server = GatewayServer((args.host, args.port), Gateway(load_inventory(args.inventory), args.ttl))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Lightweight display handles for large fleets.
+
+A controller object carries a dict of its own. For jobs that touch tens of thousands of
+displays, a DisplayHandle only keeps three slots: the protocol (one per vendor version,
+shared by all handles), the connection (one per port, shared by all displays on the
+port) and the display id. Methods are run by a controller that is bound to the handle
+for the call, constants and tables are read from the controller class. Settings of a
+controller (breaker, priority, ...) would be lost with it and are refused, use
+DisplayHandle.controller() for them:
+
+    handles = build_handles(load_inventory('displays.json'))
+    for name, handle in handles.items():
+        print name, handle.get_power_state_hr()
+"""
+from __future__ import absolute_import
+import threading
+from collections import OrderedDict
+
+from displaycontrol.fleet import display_name, build_connection, resolve_vendor
+from displaycontrol.vendors.generic import static_values_of
+
+
+class Protocol(object):
+    """
+    The definition of a vendor version: the controller class and the static values
+    (see DisplayGeneric.get_static_value) of all its displays, which are kept by port and
+    display id anyway.
+    """
+    __slots__ = ('controller_class', 'static_values')
+
+    def __init__(self, controller_class):
+        self.controller_class = controller_class
+        self.static_values = static_values_of(controller_class)
+
+    def bind(self, connection, display_id):
+        """ Returns a controller for a display speaking this protocol """
+        return self.controller_class(connection, display_id)
+
+    def __repr__(self):
+        return '<Protocol %s>' % self.controller_class.__name__
+
+
+_protocols = {}
+_protocols_lock = threading.Lock()
+
+
+def protocol_for(vendor):
+    """ The shared protocol of a vendor (a registry key, class name or class) """
+    controller_class = resolve_vendor(vendor)
+    with _protocols_lock:
+        if controller_class not in _protocols:
+            _protocols[controller_class] = Protocol(controller_class)
+        return _protocols[controller_class]
+
+
+# Setters that configure the controller itself, which only lives for one call of a handle
+CONTROLLER_SETTINGS = ['set_display_id', 'set_connection', 'set_fire_and_forget', 'set_priority', 'set_breaker']
+
+
+class DisplayHandle(object):
+    """
+    A display on a connection, used like a controller of its vendor.
+    """
+    __slots__ = ('protocol', 'connection', 'display_id')
+
+    def __init__(self, protocol, connection, display_id=1):
+        self.protocol = protocol
+        self.connection = connection
+        self.display_id = int(display_id)
+
+    def controller(self):
+        """ A controller for this display, e.g. to run several commands """
+        return self.protocol.bind(self.connection, self.display_id)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name in CONTROLLER_SETTINGS:
+            raise AttributeError('%s would configure a controller that only lives for one call, '
+                                 'use controller() or the slots of the handle' % name)
+        value = getattr(self.protocol.controller_class, name)
+        if callable(value):
+            return getattr(self.controller(), name)
+        return value
+
+    def __repr__(self):
+        return '<DisplayHandle %s %s:%s>' % (self.protocol.controller_class.__name__,
+                                             getattr(self.connection, 'port', None), self.display_id)
+
+
+def build_handles(displays, connections=None):
+    """ Returns an OrderedDict name -> DisplayHandle for a list of display specifications
+    (see displaycontrol.fleet). All displays on a port share one connection, pass a dict
+    port -> connection to reuse connections. """
+    if connections is None:
+        connections = {}
+    handles = OrderedDict()
+    for spec in displays:
+        port = spec['port']
+        if port not in connections:
+            connections[port] = build_connection(spec)
+        handles[display_name(spec)] = DisplayHandle(protocol_for(spec['vendor']), connections[port],
+                                                    spec.get('id', 1))
+    return handles
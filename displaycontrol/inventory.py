@@ -0,0 +1,219 @@
+"""
+Persistent inventory of detected displays.
+
+The inventory is a JSON file in the format the fleet and the command line tool read
+(see displaycontrol.fleet.load_inventory), every display carries the registry key of
+its controller, the protocol version and static attributes like the serial number:
+
+    {"version": 1, "displays": [
+        {"vendor": "philips_sicp188", "port": "/dev/ttyUSB0", "id": 1,
+         "connection": "SerialConnection", "settings": {}, "protocol": "V1.88",
+         "attributes": {"serial": "AK01234567", "label": "..."}, "last_seen": 1500000000.0}
+    ]}
+
+Controllers are built straight from the file at startup. A rescan only runs the
+detectors on ports that are new or where a known display stopped (or started) answering,
+all other displays just get a single power state query. Switching displays on and off
+does not cause a detection. Displays added to a port whose known displays did not change are found by a
+full rescan of the ports that were not detected for full_interval seconds:
+
+    inventory = Inventory('displays.json')
+    inventory.load()
+    changes = inventory.rescan(full_interval=24 * 3600)
+    inventory.save()
+    fleet = inventory.fleet()
+"""
+from __future__ import absolute_import
+import json
+import os
+import time
+from collections import OrderedDict
+
+from displaycontrol.fleet import Fleet, display_name, build_connection, build_controller
+from displaycontrol.tools import Tools
+from displaycontrol.vendors.generic import invalidate_static_values
+
+INVENTORY_VERSION = 1
+
+# Detector results that are stored as static attributes
+STATIC_ATTRIBUTES = ['serial', 'label']
+
+
+def default_detectors():
+    """ Factories for the serial detectors of all vendors, called with a list of ports """
+    from displaycontrol.vendors.philips import PhilipsSerialDetector
+    from displaycontrol.vendors.samsung import SamsungSerialDetector
+    return [
+        lambda ports: PhilipsSerialDetector(ports=ports),
+        lambda ports: SamsungSerialDetector(ports=ports),
+    ]
+
+
+def probe(spec):
+    """ True if the display of the given specification answers a power state query """
+    controller = build_controller(spec, build_connection(spec))
+    try:
+        state = controller.get_power_state()
+    except Exception:
+        return False
+    return state != controller.POWER_STATE_UNKNOWN
+
+
+class Inventory:
+    """
+    Detected displays, keyed by port and display id.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.displays = OrderedDict()
+
+    def load(self):
+        """ Reads the inventory file, a missing file is an empty inventory """
+        self.displays = OrderedDict()
+        if self.filename is None or not os.path.exists(self.filename):
+            return self
+        with open(self.filename) as handle:
+            content = json.load(handle)
+        if isinstance(content, dict):
+            content = content.get('displays', [])
+        for spec in content:
+            self.displays[(spec['port'], spec.get('id', 1))] = spec
+        return self
+
+    def save(self, filename=None):
+        """ Writes the inventory to filename (default: the file it was created with). The
+        file is replaced at once, so readers never see a partially written inventory. """
+        filename = filename or self.filename
+        if filename is None:
+            raise ValueError('The inventory has no file to be saved to')
+        content = {'version': INVENTORY_VERSION, 'displays': self.specs()}
+        temporary = filename + '.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(content, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+        os.rename(temporary, filename)
+
+    def specs(self):
+        return list(self.displays.values())
+
+    def ports(self):
+        return list(OrderedDict((port, True) for port, display_id in self.displays).keys())
+
+    def fleet(self):
+        """ Returns a Fleet with a controller for every display in the inventory """
+        return Fleet(self.specs())
+
+    def add_detected(self, found, connection='SerialConnection', settings=None):
+        """ Adds (or updates) a display from a detector result dict. Names and settings of
+        known displays are kept. Returns the display specification. """
+        key = (found['port'], found['id'])
+        spec = self.displays.get(key, {})
+        spec.update({
+            'vendor': found.get('vendor') or found['key'],
+            'port': found['port'],
+            'id': found['id'],
+            'protocol': found.get('sicp', ''),
+            'attributes': dict((name, found[name]) for name in STATIC_ATTRIBUTES if found.get(name)),
+            'last_seen': time.time(),
+            'last_detected': time.time(),
+        })
+        spec.setdefault('connection', connection)
+        spec.setdefault('settings', dict(settings or {}))
+        self.displays[key] = spec
+        return spec
+
+    def remove_port(self, port):
+        """ Removes all displays of the given port, returns their names """
+        removed = []
+        for key in list(self.displays.keys()):
+            if key[0] == port:
+                removed.append(display_name(self.displays.pop(key)))
+        return removed
+
+    def detect(self, ports, detectors, connection='SerialConnection', settings=None):
+        """ Runs the detectors on the given ports and replaces the displays of these ports
+        with the result. Static values of the displays there are asked again, the
+        displays may have been swapped. Returns the names of the displays found. """
+        for port in ports:
+            invalidate_static_values(port)
+        found = OrderedDict()
+        for factory in detectors:
+            for result in factory(list(ports)).detect_displays():
+                # The first detector that finds a display wins
+                found.setdefault((result['port'], result['id']), result)
+
+        previous = {}
+        for port in ports:
+            for key in list(self.displays.keys()):
+                if key[0] == port:
+                    previous[key] = self.displays.pop(key)
+        names = []
+        for key, result in found.items():
+            if key in previous:
+                self.displays[key] = previous[key]
+            names.append(display_name(self.add_detected(result, connection, settings)))
+        return names
+
+    def rescan(self, detectors=None, ports=None, connection='SerialConnection', settings=None,
+               full_interval=None):
+        """
+        Updates the inventory with as few queries as possible:
+
+        * ports that are not available anymore are removed
+        * new ports are detected from scratch
+        * on known ports every display gets a power state query, a port is detected
+          again for all display ids of the detectors if one of its displays stopped
+          answering, or answers again after it did not during the last rescan (e.g.
+          its chain was unplugged along with displays that were not known yet). The
+          power state itself is not compared, so scheduled switching does not cause
+          detections
+        * with a full_interval, known ports that were not detected for that many
+          seconds are detected again without querying their displays
+
+        Returns a dict with the names of the added and removed displays and the ports
+        the detectors ran on.
+        """
+        if detectors is None:
+            detectors = default_detectors()
+        if ports is None:
+            ports = Tools.get_available_comports()
+        before = set(display_name(spec) for spec in self.specs())
+
+        removed = []
+        for port in self.ports():
+            if port not in ports:
+                removed.extend(self.remove_port(port))
+
+        known = self.ports()
+        changed = []
+        for port in ports:
+            if port not in known:
+                changed.append(port)
+                continue
+            specs = [spec for key, spec in self.displays.items() if key[0] == port]
+            if full_interval is not None and \
+                    min(spec.get('last_detected', 0) for spec in specs) <= time.time() - full_interval:
+                changed.append(port)
+                continue
+            for spec in specs:
+                answered = probe(spec)
+                # Older files stored the power state, which is not compared anymore
+                spec.pop('probe', None)
+                previous = spec.get('answered', answered)
+                spec['answered'] = answered
+                if answered:
+                    spec['last_seen'] = time.time()
+                if not answered or answered != previous:
+                    changed.append(port)
+                    break
+
+        if changed:
+            self.detect(changed, detectors, connection, settings)
+
+        after = set(display_name(spec) for spec in self.specs())
+        return {
+            'added': sorted(after - before),
+            'removed': sorted((before - after) | set(removed)),
+            'scanned': changed,
+        }
@@ -0,0 +1,38 @@
+"""
+Lazy attribute loading for packages, so that importing a package does not import all of
+its submodules (and their dependencies like pyserial) up front.
+"""
+from __future__ import absolute_import
+import sys
+import types
+from importlib import import_module
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module that imports attributes from their submodule on first access.
+    """
+
+    def __init__(self, module, attributes):
+        types.ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # Keep the original module alive, Python 2 clears the globals of collected modules
+        self.__dict__['_lazy_module'] = module
+        self.__dict__['_lazy_attributes'] = attributes
+
+    def __getattr__(self, name):
+        attributes = self.__dict__['_lazy_attributes']
+        if name not in attributes:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        value = getattr(import_module(attributes[name]), name)
+        setattr(self, name, value)
+        return value
+
+
+def install_lazy_module(name, attributes):
+    """ Replaces the module with the given name by a LazyModule. attributes maps
+    attribute names to the module they are imported from. """
+    module = sys.modules[name]
+    public = [key for key in module.__dict__ if not key.startswith('_') and key != 'install_lazy_module']
+    module.__all__ = sorted(set(public) | set(attributes))
+    sys.modules[name] = LazyModule(module, attributes)
@@ -0,0 +1,180 @@
+"""
+Bringing displays into a desired state with as few commands as possible.
+
+The desired state is given per display name or group (see the groups of a display
+specification), settings of a display override the ones of its groups:
+
+    desired = {
+        'lobby': {'power_state': DisplayGeneric.POWER_STATE_ON, 'input_channel': 'HDMI 2',
+                  'lock_keys': DisplayGeneric.LOCKED_ALL},
+        'lobby-3': {'power_state': DisplayGeneric.POWER_STATE_OFF},
+    }
+    report = reconcile(fleet, desired, concurrency=8)
+
+First the current values are read, one attribute for all displays of a port at once
+(pipelined). Then only the setters for values that differ are sent, in the order of
+ATTRIBUTES: displays are switched on first (and waited for until they accept commands),
+switched off last. Attributes that could not be read before, e.g. because the display
+was off, are read once it is on. Attributes the vendor can not set are reported as not
+supported without sending anything, ones it can set but not read are always set.
+"""
+from __future__ import absolute_import
+import time
+from collections import OrderedDict
+
+from displaycontrol.exceptions import CommandNotImplementedError
+from displaycontrol.vendors.capabilities import supports
+from displaycontrol.vendors.generic import DisplayGeneric
+
+POWER_STATE_ON = DisplayGeneric.POWER_STATE_ON
+
+# Attribute -> (getter, setter), in the order the setters are sent
+ATTRIBUTES = OrderedDict([
+    ('power_state', ('get_power_state', 'set_power_state')),
+    ('input_channel', ('get_input_channel_hr', 'set_input_channel')),
+    ('auto_detect_input_channel', ('get_auto_detect_input_channel', 'set_auto_detect_input_channel')),
+    ('failover_input_setting', ('get_failover_input_setting', 'set_failover_input_setting')),
+    ('lock_keys', ('get_lock_keys', 'set_lock_keys')),
+    ('lock_ir_remote', ('get_lock_ir_remote', 'set_lock_ir_remote')),
+    ('blank_status', ('get_blank_status', 'set_blank_status')),
+    ('freeze_status', ('get_freeze_status', 'set_freeze_status')),
+    ('audio_mute_status', ('get_audio_mute_status', 'set_audio_mute_status')),
+    ('audio_volume', ('get_audio_volume', 'set_audio_volume')),
+    ('picture_mode', ('get_picture_mode', 'set_picture_mode')),
+    ('picture_brightness', ('get_picture_brightness', 'set_picture_brightness')),
+    ('picture_contrast', ('get_picture_contrast', 'set_picture_contrast')),
+    ('picture_color', ('get_picture_color', 'set_picture_color')),
+    ('picture_sharpness', ('get_picture_sharpness', 'set_picture_sharpness')),
+    ('picture_color_temperature', ('get_picture_color_temperature', 'set_picture_color_temperature')),
+    ('picture_aspect_ratio', ('get_picture_aspect_ratio', 'set_picture_aspect_ratio')),
+])
+
+# Not read yet or not readable
+UNKNOWN = object()
+
+
+def desired_states(fleet, desired):
+    """ Resolves groups and display names to an OrderedDict name -> desired attributes,
+    in the order of the fleet. Raises a ValueError for unknown names and attributes. """
+    names = set(fleet.names())
+    groups = set()
+    for spec in fleet.displays.values():
+        groups.update(spec.get('groups', []))
+    for key, attributes in desired.items():
+        if key not in names and key not in groups:
+            raise ValueError('Unknown display or group %s' % key)
+        for attribute in attributes:
+            if attribute not in ATTRIBUTES:
+                raise ValueError('Unknown attribute %s' % attribute)
+
+    states = OrderedDict()
+    for name, spec in fleet.displays.items():
+        state = {}
+        for group in spec.get('groups', []):
+            state.update(desired.get(group, {}))
+        state.update(desired.get(name, {}))
+        if state:
+            states[name] = state
+    return states
+
+
+def ordered_changes(state):
+    """ The attributes of a desired state in the order to set them, switching off comes last """
+    attributes = [attribute for attribute in ATTRIBUTES if attribute in state]
+    if 'power_state' in state and state['power_state'] != POWER_STATE_ON:
+        attributes.remove('power_state')
+        attributes.append('power_state')
+    return attributes
+
+
+def apply_state(controller, state, current, ready_deadline=60):
+    """ Sends the setters for the attributes of state that differ from current (values
+    read before, UNKNOWN if not). Returns the report of the display. """
+    started = time.time()
+    report = {'changed': OrderedDict(), 'unchanged': [], 'failed': OrderedDict(), 'commands': 0}
+    for attribute in ordered_changes(state):
+        getter, setter = ATTRIBUTES[attribute]
+        value = state[attribute]
+        if not supports(controller, setter):
+            report['failed'][attribute] = 'Not supported'
+            continue
+        try:
+            before = current.get(attribute, UNKNOWN)
+            if before is UNKNOWN and supports(controller, getter):
+                before = getattr(controller, getter)()
+            if before == value:
+                report['unchanged'].append(attribute)
+                continue
+            report['commands'] += 1
+            if getattr(controller, setter)(value) is False:
+                report['failed'][attribute] = 'Not acknowledged'
+                continue
+            report['changed'][attribute] = {'from': None if before is UNKNOWN else before, 'to': value}
+            if attribute == 'power_state' and value == POWER_STATE_ON:
+                if not controller.wait_until_ready(ready_deadline):
+                    report['failed'][attribute] = 'Not ready after %s seconds' % ready_deadline
+                    break
+        except CommandNotImplementedError:
+            report['failed'][attribute] = 'Not supported'
+        except Exception, err:
+            report['failed'][attribute] = '%s: %s' % (type(err).__name__, err)
+    report['seconds'] = time.time() - started
+    return report
+
+
+def read_states(fleet, states, concurrency=1):
+    """ Reads the current value of every attribute of the desired states, one attribute
+    for all displays at once. Returns a dict name -> attribute -> value. """
+    current = dict((name, {}) for name in states)
+
+    def switched_on(name):
+        return states[name].get('power_state') == POWER_STATE_ON and \
+            current[name].get('power_state') != POWER_STATE_ON
+
+    for attribute, (getter, setter) in ATTRIBUTES.items():
+        names = [name for name, state in states.items() if attribute in state]
+        # Displays that get switched on are read once they are on
+        if attribute != 'power_state':
+            names = [name for name in names if not switched_on(name)]
+        names = fleet.supporting(getter, names)
+        if not names:
+            continue
+        results = fleet.run(getter, names=names, concurrency=concurrency, pipelined=True)
+        for name, result in results.items():
+            if result['ok'] and result['value'] is not None:
+                current[name][attribute] = result['value']
+    return current
+
+
+def reconcile(fleet, desired, concurrency=1, ready_deadline=60):
+    """
+    Brings the displays of the fleet into the desired state, see above. Returns a report
+    with the changed, unchanged and failed attributes and the time taken per display,
+    the number of setters sent and the total time.
+    """
+    started = time.time()
+    states = desired_states(fleet, desired)
+    current = read_states(fleet, states, concurrency)
+    read_seconds = time.time() - started
+
+    names = dict((id(fleet.controller(name)), name) for name in states)
+
+    def apply(controller):
+        name = names[id(controller)]
+        return apply_state(controller, states[name], current[name], ready_deadline)
+
+    results = OrderedDict()
+    for name, result in fleet.run(apply, names=list(states.keys()), concurrency=concurrency).items():
+        if result['ok']:
+            results[name] = result['value']
+        else:
+            results[name] = {'changed': {}, 'unchanged': [], 'failed': {'*': result['error']}, 'commands': 0,
+                             'seconds': result['seconds']}
+
+    return {
+        'displays': results,
+        'changed': sum(len(report['changed']) for report in results.values()),
+        'commands': sum(report['commands'] for report in results.values()),
+        'read_seconds': read_seconds,
+        'seconds': time.time() - started,
+    }
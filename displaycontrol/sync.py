@@ -0,0 +1,76 @@
+"""
+Synchronized commands for video walls.
+
+Switching the input of a wall display by display waits out the answer window of every
+display before the next one changes. synchronized() encodes the command frames of all
+displays first, reserves and opens every port, and only then writes the frames: all
+frames of a daisy chain in a single write, the ports one right after the other. The
+answers are collected afterwards. The report tells the spread between the first and the
+last write:
+
+    report = synchronized(fleet, 'set_input_channel', ('HDMI 2',), names=wall)
+    print report['spread_ms'], [result['value'] for result in report['results'].values()]
+"""
+from __future__ import absolute_import
+import time
+from collections import OrderedDict
+
+from displaycontrol.connections.arbiter import scheduling, PRIORITY_INTERACTIVE
+from displaycontrol.fleet import capture_first_frame, run_prefetched
+
+
+def synchronized(fleet, method, args=(), names=None, priority=PRIORITY_INTERACTIVE):
+    """
+    Calls the method on all (or the given) displays of the fleet with the first command
+    frame of every display written in one burst. Further frames of a method run one by
+    one afterwards. Returns a dict with the result dicts by name (see Fleet.run), the
+    milliseconds between the first and the last write (spread_ms), the offset of the
+    write per port (writes) and the total seconds.
+    """
+    started = time.time()
+    if names is None:
+        names = fleet.names()
+    results = OrderedDict((name, None) for name in names)
+
+    # Encode everything before touching a port
+    batches = OrderedDict()
+    for name in names:
+        controller = fleet.controller(name)
+        frame, result = capture_first_frame(controller, method, args)
+        if frame is None:
+            results[name] = result
+            continue
+        connection = controller.connection
+        batch = batches.setdefault(id(connection), (connection, controller.framer(), []))
+        batch[2].append((name, controller, frame))
+
+    with scheduling(priority):
+        # Reserve and open all ports, then write. The ports are reserved in the same order
+        # by everybody, two synchronized calls over the same ports would deadlock otherwise.
+        pipelines = []
+        try:
+            for connection, framer, captured in sorted(batches.values(), key=lambda batch: str(batch[0].port)):
+                frames = [frame for name, controller, frame in captured]
+                pipelines.append((connection, connection.prepare_pipeline(frames, framer), captured))
+        except Exception:
+            for connection, pipeline, captured in pipelines:
+                pipeline.collect()
+            raise
+        for connection, pipeline, captured in pipelines:
+            pipeline.write()
+
+        for connection, pipeline, captured in pipelines:
+            answers = pipeline.collect()
+            for (name, controller, frame), answer in zip(captured, answers):
+                results[name] = run_prefetched(controller, method, args, frame, answer)
+
+    written = [pipeline.written for connection, pipeline, captured in pipelines if pipeline.written is not None]
+    first = min(written) if written else None
+    return {
+        'results': results,
+        'spread_ms': (max(written) - first) * 1000.0 if written else None,
+        'writes': OrderedDict((getattr(connection, 'port', None),
+                               (pipeline.written - first) * 1000.0 if pipeline.written is not None else None)
+                              for connection, pipeline, captured in pipelines),
+        'seconds': time.time() - started,
+    }
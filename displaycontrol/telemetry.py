@@ -0,0 +1,372 @@
+"""
+Compact history of health signals (temperature, operating hours, power state).
+
+Every signal of a display is kept in a ring buffer of fixed width samples (a double for
+the timestamp and one for the value, 16 bytes per sample), either in memory or in a
+memory mapped file that survives restarts. All signals of a display share one file with
+a fixed number of slots, one per series. Once a buffer is full the oldest samples are
+overwritten.
+
+    recorder = TelemetryRecorder(fleet, interval=60, capacity=7 * 24 * 60, directory='telemetry')
+    recorder.start()
+    ...
+    recorder.query('lobby-1', 'temperature.0', time.time() - 3600)
+    recorder.downsample('lobby-1', 'temperature.0', time.time() - 86400, buckets=96)
+"""
+from __future__ import absolute_import
+import bisect
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from displaycontrol.connections.arbiter import PRIORITY_BACKGROUND
+
+TELEMETRY_MAGIC = 'DCTEL'
+TELEMETRY_VERSION = 2
+
+# Magic, version, capacity, number of series slots
+TELEMETRY_HEADER = struct.Struct('<5sBxxQQ')
+# Per slot: series name, number of samples, position of the next sample
+SERIES_NAME_LENGTH = 48
+SLOT_HEADER = struct.Struct('<%dsQQ' % SERIES_NAME_LENGTH)
+SAMPLE = struct.Struct('<dd')
+
+# Series slots in the file of a display
+TELEMETRY_SLOTS = 16
+
+# Signals sampled by default: series name -> getter
+DEFAULT_SIGNALS = OrderedDict([
+    ('temperature', 'get_temperature'),
+    ('operating_hours', 'get_operating_hours'),
+    ('power_state', 'get_power_state'),
+])
+
+
+class ArrayStorage(object):
+    """ Samples in two arrays of doubles """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', [0.0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.count = 0
+        self.head = 0
+
+    def get(self, index):
+        return self.timestamps[index], self.values[index]
+
+    def timestamp(self, index):
+        return self.timestamps[index]
+
+    def put(self, index, timestamp, value):
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+
+    def publish(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+class TelemetryFile(object):
+    """ A memory mapped file with a slot of capacity samples for each of up to slots
+    series. The slot headers keep name, count and position of every series. Only a
+    missing file is created, an existing file has to match capacity and slots. """
+
+    def __init__(self, filename, capacity, slots=TELEMETRY_SLOTS):
+        size = TELEMETRY_HEADER.size + slots * (SLOT_HEADER.size + capacity * SAMPLE.size)
+        exists = os.path.exists(filename)
+        if exists and os.path.getsize(filename) != size:
+            raise IOError('%s is not a telemetry file with %d slots of %d samples' % (filename, slots, capacity))
+        self._file = open(filename, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(size)
+        self.map = mmap.mmap(self._file.fileno(), size)
+        self.capacity = capacity
+        self.slots = slots
+        if exists:
+            magic, version, stored, stored_slots = TELEMETRY_HEADER.unpack_from(self.map, 0)
+            if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION or stored != capacity or \
+                    stored_slots != slots:
+                raise IOError('%s is not a telemetry file with %d slots of %d samples' % (filename, slots, capacity))
+        else:
+            TELEMETRY_HEADER.pack_into(self.map, 0, TELEMETRY_MAGIC, TELEMETRY_VERSION, capacity, slots)
+        self.names = [SLOT_HEADER.unpack_from(self.map, self.slot_header(index))[0].rstrip('\0')
+                      for index in range(slots)]
+        self._lock = threading.Lock()
+
+    def slot_header(self, index):
+        return TELEMETRY_HEADER.size + index * SLOT_HEADER.size
+
+    def slot_data(self, index):
+        return TELEMETRY_HEADER.size + self.slots * SLOT_HEADER.size + index * self.capacity * SAMPLE.size
+
+    def storage(self, series, create=True):
+        """ The storage of a series, a free slot is taken on first use. Without create,
+        None is returned for a series that has no slot. """
+        if not series or len(series) > SERIES_NAME_LENGTH:
+            raise ValueError('Invalid series name %r' % series)
+        with self._lock:
+            if series not in self.names:
+                if not create:
+                    return None
+                if '' not in self.names:
+                    raise IOError('No free slot for %s, all %d slots are used' % (series, self.slots))
+                index = self.names.index('')
+                self.names[index] = series
+                SLOT_HEADER.pack_into(self.map, self.slot_header(index), series, 0, 0)
+            return MappedStorage(self, self.names.index(series))
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map.close()
+        self._file.close()
+
+
+class MappedStorage(object):
+    """ The samples of a series in a slot of a TelemetryFile """
+
+    def __init__(self, telemetry_file, index):
+        self.file = telemetry_file
+        self.capacity = telemetry_file.capacity
+        self._map = telemetry_file.map
+        self._header = telemetry_file.slot_header(index)
+        self._data = telemetry_file.slot_data(index)
+        self.name, self.count, self.head = SLOT_HEADER.unpack_from(self._map, self._header)
+        self.name = self.name.rstrip('\0')
+
+    def publish(self):
+        """ Writes count and position, readers of the file see the samples up to here """
+        SLOT_HEADER.pack_into(self._map, self._header, self.name, self.count, self.head)
+
+    def get(self, index):
+        return SAMPLE.unpack_from(self._map, self._data + index * SAMPLE.size)
+
+    def timestamp(self, index):
+        return self.get(index)[0]
+
+    def put(self, index, timestamp, value):
+        SAMPLE.pack_into(self._map, self._data + index * SAMPLE.size, timestamp, value)
+
+    def flush(self):
+        self.file.flush()
+
+
+class _Timestamps(object):
+    """ The timestamps of a ring buffer in order, as sequence for bisect """
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def __len__(self):
+        return len(self.ring)
+
+    def __getitem__(self, index):
+        return self.ring.storage.timestamp(self.ring.physical(index))
+
+
+class RingBuffer(object):
+    """
+    Fixed number of (timestamp, value) samples, oldest first. Samples have to be
+    appended in time order. A ring with a filename has a file of its own, rings of a
+    TelemetryFile get their storage from it.
+    """
+
+    def __init__(self, capacity, filename=None, storage=None):
+        self._file = None
+        if storage is not None:
+            self.storage = storage
+        elif filename is None:
+            self.storage = ArrayStorage(capacity)
+        else:
+            self._file = TelemetryFile(filename, capacity, 1)
+            self.storage = self._file.storage('series')
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.storage.count
+
+    def physical(self, index):
+        """ Position in the storage of the sample with the given (logical) index """
+        return (self.storage.head - self.storage.count + index) % self.capacity
+
+    def append(self, timestamp, value):
+        storage = self.storage
+        with self._lock:
+            storage.put(storage.head, timestamp, value)
+            # Count and position move only once the sample is written
+            storage.head = (storage.head + 1) % self.capacity
+            storage.count = min(storage.count + 1, self.capacity)
+            storage.publish()
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        with self._lock:
+            if index < 0 or index >= len(self):
+                raise IndexError(index)
+            return self.storage.get(self.physical(index))
+
+    def latest(self):
+        return self[-1] if len(self) else None
+
+    def range(self, start=None, end=None):
+        """ Samples with start <= timestamp < end, found by binary search """
+        timestamps = _Timestamps(self)
+        with self._lock:
+            first = 0 if start is None else bisect.bisect_left(timestamps, start)
+            last = len(self) if end is None else bisect.bisect_left(timestamps, end)
+            return [self.storage.get(self.physical(index)) for index in xrange(first, last)]
+
+    def downsample(self, start, end, buckets, how='mean'):
+        """ Splits start to end into the given number of buckets and returns a
+        (bucket start, value) tuple per bucket with samples. How is mean, min, max or last. """
+        width = float(end - start) / buckets
+        reduced = OrderedDict()
+        for timestamp, value in self.range(start, end):
+            bucket = min(int((timestamp - start) / width), buckets - 1)
+            reduced.setdefault(bucket, []).append(value)
+        result = []
+        for bucket, values in reduced.items():
+            if how == 'mean':
+                value = sum(values) / len(values)
+            elif how == 'min':
+                value = min(values)
+            elif how == 'max':
+                value = max(values)
+            elif how == 'last':
+                value = values[-1]
+            else:
+                raise ValueError('Unknown aggregation %s' % how)
+            result.append((start + bucket * width, value))
+        return result
+
+    def flush(self):
+        self.storage.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class TelemetryRecorder:
+    """
+    Samples the signals of all displays of a fleet into ring buffers, once or every
+    interval seconds in a background thread. Signals returning a list (like the
+    temperature sensors) get one series per entry (temperature.0, temperature.1).
+    Samples run with background priority, so they do not hold up other commands.
+    With a directory, every display has a file with up to slots series.
+    """
+
+    def __init__(self, fleet, signals=None, interval=60, capacity=10080, directory=None, slots=TELEMETRY_SLOTS):
+        self.fleet = fleet
+        self.signals = signals if signals is not None else DEFAULT_SIGNALS
+        self.interval = interval
+        self.capacity = capacity
+        self.directory = directory
+        self.slots = slots
+        self.buffers = {}
+        self.files = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def filename(self, name):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        return os.path.join(self.directory, safe + '.tel')
+
+    def series(self, name, series, create=True):
+        """ Returns the ring buffer of a series of a display, created on first use.
+        Without create, None is returned for a series that was never recorded, neither a
+        file nor a slot is allocated for it. """
+        key = (name, series)
+        with self._lock:
+            if key not in self.buffers:
+                storage = None
+                if self.directory is not None:
+                    if name not in self.files:
+                        if not create and not os.path.exists(self.filename(name)):
+                            return None
+                        self.files[name] = TelemetryFile(self.filename(name), self.capacity, self.slots)
+                    storage = self.files[name].storage(series, create)
+                    if storage is None:
+                        return None
+                elif not create:
+                    return None
+                self.buffers[key] = RingBuffer(self.capacity, storage=storage)
+            return self.buffers[key]
+
+    def record(self, name, signal, value, timestamp):
+        if isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                self.series(name, '%s.%d' % (signal, index)).append(timestamp, float(item))
+        else:
+            self.series(name, signal).append(timestamp, float(value))
+
+    def sample(self, timestamp=None):
+        """ Samples every signal of every display implementing it once """
+        if timestamp is None:
+            timestamp = time.time()
+        for signal, method in self.signals.items():
+            names = self.fleet.supporting(method)
+            for name, result in self.fleet.run(method, names=names, priority=PRIORITY_BACKGROUND).items():
+                try:
+                    if not result['ok']:
+                        raise ValueError(result['error'])
+                    self.record(name, signal, result['value'], timestamp)
+                except (ValueError, TypeError, IOError):
+                    self.errors += 1
+        self.flush()
+
+    def query(self, name, series, start=None, end=None):
+        """ Samples of a series, an unknown display or series has none """
+        ring = self.series(name, series, create=False)
+        return [] if ring is None else ring.range(start, end)
+
+    def downsample(self, name, series, start, end=None, buckets=100, how='mean'):
+        if end is None:
+            end = time.time()
+        ring = self.series(name, series, create=False)
+        return [] if ring is None else ring.downsample(start, end, buckets, how)
+
+    def run(self):
+        while not self._stop.is_set():
+            started = time.time()
+            self.sample(started)
+            self._stop.wait(max(0, self.interval - (time.time() - started)))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def flush(self):
+        with self._lock:
+            for telemetry_file in self.files.values():
+                telemetry_file.flush()
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            for telemetry_file in self.files.values():
+                telemetry_file.close()
+            self.files = {}
+            self.buffers = {}
@@ -0,0 +1,30 @@
+import os
+import pty
+import threading
+import time
+import tty
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+
+
+class PseudoTerminalDisplay(threading.Thread):
+    """ Answers like an emulated display on the master side of a pseudo terminal, the
+    commands are kept with the time they arrived """
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.path = os.ttyname(slave)
+        self.slave = slave
+        self.emulator = PhilipsEmulatedConnection()
+        self.received = []
+
+    def run(self):
+        while True:
+            try:
+                command = os.read(self.master, 64)
+            except OSError:
+                return
+            self.received.append((time.time(), command))
+            os.write(self.master, self.emulator.respond(command))
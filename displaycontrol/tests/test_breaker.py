@@ -0,0 +1,119 @@
+import time
+from unittest import TestCase
+from displaycontrol.breaker import CircuitBreaker
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.exceptions import DisplayOfflineError
+from displaycontrol.fleet import Fleet
+from displaycontrol.vendors.philips import PhilipsSICP100
+
+
+class UnpluggedConnection(PhilipsEmulatedConnection):
+    """ Stays silent while unplugged, counts the commands written. Fails with a
+    RuntimeError before writing while broken. """
+    unplugged = False
+    broken = False
+
+    def __init__(self, *args, **kwargs):
+        PhilipsEmulatedConnection.__init__(self, *args, **kwargs)
+        self.written = []
+
+    def runcommand(self, command, with_handshake=True):
+        if self.broken:
+            raise RuntimeError('Port is gone')
+        return PhilipsEmulatedConnection.runcommand(self, command, with_handshake)
+
+    def respond(self, command):
+        self.written.append(ord(command[2]))
+        if self.unplugged:
+            return ''
+        return PhilipsEmulatedConnection.respond(self, command)
+
+
+class TestBreaker(TestCase):
+    def test_open_and_probe(self):
+        """
+        Unanswered commands open the breaker, only probes are sent until the display answers
+
+        :return:
+        """
+        changes = []
+        connection = UnpluggedConnection()
+        breaker = CircuitBreaker('test', threshold=2, backoff=0.1,
+                                 on_change=lambda breaker, old, new: changes.append(new))
+        control = PhilipsSICP100(connection)
+        control.set_breaker(breaker)
+
+        connection.unplugged = True
+        for i in range(2):
+            self.assertFalse(control.is_ready_for_commands())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # Fails at once without writing anything
+        written = len(connection.written)
+        self.assertRaises(DisplayOfflineError, control.get_power_state)
+        self.assertEqual(len(connection.written), written)
+
+        # After the backoff only the probe goes out, the backoff grows
+        time.sleep(0.15)
+        self.assertRaises(DisplayOfflineError, control.get_power_state)
+        self.assertEqual(connection.written[written:], [0x19])
+        self.assertAlmostEqual(breaker.current_backoff, 0.2)
+
+        connection.unplugged = False
+        time.sleep(0.25)
+        self.assertEqual(control.get_power_state(), control.POWER_STATE_ON)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(changes, ['open', 'half-open', 'open', 'half-open', 'closed'])
+
+        statistics = breaker.statistics()
+        self.assertEqual(statistics['opened'], 1)
+        self.assertEqual(statistics['probes'], 2)
+        self.assertEqual(statistics['rejected'], 1)
+
+    def test_probe_that_was_not_sent(self):
+        """
+        A probe that failed before it was written opens the breaker again without a longer
+        backoff, the controller goes through the breaker meanwhile
+
+        :return:
+        """
+        connection = UnpluggedConnection()
+        breaker = CircuitBreaker('test', threshold=1, backoff=0.1)
+        control = PhilipsSICP100(connection)
+        control.set_breaker(breaker)
+        connection.unplugged = True
+        self.assertFalse(control.is_ready_for_commands())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.15)
+        connection.broken = True
+        self.assertRaises(RuntimeError, control.get_power_state)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertAlmostEqual(breaker.current_backoff, 0.1)
+
+        # The next command probes at once
+        connection.broken = False
+        connection.unplugged = False
+        probing = []
+        respond = connection.respond
+        connection.respond = lambda command: probing.append(control._probe_answers) or respond(command)
+        self.assertEqual(control.get_power_state(), control.POWER_STATE_ON)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(probing, [None, None])
+
+    def test_fleet(self):
+        """
+        Offline displays of a fleet fail fast with a DisplayOfflineError
+
+        :return:
+        """
+        connection = UnpluggedConnection()
+        fleet = Fleet([{'name': 'lobby-1', 'vendor': 'PhilipsSICP100', 'port': 'BREAKER0', 'id': 1,
+                        'connection': lambda: connection}])
+        breakers = fleet.use_breakers(threshold=1, backoff=60)
+        connection.unplugged = True
+        fleet.run('is_ready_for_commands')
+        self.assertEqual(breakers['lobby-1'].state, CircuitBreaker.OPEN)
+        result = fleet.run('get_power_state')['lobby-1']
+        self.assertFalse(result['ok'])
+        self.assertTrue(result['error'].startswith('DisplayOfflineError'))
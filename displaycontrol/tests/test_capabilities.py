@@ -0,0 +1,93 @@
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import SamsungEmulatedConnection
+from displaycontrol.connections.tracing import CallbackTracer
+from displaycontrol.fleet import Fleet
+from displaycontrol.handles import build_handles
+from displaycontrol.vendors.benq import BenQLU9235
+from displaycontrol.vendors.capabilities import supports, capabilities, capability_matrix, is_stub
+from displaycontrol.vendors.generic import DisplayGeneric
+from displaycontrol.vendors.philips import PhilipsSICP100, PhilipsSICP188
+from displaycontrol.vendors.samsung import SamsungV065, SamsungSerialDetector
+
+
+class TestCapabilities(TestCase):
+    def test_matrix(self):
+        """
+        Capabilities follow the overridden methods and the protocol version
+
+        :return:
+        """
+        self.assertTrue(is_stub(DisplayGeneric.get_temperature.__func__))
+        self.assertFalse(is_stub(PhilipsSICP100.get_temperature.__func__))
+
+        self.assertFalse(supports(SamsungV065, 'get_control_software_version'))
+        self.assertTrue(supports(SamsungV065, 'get_serialnumber'))
+        self.assertTrue(supports(SamsungV065, 'get_power_state_hr'))
+        self.assertFalse(supports(SamsungV065, 'get_lock_keys_hr'))
+
+        # Overridden, but still a stub
+        self.assertFalse(supports(PhilipsSICP100, 'set_lock_ir_remote'))
+        self.assertTrue(supports(PhilipsSICP188, 'set_lock_ir_remote'))
+
+        # Absolute volume needs either its own command or stepping up and down
+        self.assertTrue(supports(PhilipsSICP100, 'set_audio_volume'))
+        self.assertFalse(supports(BenQLU9235, 'set_audio_volume'))
+        self.assertTrue(supports(BenQLU9235, 'get_input_channel_hr'))
+
+        matrix = capability_matrix()
+        self.assertEqual(matrix['philips_sicp188']['protocol'], 'V1.88')
+        self.assertEqual(matrix['samsung_v065']['protocol'], 'V0.65')
+        self.assertIsNone(matrix['benq_lu9235']['protocol'])
+        self.assertNotIn('get_auto_detect_input_channel', matrix['philips_sicp183']['methods'])
+        self.assertIn('get_auto_detect_input_channel', matrix['philips_sicp184']['methods'])
+        self.assertIs(capabilities(PhilipsSICP188), capabilities('philips_sicp188'))
+
+    def test_targets(self):
+        """
+        Keys, classes, controllers and handles can be asked
+
+        :return:
+        """
+        handle = build_handles([{'name': 'samsung', 'vendor': 'samsung_v065', 'port': 'S0',
+                                 'connection': 'SamsungEmulatedConnection'}])['samsung']
+        for target in ['samsung_v065', SamsungV065, SamsungV065(SamsungEmulatedConnection()), handle]:
+            self.assertTrue(supports(target, 'get_power_state'))
+            self.assertFalse(supports(target, 'get_control_software_version'))
+        self.assertTrue(supports(SamsungV065, 'get_value'))
+        self.assertFalse(supports(SamsungV065, 'get_nothing'))
+
+    def test_fleet(self):
+        """
+        Unsupported commands fail without being sent
+
+        :return:
+        """
+        fleet = Fleet([{'name': 'samsung', 'vendor': 'samsung_v065', 'port': 'S0',
+                        'connection': 'SamsungEmulatedConnection'},
+                       {'name': 'philips', 'vendor': 'philips_sicp100', 'port': 'P0',
+                        'connection': 'PhilipsEmulatedConnection'}])
+        written = []
+        fleet.connections['S0'].add_tracer(CallbackTracer(on_write=lambda *args: written.append(args)))
+        self.assertEqual(fleet.supporting('get_control_software_version'), ['philips'])
+
+        for pipelined in [False, True]:
+            results = fleet.run('get_control_software_version', pipelined=pipelined)
+            self.assertEqual(list(results.keys()), ['samsung', 'philips'])
+            self.assertFalse(results['samsung']['ok'])
+            self.assertTrue(results['samsung']['error'].startswith('CommandNotImplementedError'))
+            self.assertTrue(results['philips']['ok'])
+        self.assertEqual(written, [])
+
+    def test_detector(self):
+        """
+        The Samsung detector does not ask for a control software version
+
+        :return:
+        """
+        detector = SamsungSerialDetector(SamsungEmulatedConnection([1]), ['S0'], [1])
+        called = []
+        detector._command.get_control_software_version = lambda: called.append(True)
+        displays = detector.detect_displays()
+        self.assertEqual(len(displays), 1)
+        self.assertEqual(displays[0]['sicp'], '')
+        self.assertEqual(called, [])
@@ -0,0 +1,64 @@
+import csv
+import json
+import sys
+from StringIO import StringIO
+from unittest import TestCase
+from displaycontrol import cli
+
+
+def run(*argv):
+    """ Runs the command line tool against emulated displays, returns exit code and output """
+    stdout, sys.stdout = sys.stdout, StringIO()
+    try:
+        code = cli.main(['--vendor', 'philips_sicp100', '--connection', 'PhilipsEmulatedConnection',
+                         '--port', 'CLI0'] + list(argv))
+        return code, sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+
+class TestCli(TestCase):
+    def test_json(self):
+        """
+        Values are printed as JSON, the exit code is 0 if every display succeeded
+
+        :return:
+        """
+        code, output = run('--id', '1', 'power')
+        content = json.loads(output)
+        self.assertEqual(code, 0)
+        self.assertEqual([(result['display'], result['ok'], result['value']) for result in content['results']],
+                         [('CLI0:1', True, 'On')])
+        self.assertIn('total_seconds', content)
+
+    def test_csv(self):
+        """
+        A setter that is not acknowledged is a failure
+
+        :return:
+        """
+        code, output = run('--id', '1', '--id', '7', '--format', 'csv', 'power', 'on')
+        rows = list(csv.reader(StringIO(output)))
+        self.assertEqual(code, 1)
+        self.assertEqual(rows[0], ['display', 'ok', 'value', 'error', 'seconds'])
+        self.assertEqual(rows[1][:4], ['CLI0:1', 'True', 'true', ''])
+        self.assertEqual(rows[2][:4], ['CLI0:7', 'False', 'false', 'Not acknowledged'])
+        self.assertEqual(rows[3][:2], ['total', 'False'])
+
+        code, output = run('--id', '1', 'power', 'off')
+        self.assertEqual(code, 0)
+
+    def test_detect(self):
+        """
+        Detection uses the connection and display ids of the command line
+
+        :return:
+        """
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            code, output = run('--id', '1', '--id', '2', '--detect-vendor', 'philips', 'detect')
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(code, 0)
+        [result] = json.loads(output)['results']
+        self.assertEqual([(display['port'], display['id']) for display in result['value']], [('CLI0', 1)])
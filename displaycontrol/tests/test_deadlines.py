@@ -0,0 +1,56 @@
+import sys
+import time
+from StringIO import StringIO
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.exceptions import CommandExpiredError
+from displaycontrol.fleet import Fleet
+from displaycontrol.vendors.philips import PhilipsSICP100, PhilipsSerialDetector
+
+
+class TestDeadlines(TestCase):
+    def test_composite_operation(self):
+        """
+        Read and write of a composite setter share one deadline
+
+        :return:
+        """
+        control = PhilipsSICP100(PhilipsEmulatedConnection(latency=0.2))
+        started = time.time()
+        with control.with_deadline(0.3):
+            # The read gets its answer, the answer of the write comes too late
+            self.assertFalse(control.set_lock_keys(control.LOCKED_ALL))
+            self.assertRaises(CommandExpiredError, control.get_power_state)
+        self.assertLess(time.time() - started, 0.4)
+        self.assertEqual(control.get_power_state(), control.POWER_STATE_ON)
+
+    def test_detector(self):
+        """
+        A detection stops once its deadline passed
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1, 2, 3, 4], latency=0.05)
+        detector = PhilipsSerialDetector(connection, ['D0', 'D1'], [1, 2, 3, 4], deadline=0.3)
+        stdout, sys.stdout = sys.stdout, StringIO()
+        started = time.time()
+        try:
+            displays = detector.detect_displays()
+        finally:
+            sys.stdout = stdout
+        self.assertLess(time.time() - started, 0.45)
+        self.assertLess(len(displays), 8)
+
+    def test_fleet_display_deadline(self):
+        """
+        Every display of a sweep gets the same bounded time
+
+        :return:
+        """
+        fleet = Fleet([{'vendor': 'PhilipsSICP100', 'port': 'SLOW', 'id': display_id,
+                        'connection': 'PhilipsEmulatedConnection', 'settings': {'latency': 0.5}}
+                       for display_id in (1, 2, 3)])
+        started = time.time()
+        results = fleet.run('get_power_state', display_deadline=0.1)
+        self.assertLess(time.time() - started, 0.5)
+        self.assertFalse(any(result['ok'] for result in results.values()))
@@ -0,0 +1,54 @@
+import time
+from unittest import TestCase
+from displaycontrol.vendors.philips import PhilipsSICP188
+from displaycontrol.vendors.samsung import SamsungV065
+from displaycontrol.connections import PendingReply
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, SamsungEmulatedConnection
+from displaycontrol.deferred import DeferredBatch
+
+
+class TestDeferredBatch(TestCase):
+    def test__setter_returns_before_the_answer(self):
+        """
+        In fire and forget mode the setter returns a pending reply right away.
+
+        :return:
+        """
+        ctrl = PhilipsSICP188(PhilipsEmulatedConnection(group_byte=True, latency=0.05))
+        ctrl.set_fire_and_forget(True)
+        started = time.time()
+        reply = ctrl.set_power_state(PhilipsSICP188.POWER_STATE_OFF)
+        self.assertTrue(time.time() - started < 0.05)
+        self.assertTrue(reply.acknowledged())
+        self.assertTrue(time.time() - started >= 0.05)
+
+    def test__answer_windows_overlap(self):
+        """
+        The answer windows of displays on different connections overlap.
+
+        :return:
+        """
+        controls = [SamsungV065(SamsungEmulatedConnection(latency=0.05)) for i in range(5)]
+        batch = DeferredBatch()
+        started = time.time()
+        for ctrl in controls:
+            batch.add(ctrl, 'set_power_state', SamsungV065.POWER_STATE_ON)
+        self.assertEqual(batch.verify(), [])
+        self.assertTrue(time.time() - started < 0.2)
+
+    def test__only_failed_displays_are_repeated(self):
+        """
+        Displays without ack are repeated, the others are not touched again.
+
+        :return:
+        """
+        present = PhilipsSICP188(PhilipsEmulatedConnection(group_byte=True))
+        missing = PhilipsSICP188(PhilipsEmulatedConnection(group_byte=True), 7)
+        batch = DeferredBatch()
+        batch.add(present, 'set_power_state', PhilipsSICP188.POWER_STATE_ON)
+        batch.add(missing, 'set_power_state', PhilipsSICP188.POWER_STATE_ON)
+
+        statuses = [status for control, method, args, status in batch.statuses()]
+        self.assertEqual(statuses, [PendingReply.ACK, PendingReply.MISSING])
+        self.assertEqual(batch.verify(), [(missing, 'set_power_state', (PhilipsSICP188.POWER_STATE_ON,))])
+        self.assertFalse(missing.fire_and_forget)
@@ -0,0 +1,168 @@
+import os
+import time
+from unittest import TestCase
+from displaycontrol.connections import SerialConnection
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.connections.eventloop import EventLoop
+from displaycontrol.connections.parser import HexParser
+from displaycontrol.fleet import Fleet, run_evented
+from displaycontrol.tests.helpers import PseudoTerminalDisplay
+from displaycontrol.vendors.philips import PhilipsSICP100
+
+
+def ports(count, latency):
+    return [{'name': 'port-%d' % port, 'vendor': 'PhilipsSICP100', 'port': 'LOOP%d' % port, 'id': 1,
+             'connection': 'PhilipsEmulatedConnection', 'settings': {'latency': latency}} for port in range(count)]
+
+
+class TestEventLoop(TestCase):
+    def test_fleet(self):
+        """
+        One thread serves all ports at once and gets the same results as a sequential run
+
+        :return:
+        """
+        fleet = Fleet(ports(16, 0.1))
+        with EventLoop() as loop:
+            started = time.time()
+            results = fleet.run('get_power_state', event_loop=loop)
+            self.assertLess(time.time() - started, 0.6)
+        self.assertEqual([result['value'] for result in results.values()], [1] * 16)
+        self.assertEqual(fleet.run('get_power_state', names=['port-0'])['port-0']['value'], 1)
+
+    def test_several_frames(self):
+        """
+        Every frame of a method is served by the loop, not only the first one
+
+        :return:
+        """
+        def power_and_input(controller):
+            return controller.get_power_state(), controller.get_input_channel()
+        fleet = Fleet(ports(16, 0.1))
+        with EventLoop() as loop:
+            started = time.time()
+            results = fleet.run(power_and_input, event_loop=loop)
+            self.assertLess(time.time() - started, 0.8)
+        expected = power_and_input(fleet.controller('port-0'))
+        self.assertEqual([result['value'] for result in results.values()], [expected] * 16)
+
+    def test_arbiter(self):
+        """
+        The loop holds the arbiter of a port for every exchange and waits for other threads
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1], latency=0.2)
+        connection.port = 'LOOP-ARBITER'
+        arbiter = connection.arbiter()
+        loop = EventLoop()
+        loop.start()
+        try:
+            with arbiter:
+                request = loop.submit(connection, '\x04\x01\x19\x1c', PhilipsSICP100(connection).framer())
+                self.assertIsNone(request.result(0.3))
+            time.sleep(0.1)
+            self.assertTrue(arbiter.is_held())
+            self.assertEqual(request.result(1), '\x05\x01\x19\x02\x1f')
+            self.assertFalse(arbiter.is_held())
+        finally:
+            loop.close()
+
+    def test_timeout(self):
+        """
+        Silent displays time out without holding up the others on the same port
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1])
+        connection.port = 'LOOP-SILENT'
+        framer = PhilipsSICP100(connection).framer()
+        with EventLoop() as loop:
+            silent = loop.submit(connection, '\x04\x02\x19\x1f', framer, timeout=0.1)
+            answered = loop.submit(connection, '\x04\x01\x19\x1c', framer, timeout=0.1)
+            loop.run_until_complete([silent, answered])
+        self.assertEqual(silent.result(), '')
+        self.assertEqual(HexParser().parse(answered.result()), ['05', '01', '19', '02', '1F'])
+
+    def test_errors(self):
+        """
+        Failing callbacks and framers only fail their request, a dead loop answers all
+        requests it still had
+
+        :return:
+        """
+        def fail(request):
+            raise ValueError('callback')
+
+        class BrokenFramer(object):
+            def reset(self):
+                pass
+
+            def request_key(self, command):
+                return None
+
+            def feed(self, data):
+                raise ValueError('framer')
+
+        connection = PhilipsEmulatedConnection([1])
+        connection.port = 'LOOP-ERRORS'
+        framer = PhilipsSICP100(connection).framer()
+        with EventLoop() as loop:
+            first = loop.submit(connection, '\x04\x01\x19\x1c', framer, callback=fail)
+            loop.run_until_complete([first])
+            self.assertIsInstance(first.callback_error, ValueError)
+            broken = loop.submit(connection, '\x04\x01\x19\x1c', BrokenFramer())
+            second = loop.submit(connection, '\x04\x01\x19\x1c', framer)
+            loop.run_until_complete([broken, second])
+            self.assertEqual(broken.result(), '')
+            self.assertEqual(second.result(), '\x05\x01\x19\x02\x1f')
+
+        connection = PhilipsEmulatedConnection([1], latency=0.5)
+        connection.port = 'LOOP-DEAD'
+        with EventLoop() as loop:
+            waiting = loop.submit(connection, '\x04\x01\x19\x1c', framer, timeout=5)
+            queued = loop.submit(connection, '\x04\x01\x19\x1c', framer, timeout=5)
+            loop.call_later(0.05, lambda: 1 / 0)
+            self.assertRaises(ZeroDivisionError, loop.run_until_complete, [waiting])
+            self.assertEqual((waiting.result(0), queued.result(0)), ('', ''))
+            self.assertEqual(loop.submit(connection, '\x04\x01\x19\x1c', framer).result(0), '')
+            self.assertFalse(connection.arbiter().is_held())
+
+    def test_evented_rounds(self):
+        """
+        Methods sending more frames than run_evented allows fail
+
+        :return:
+        """
+        def chatty(controller):
+            for frame in range(5):
+                controller.get_power_state()
+            return True
+        fleet = Fleet(ports(2, 0))
+        with EventLoop() as loop:
+            self.assertTrue(fleet.run(chatty, event_loop=loop)['port-0']['value'])
+            results = run_evented(fleet.controllers.items(), chatty, (), loop, max_rounds=3)
+        self.assertEqual([result['ok'] for result in results.values()], [False, False])
+        self.assertIn('more than 3 frames', results['port-1']['error'])
+
+    def test_serial_port(self):
+        """
+        Serial ports are opened non-blocking and served in a background thread
+
+        :return:
+        """
+        display = PseudoTerminalDisplay()
+        display.start()
+        connection = SerialConnection()
+        connection.port = display.path
+        loop = EventLoop()
+        loop.start()
+        try:
+            request = loop.submit(connection, '\x04\x01\x19\x1c', PhilipsSICP100(connection).framer())
+            self.assertEqual(request.result(2), '\x05\x01\x19\x02\x1f')
+            # Without a framer the answer ends once the line stays quiet
+            self.assertEqual(loop.submit(connection, '\x04\x01\x19\x1c').result(2), '\x05\x01\x19\x02\x1f')
+        finally:
+            loop.close()
+            os.close(display.master)
+            os.close(display.slave)
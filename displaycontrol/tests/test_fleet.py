@@ -0,0 +1,144 @@
+import os
+import time
+from unittest import TestCase
+from displaycontrol.connections.eventloop import EventLoop
+from displaycontrol.vendors.philips import PhilipsSICP188
+from displaycontrol.fleet import Fleet, ShardedFleet
+
+
+class CrashingDisplay(PhilipsSICP188):
+    def crash(self):
+        os._exit(3)
+
+
+def inventory(ports=4, ids=3):
+    displays = []
+    for port in range(ports):
+        for display_id in range(1, ids + 1):
+            displays.append({
+                'vendor': 'PhilipsSICP188',
+                'port': 'EMULATED%d' % port,
+                'id': display_id,
+                'connection': 'PhilipsEmulatedConnection',
+                'settings': {'group_byte': True, 'display_ids': range(1, ids + 1)},
+            })
+    return displays
+
+
+def values(results):
+    return dict((name, (result['ok'], result['value'])) for name, result in results.items())
+
+
+class TestFleet(TestCase):
+    def test__displays_on_a_port_share_the_connection(self):
+        """
+        One connection is created per port.
+
+        :return:
+        """
+        fleet = Fleet(inventory(2, 3))
+        self.assertEqual(len(fleet.connections), 2)
+        self.assertTrue(fleet.controller('EMULATED0:1').connection is fleet.controller('EMULATED0:3').connection)
+
+    def test__errors_are_reported_per_display(self):
+        """
+        A failing display does not stop the others.
+
+        :return:
+        """
+        fleet = Fleet(inventory(1, 2))
+        results = fleet.run('set_audio_volume', (101,))
+        self.assertFalse(results['EMULATED0:1']['ok'])
+        self.assertTrue(results['EMULATED0:1']['error'].startswith('CommandArgumentsNotSupportedError'))
+
+
+    def test__pipelines_leave_the_controllers_alone(self):
+        """
+        Capturing and prefetching run on a copy of the controller, other threads may use
+        the controller meanwhile.
+
+        :return:
+        """
+        fleet = Fleet(inventory(1, 2))
+        controller = fleet.controller('EMULATED0:1')
+        connection = controller.connection
+        seen = []
+
+        def power_state(bound):
+            seen.append((bound is controller, controller.connection is connection))
+            return bound.get_power_state()
+        results = fleet.run(power_state, names=['EMULATED0:1'], pipelined=True)
+        self.assertEqual(results['EMULATED0:1']['value'], controller.POWER_STATE_ON)
+        self.assertEqual(seen, [(False, True), (False, True)])
+
+    def test__pipelines_do_not_poll_or_probe_while_capturing(self):
+        """
+        Capturing the first frame neither waits for the deadline of a polling method nor
+        uses up the probe of a breaker.
+
+        :return:
+        """
+        fleet = Fleet(inventory(1, 2))
+        with EventLoop() as loop:
+            for options in [{'pipelined': True}, {'event_loop': loop}]:
+                started = time.time()
+                results = fleet.run('wait_until_ready', (3,), **options)
+                self.assertLess(time.time() - started, 1)
+                self.assertEqual(values(results), {'EMULATED0:1': (True, True), 'EMULATED0:2': (True, True)})
+
+        breakers = fleet.use_breakers(threshold=1, backoff=0)
+        for breaker in breakers.values():
+            breaker.record_failure()
+            self.assertEqual(breaker.state, breaker.OPEN)
+        results = fleet.run('get_power_state', pipelined=True)
+        self.assertTrue(all(result['ok'] for result in results.values()))
+        self.assertEqual([breaker.state for breaker in breakers.values()], ['closed', 'closed'])
+
+    def test__ports_run_in_parallel(self):
+        """
+        With concurrency, the ports are served at the same time, displays on one port
+        still run one after another.
+
+        :return:
+        """
+        displays = inventory(4, 2)
+        for spec in displays:
+            spec['settings']['latency'] = 0.05
+        fleet = Fleet(displays)
+        started = time.time()
+        results = fleet.run('get_power_state', concurrency=4)
+        self.assertTrue(time.time() - started < 0.2)
+        self.assertEqual(results.keys(), fleet.names())
+        self.assertTrue(all(result['ok'] for result in results.values()))
+
+
+class TestShardedFleet(TestCase):
+    def test__results_match_in_process_execution(self):
+        """
+        The worker processes deliver the same results as the in process fleet.
+
+        :return:
+        """
+        expected = Fleet(inventory()).run('get_power_state')
+        with ShardedFleet(inventory(), processes=3) as fleet:
+            self.assertEqual(values(fleet.run('get_power_state')), values(expected))
+            self.assertEqual(fleet.run('set_power_state', (PhilipsSICP188.POWER_STATE_OFF,)).keys(),
+                             expected.keys())
+            for result in fleet.run('get_power_state_hr').values():
+                self.assertEqual(result['value'], 'Off')
+
+    def test__crashed_worker_is_restarted(self):
+        """
+        A crashing worker only affects its own displays and is replaced.
+
+        :return:
+        """
+        displays = inventory(2, 1)
+        displays[0]['vendor'] = CrashingDisplay
+        with ShardedFleet(displays, processes=2) as fleet:
+            results = fleet.run('crash', names=['EMULATED0:1'])
+            self.assertTrue(results['EMULATED0:1']['error'].startswith('WorkerCrashedError'))
+            self.assertEqual(fleet.restarts, 2)
+            results = fleet.run('get_power_state')
+            self.assertTrue(results['EMULATED0:1']['ok'])
+            self.assertTrue(results['EMULATED1:1']['ok'])
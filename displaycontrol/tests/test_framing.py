@@ -0,0 +1,128 @@
+import time
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, SamsungEmulatedConnection
+from displaycontrol.connections.framing import PhilipsFramer, SamsungFramer, StreamDemultiplexer
+from displaycontrol.exceptions import CommandResponseMalformedError
+from displaycontrol.fleet import Fleet
+from displaycontrol.vendors.philips import PhilipsSICP100
+from displaycontrol.vendors.samsung import SamsungV065
+from displaycontrol.tools import Tools
+
+
+def philips_frame(values):
+    frame = [len(values) + 2] + values
+    xor = 0x00
+    for value in frame:
+        xor = xor ^ value
+    return Tools.list_to_bytes(frame + [xor])
+
+
+def samsung_frame(display_id, command, values):
+    frame = [0xAA, 0xFF, display_id, len(values) + 2, ord('A'), command] + values
+    return Tools.list_to_bytes(frame + [sum(frame[1:]) & 0xFF])
+
+
+def inventory(vendor, connection, ids):
+    return [{'vendor': vendor, 'port': 'PIPELINE-' + vendor, 'id': display_id, 'connection': connection,
+             'settings': {'display_ids': ids, 'latency': 0.05}} for display_id in ids]
+
+
+class NoisyConnection(PhilipsEmulatedConnection):
+    """ Adds noise around every answer, or corrupts the checksum """
+    corrupt = False
+
+    def respond(self, command):
+        out = PhilipsEmulatedConnection.respond(self, command)
+        if self.corrupt:
+            return out[:-1] + chr(ord(out[-1]) ^ 0xFF)
+        return '\x00\xfe' + out + '\x13'
+
+
+class TestFraming(TestCase):
+    def test_resync(self):
+        """
+        Noise and broken frames are skipped, frames split across chunks are completed
+
+        :return:
+        """
+        power = philips_frame([0x01, 0x19, 0x02])
+        ack = philips_frame([0x02, 0x00, 0x06])
+        broken = power[:-1] + chr(ord(power[-1]) ^ 0xFF)
+        stream = '\xff\x00' + broken + power + '\x13' + ack
+
+        framer = PhilipsFramer()
+        frames = []
+        for start in range(0, len(stream), 2):
+            frames.extend(framer.feed(stream[start:start + 2]))
+        self.assertEqual([(frame.display_id, frame.command) for frame in frames], [(1, 0x19), (2, 0x00)])
+        self.assertEqual(frames[0].raw, power)
+
+        framer = SamsungFramer()
+        volume = samsung_frame(3, 0x12, [0x1E])
+        frames = framer.feed('\xaa\x00' + volume[:4]) + framer.feed(volume[4:])
+        self.assertEqual([(frame.display_id, frame.command, frame.raw) for frame in frames], [(3, 0x12, volume)])
+
+    def test_decode(self):
+        """
+        Complete answers are decoded in one pass, noise and frames cut off at the end are dropped
+
+        :return:
+        """
+        power = philips_frame([0x01, 0x19, 0x02])
+        framer = PhilipsFramer()
+        frames = framer.decode('\xff' + power + '\x07\x01')
+        self.assertEqual([frame.raw for frame in frames], [power])
+        self.assertEqual(framer.skipped, 3)
+
+        volume = samsung_frame(3, 0x12, [0x1E])
+        frames = SamsungFramer().decode(bytearray('\xaa\x00' + volume + volume[:5]))
+        self.assertEqual([frame.raw for frame in frames], [volume])
+
+    def test_validated_answers(self):
+        """
+        Controllers get the valid frame out of a noisy answer and an error for a corrupt one
+
+        :return:
+        """
+        connection = NoisyConnection()
+        control = PhilipsSICP100(connection)
+        self.assertEqual(control.get_power_state(), control.POWER_STATE_ON)
+        connection.corrupt = True
+        self.assertRaises(CommandResponseMalformedError, control.get_power_state)
+
+        # Checksums of payloads summing up to more than a byte are cut to the lowest byte
+        samsung = SamsungV065(SamsungEmulatedConnection([1]))
+        self.assertTrue(samsung.is_answer_ack(samsung.command(0x12, [0xFF])))
+
+    def test_demultiplexer(self):
+        """
+        Answers are routed by display id and command code, whatever order they arrive in
+
+        :return:
+        """
+        demultiplexer = StreamDemultiplexer(PhilipsFramer())
+        power = demultiplexer.expect((1, 0x19))
+        volume = demultiplexer.expect((2, 0x45))
+        missing = demultiplexer.expect((3, 0x19))
+        demultiplexer.feed(philips_frame([0x02, 0x45, 0x1E, 0x1E]) + philips_frame([0x01, 0x19, 0x02]))
+        self.assertEqual(demultiplexer.answer(power), philips_frame([0x01, 0x19, 0x02]))
+        self.assertEqual(demultiplexer.answer(volume), philips_frame([0x02, 0x45, 0x1E, 0x1E]))
+        self.assertEqual(demultiplexer.answer(missing), '')
+        self.assertFalse(demultiplexer.is_complete())
+
+    def test_pipelined_fleet(self):
+        """
+        Pipelined runs return the same as sequential runs, without waiting per display
+
+        :return:
+        """
+        for vendor, connection in [('PhilipsSICP100', 'PhilipsEmulatedConnection'),
+                                   ('SamsungV065', 'SamsungEmulatedConnection')]:
+            fleet = Fleet(inventory(vendor, connection, [1, 2, 3, 4]))
+            sequential = fleet.run('get_audio_volume')
+            started = time.time()
+            pipelined = fleet.run('get_audio_volume', pipelined=True)
+            self.assertLess(time.time() - started, 0.15)
+            self.assertEqual([result['value'] for result in pipelined.values()],
+                             [result['value'] for result in sequential.values()])
+            self.assertTrue(all(result['ok'] for result in pipelined.values()))
@@ -0,0 +1,121 @@
+import json
+import threading
+import urllib2
+from unittest import TestCase
+from displaycontrol.gateway import Gateway, GatewayServer
+
+
+def displays():
+    return [
+        {'name': 'left', 'vendor': 'PhilipsSICP188', 'port': 'EMULATED0', 'id': 1, 'groups': ['wall'],
+         'connection': 'PhilipsEmulatedConnection', 'settings': {'group_byte': True, 'latency': 0.05}},
+        {'name': 'right', 'vendor': 'SamsungV065', 'port': 'EMULATED1', 'id': 1, 'groups': ['wall'],
+         'connection': 'SamsungEmulatedConnection'},
+    ]
+
+
+class TestGateway(TestCase):
+    def setUp(self):
+        self.gateway = Gateway(displays(), ttl=60)
+        self.frames = []
+        connection = self.gateway.fleet.connections['EMULATED0']
+        respond = connection.respond
+        connection.respond = lambda command: self.frames.append(command) or respond(command)
+
+        self.server = GatewayServer(('127.0.0.1', 0), self.gateway)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, path, value=None):
+        request = urllib2.Request(self.url + path)
+        if value is not None:
+            request.add_data(json.dumps({'value': value}))
+            request.get_method = lambda: 'PUT'
+        try:
+            return json.loads(urllib2.urlopen(request).read())
+        except urllib2.HTTPError, err:
+            return {'status': err.code}
+
+    def test__concurrent_reads_are_coalesced(self):
+        """
+        Identical reads that arrive at the same time cause only one frame on the wire.
+
+        :return:
+        """
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.request('/displays/left/power_state')))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([result['value'] for result in results], [1] * 5)
+        self.assertEqual(len(self.frames), 1)
+
+    def test__fresh_values_come_from_cache(self):
+        """
+        A second read is served from the cache, writing invalidates it.
+
+        :return:
+        """
+        self.assertFalse(self.request('/displays/left/audio_volume')['cached'])
+        self.assertTrue(self.request('/displays/left/audio_volume')['cached'])
+        self.assertTrue(self.request('/displays/left/audio_volume', 42)['result'])
+        result = self.request('/displays/left/audio_volume')
+        self.assertEqual((result['value'], result['cached']), (42, False))
+
+    def test__read_racing_a_write_is_not_cached(self):
+        """
+        A value read before a write, but stored after it, is not served from the cache.
+
+        :return:
+        """
+        answered, written = threading.Event(), threading.Event()
+        call = self.gateway.call
+
+        def slow_read(name, method, priority, *args):
+            result = call(name, method, priority, *args)
+            if method.startswith('get_'):
+                answered.set()
+                written.wait(5)
+            return result
+        self.gateway.call = slow_read
+
+        reader = threading.Thread(target=self.gateway.read, args=('left', 'audio_volume'))
+        reader.start()
+        answered.wait(5)
+        self.gateway.write('left', 'audio_volume', 42)
+        written.set()
+        reader.join()
+        self.assertEqual(self.gateway.read('left', 'audio_volume'), (42, False))
+
+    def test__groups_and_errors(self):
+        """
+        Groups read every member, unknown displays and attributes are reported.
+
+        :return:
+        """
+        result = self.request('/groups/wall/power_state')
+        self.assertEqual(sorted(result.keys()), ['left', 'right'])
+        self.assertTrue(result['right']['ok'])
+        self.assertEqual(self.request('/displays/nobody/power_state'), {'status': 404})
+        self.assertEqual(self.request('/displays/left/__init__'), {'status': 404})
+        self.assertEqual(self.request('/displays/right/temperature'), {'status': 501})
+
+    def test__helpers_are_not_reachable(self):
+        """
+        Setters and getters that are not commands can not be called over HTTP.
+
+        :return:
+        """
+        for attribute in ['connection', 'display_id', 'breaker', 'priority', 'fire_and_forget']:
+            self.assertEqual(self.request('/displays/left/%s' % attribute, 'foo'), {'status': 404})
+        for attribute in ['static_value', 'answer_data']:
+            self.assertEqual(self.request('/displays/left/%s' % attribute), {'status': 404})
+        self.assertEqual(self.request('/displays/left/power_state')['value'], 1)
@@ -0,0 +1,35 @@
+from unittest import TestCase
+from displaycontrol.vendors.generic import DisplayGeneric
+from displaycontrol.connections.testconnection import TestConnection
+
+
+class SteppingDisplay(DisplayGeneric):
+    """ Display that only knows volume higher / lower commands """
+    volume = 10
+    steps = 0
+
+    def get_audio_volume(self):
+        return self.volume
+
+    def set_audio_volume_higher(self):
+        self.steps += 1
+        self.volume = min(self.volume + 1, 100)
+
+    def set_audio_volume_lower(self):
+        self.steps += 1
+        self.volume = max(self.volume - 1, 0)
+
+
+class TestDisplayGeneric(TestCase):
+    def test__absolute_setter_falls_back_to_stepping(self):
+        """
+        Without an absolute command the value is reached with higher / lower steps.
+
+        :return:
+        """
+        ctrl = SteppingDisplay(TestConnection())
+        self.assertTrue(ctrl.set_audio_volume(60))
+        self.assertEqual(ctrl.volume, 60)
+        self.assertEqual(ctrl.steps, 50)
+        self.assertTrue(ctrl.set_audio_volume(55))
+        self.assertEqual(ctrl.volume, 55)
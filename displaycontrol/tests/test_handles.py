@@ -0,0 +1,54 @@
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.handles import DisplayHandle, protocol_for, build_handles
+from displaycontrol.vendors.generic import DisplayGeneric
+from displaycontrol.vendors.philips import PhilipsSICP188
+
+
+class TestHandles(TestCase):
+    def test_handle(self):
+        """
+        Handles work like controllers, without a dict of their own
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1, 2], group_byte=True)
+        protocol = protocol_for('philips_sicp188')
+        self.assertIs(protocol, protocol_for(PhilipsSICP188))
+        handle = DisplayHandle(protocol, connection, 2)
+        self.assertFalse(hasattr(handle, '__dict__'))
+        self.assertTrue(handle.set_power_state(handle.POWER_STATE_OFF))
+        self.assertEqual(handle.get_power_state(), PhilipsSICP188.POWER_STATE_OFF)
+        self.assertEqual(DisplayHandle(protocol, connection, 1).get_power_state(), PhilipsSICP188.POWER_STATE_ON)
+        self.assertIs(handle.input_channel_get, PhilipsSICP188.input_channel_get)
+        self.assertRaises(AttributeError, getattr, handle, 'unknown')
+
+        # Settings of the controller would be lost after the call
+        for setter in ['set_breaker', 'set_fire_and_forget', 'set_priority', 'set_display_id']:
+            self.assertRaises(AttributeError, getattr, handle, setter)
+        controller = handle.controller()
+        self.assertEqual(controller.display_id, 2)
+        self.assertIs(controller.static_values, protocol.static_values)
+
+    def test_build_handles(self):
+        """
+        Displays on the same port share the connection
+
+        :return:
+        """
+        handles = build_handles([{'name': 'a', 'vendor': 'PhilipsSICP100', 'port': 'HANDLES', 'id': 1,
+                                  'connection': 'PhilipsEmulatedConnection'},
+                                 {'name': 'b', 'vendor': 'PhilipsSICP100', 'port': 'HANDLES', 'id': 2,
+                                  'connection': 'PhilipsEmulatedConnection'}])
+        self.assertIs(handles['a'].connection, handles['b'].connection)
+        self.assertIs(handles['a'].protocol, handles['b'].protocol)
+        self.assertEqual(handles['b'].display_id, 2)
+
+    def test_no_shared_defaults(self):
+        """
+        Controllers and detectors do not share mutable class attributes
+
+        :return:
+        """
+        self.assertIsNone(DisplayGeneric.connection)
+        self.assertNotIn('_displays', vars(DisplayGeneric))
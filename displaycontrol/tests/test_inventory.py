@@ -0,0 +1,134 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.inventory import Inventory
+from displaycontrol.vendors.philips import PhilipsSerialDetector, PhilipsSICP188, sicp_key_for_version
+from StringIO import StringIO
+
+
+class CountingDetectors:
+    """ Detector factories for emulated Philips displays, counting the ports they scan """
+
+    def __init__(self, display_ids):
+        self.display_ids = display_ids
+        self.scanned = []
+
+    def __call__(self, ports):
+        self.scanned.extend(ports)
+        connection = PhilipsEmulatedConnection(self.display_ids, group_byte=True)
+        return PhilipsSerialDetector(connection, ports, range(1, 4))
+
+
+class TestInventory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'displays.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rescan(self, inventory, detectors, ports, full_interval=None):
+        settings = {'group_byte': True, 'display_ids': [1, 2]}
+        # The detectors print their progress
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            return inventory.rescan([detectors], ports, 'PhilipsEmulatedConnection', settings, full_interval)
+        finally:
+            sys.stdout = stdout
+
+    def test_sicp_key_for_version(self):
+        """
+        Reported SICP versions map to the closest older controller
+
+        :return:
+        """
+        self.assertEqual(sicp_key_for_version('V1.88', 'philips_sicp186'), 'philips_sicp188')
+        self.assertEqual(sicp_key_for_version('V1.81', 'philips_sicp100', 185), 'philips_sicp180')
+        self.assertEqual(sicp_key_for_version('V1.88', 'philips_sicp100', 185), 'philips_sicp185')
+        self.assertEqual(sicp_key_for_version('', 'philips_sicp186'), 'philips_sicp186')
+
+    def test_persist_and_rescan(self):
+        """
+        Detected displays are stored and rescans only detect changed ports
+
+        :return:
+        """
+        detectors = CountingDetectors([1, 2])
+        inventory = Inventory(self.filename)
+        changes = self.rescan(inventory, detectors, ['E0', 'E1'])
+        self.assertEqual(changes['added'], ['E0:1', 'E0:2', 'E1:1', 'E1:2'])
+        self.assertEqual(detectors.scanned, ['E0', 'E1'])
+        inventory.save()
+
+        # Controllers straight from the file
+        inventory = Inventory(self.filename).load()
+        self.assertEqual(inventory.displays[('E0', 1)]['vendor'], 'philips_sicp188')
+        self.assertEqual(inventory.displays[('E0', 1)]['attributes']['serial'], 'EMU0000001')
+        fleet = inventory.fleet()
+        self.assertIsInstance(fleet.controller('E1:2'), PhilipsSICP188)
+        self.assertEqual(fleet.call('E1:2', 'get_power_state'), PhilipsSICP188.POWER_STATE_ON)
+
+        # Nothing changed, no detection
+        detectors.scanned = []
+        changes = self.rescan(inventory, detectors, ['E0', 'E1'])
+        self.assertEqual(detectors.scanned, [])
+        self.assertEqual(changes['added'] + changes['removed'], [])
+
+        # Display 2 on E1 disappears, E2 is new and E0 is gone
+        inventory.displays[('E1', 2)]['settings'] = {'group_byte': True, 'display_ids': [1]}
+        detectors.display_ids = [1]
+        changes = self.rescan(inventory, detectors, ['E1', 'E2'])
+        self.assertEqual(detectors.scanned, ['E1', 'E2'])
+        self.assertEqual(changes['added'], ['E2:1'])
+        self.assertEqual(changes['removed'], ['E0:1', 'E0:2', 'E1:2'])
+        self.assertEqual(sorted(inventory.displays.keys()), [('E1', 1), ('E2', 1)])
+
+    def test_save_without_file(self):
+        """
+        An inventory without a file is saved to the given target or refused
+
+        :return:
+        """
+        inventory = Inventory()
+        self.rescan(inventory, CountingDetectors([1]), ['E0'])
+        self.assertRaises(ValueError, inventory.save)
+        inventory.save(self.filename)
+        self.assertEqual(list(Inventory(self.filename).load().displays.keys()), [('E0', 1)])
+
+    def test_rescan_finds_new_displays(self):
+        """
+        Ports are detected again for all display ids if an answer changed or the last
+        detection is older than the full interval
+
+        :return:
+        """
+        detectors = CountingDetectors([1])
+        inventory = Inventory(self.filename)
+        self.assertEqual(self.rescan(inventory, detectors, ['E0'])['added'], ['E0:1'])
+
+        # Display 2 is added, the answer of display 1 stays the same
+        detectors.display_ids = [1, 2]
+        detectors.scanned = []
+        self.assertEqual(self.rescan(inventory, detectors, ['E0'])['scanned'], [])
+        self.assertTrue(inventory.displays[('E0', 1)]['answered'])
+
+        # The power state stored by older files is not compared
+        inventory.displays[('E0', 1)]['probe'] = PhilipsSICP188.POWER_STATE_OFF
+        self.assertEqual(self.rescan(inventory, detectors, ['E0'])['scanned'], [])
+        self.assertNotIn('probe', inventory.displays[('E0', 1)])
+
+        # Display 1 did not answer during the last rescan
+        inventory.displays[('E0', 1)]['answered'] = False
+        changes = self.rescan(inventory, detectors, ['E0'])
+        self.assertEqual(changes['scanned'], ['E0'])
+        self.assertEqual(changes['added'], ['E0:2'])
+
+        # Display 3 is only found by a full rescan
+        detectors.display_ids = [1, 2, 3]
+        self.assertEqual(self.rescan(inventory, detectors, ['E0'], full_interval=3600)['added'], [])
+        changes = self.rescan(inventory, detectors, ['E0'], full_interval=0)
+        self.assertEqual(changes['scanned'], ['E0'])
+        self.assertEqual(changes['added'], ['E0:3'])
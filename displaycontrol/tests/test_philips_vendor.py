@@ -0,0 +1,105 @@
+from unittest import TestCase
+from displaycontrol.vendors.philips import PhilipsSICP100, PhilipsSICP186, PhilipsSICP188
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.exceptions import CommandArgumentsNotSupportedError
+from displaycontrol.vendors.generic import invalidate_static_values
+
+
+class TestPhilipsSICP188(TestCase):
+    def setUp(self):
+        self.con = PhilipsEmulatedConnection(group_byte=True)
+        self.ctrl = PhilipsSICP188(self.con)
+
+    def test__absolute_volume_is_a_single_frame(self):
+        """
+        Setting the volume uses the absolute volume command instead of stepping.
+
+        :return:
+        """
+        self.assertTrue(self.ctrl.set_audio_volume(60))
+        self.assertEqual(self.ctrl.get_audio_volume(), 60)
+
+    def test__video_parameters_keep_the_other_values(self):
+        """
+        Brightness, color, contrast and sharpness share one command, setting one of
+        them must not change the others.
+
+        :return:
+        """
+        self.assertTrue(self.ctrl.set_picture_brightness(10))
+        self.assertTrue(self.ctrl.set_picture_sharpness(90))
+        self.assertEqual(self.ctrl.get_picture_brightness(), 10)
+        self.assertEqual(self.ctrl.get_picture_color(), 50)
+        self.assertEqual(self.ctrl.get_picture_contrast(), 50)
+        self.assertEqual(self.ctrl.get_picture_sharpness(), 90)
+
+    def test__values_out_of_range_are_rejected(self):
+        """
+        Absolute values have to be within 0 and 100.
+
+        :return:
+        """
+        self.assertRaises(CommandArgumentsNotSupportedError, self.ctrl.set_audio_volume, 101)
+        self.assertRaises(CommandArgumentsNotSupportedError, self.ctrl.set_picture_contrast, -1)
+
+
+    def test__failover_slots_are_asked_only_once(self):
+        """
+        Setting the failover list needs the number of slots, which is only asked the
+        first time. The list of the caller is left untouched.
+
+        :return:
+        """
+        frames = []
+        respond = self.con.respond
+        self.con.respond = lambda command: frames.append(ord(command[3])) or respond(command)
+        # The number of slots is kept for the port and display id
+        self.con.port = 'SLOTS'
+        invalidate_static_values('SLOTS')
+
+        setting = [0x0D, 0x06]
+        self.assertTrue(self.ctrl.set_failover_input_setting(setting))
+        self.assertTrue(self.ctrl.set_failover_input_setting(setting))
+        self.assertEqual(frames, [0xA6, 0xA5, 0xA5])
+        self.assertEqual(setting, [0x0D, 0x06])
+        self.assertEqual(len(self.ctrl.get_failover_input_setting()), 14)
+
+        # Another controller for the same display does not ask again
+        del frames[:]
+        self.assertTrue(PhilipsSICP188(self.con).set_failover_input_setting(setting))
+        self.assertEqual(frames, [0xA5])
+
+        # Once the port is detected again, or without a port, the display is asked again
+        del frames[:]
+        invalidate_static_values('SLOTS', 1)
+        self.assertTrue(self.ctrl.set_failover_input_setting(setting))
+        self.con.port = None
+        self.assertTrue(self.ctrl.set_failover_input_setting(setting))
+        self.assertEqual(frames, [0xA6, 0xA5, 0xA6, 0xA5])
+
+
+class TestPhilipsSICP100(TestCase):
+    def test__absolute_volume_before_sicp186(self):
+        """
+        The frame layout without group byte works for absolute values, too.
+
+        :return:
+        """
+        ctrl = PhilipsSICP100(PhilipsEmulatedConnection())
+        self.assertTrue(ctrl.set_audio_volume(5))
+        self.assertEqual(ctrl.get_audio_volume(), 5)
+
+    def test__protocol_versions_share_a_connection(self):
+        """
+        Every controller parses the answers with the framer of its own protocol version,
+        the parser of the shared connection is left alone.
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection()
+        parser = connection.parser
+        newer = PhilipsSICP186(connection)
+        ctrl = PhilipsSICP100(connection)
+        self.assertIs(connection.parser, parser)
+        self.assertEqual(ctrl.get_power_state(), ctrl.POWER_STATE_ON)
+        self.assertEqual(newer.answer_parser.framer.header_length, 3)
@@ -0,0 +1,195 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from displaycontrol.connections import SerialConnection
+from displaycontrol.connections.arbiter import PortArbiter, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, scheduling
+from displaycontrol.connections.broker import PortBroker, BrokerConnection
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.connections.parser import HexParser
+from displaycontrol.deadline import Deadline
+from displaycontrol.exceptions import CommandExpiredError
+from displaycontrol.tests.helpers import PseudoTerminalDisplay
+from displaycontrol.vendors.philips import PhilipsSICP188
+
+
+class CollisionCountingConnection(PhilipsEmulatedConnection):
+    """ Counts frames that were answered while another frame was on the wire """
+    collisions = 0
+    active = 0
+
+    def respond(self, command):
+        CollisionCountingConnection.active += 1
+        if CollisionCountingConnection.active > 1:
+            CollisionCountingConnection.collisions += 1
+        try:
+            return PhilipsEmulatedConnection.respond(self, command)
+        finally:
+            CollisionCountingConnection.active -= 1
+
+
+def hammer(controllers, results):
+    """ Runs volume setters and getters on every controller in its own thread """
+    def worker(control, volume):
+        for i in range(5):
+            control.set_audio_volume(volume)
+            results.append(control.get_audio_volume() == volume)
+
+    threads = [threading.Thread(target=worker, args=(control, 10 + index))
+               for index, control in enumerate(controllers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestPortArbitration(TestCase):
+    def setUp(self):
+        CollisionCountingConnection.collisions = 0
+
+    def test_threads(self):
+        """
+        Separate connections on the same port take turns
+
+        :return:
+        """
+        results = []
+        controllers = []
+        for display_id in (1, 2, 3):
+            connection = CollisionCountingConnection([1, 2, 3], 0.002, group_byte=True)
+            connection.port = 'ARBITRATED'
+            controllers.append(PhilipsSICP188(connection, display_id))
+        hammer(controllers, results)
+        self.assertEqual(CollisionCountingConnection.collisions, 0)
+        self.assertEqual(results, [True] * 15)
+
+    def test_broker(self):
+        """
+        Clients of the broker get the answers of their own commands
+
+        :return:
+        """
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'port.sock')
+        connection = CollisionCountingConnection([1, 2, 3], 0.002, group_byte=True)
+        connection.port = 'BROKERED'
+        broker = PortBroker(connection, path)
+        thread = threading.Thread(target=broker.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            results = []
+            controllers = [PhilipsSICP188(BrokerConnection(path), display_id) for display_id in (1, 2, 3)]
+            hammer(controllers, results)
+            self.assertEqual(CollisionCountingConnection.collisions, 0)
+            self.assertEqual(results, [True] * 15)
+        finally:
+            broker.shutdown()
+            broker.server_close()
+            shutil.rmtree(directory)
+
+    def test_priorities(self):
+        """
+        Interactive commands go first, expired background commands are dropped
+
+        :return:
+        """
+        arbiter = PortArbiter('PRIORITIES')
+        order = []
+
+        def waiter(name, priority, deadline=None):
+            try:
+                with scheduling(priority, deadline):
+                    arbiter.acquire()
+            except CommandExpiredError:
+                order.append(name + ' expired')
+                return
+            order.append(name)
+            arbiter.release()
+
+        arbiter.acquire()
+        threads = [threading.Thread(target=waiter, args=('poll-%d' % i, PRIORITY_BACKGROUND)) for i in range(3)]
+        threads.append(threading.Thread(target=waiter, args=('late', PRIORITY_BACKGROUND, Deadline(0.05))))
+        threads.append(threading.Thread(target=waiter, args=('operator', PRIORITY_INTERACTIVE)))
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        while arbiter.queue_length() > 4:
+            time.sleep(0.01)
+        arbiter.release()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ['late expired', 'operator', 'poll-0', 'poll-1', 'poll-2'])
+        statistics = arbiter.statistics()
+        self.assertEqual(statistics[PRIORITY_BACKGROUND]['count'], 3)
+        self.assertEqual(statistics[PRIORITY_BACKGROUND]['dropped'], 1)
+        self.assertEqual(statistics[PRIORITY_INTERACTIVE]['count'], 1)
+
+    def test_uncollected_reply(self):
+        """
+        A command written with sendcommand releases the port after the answer window, even
+        if nobody collects its answer
+
+        :return:
+        """
+        display = PseudoTerminalDisplay()
+        display.start()
+        try:
+            connections = []
+            for i in range(2):
+                connection = SerialConnection()
+                connection.port = display.path
+                connection.sleep = 0.2
+                connection.parser = HexParser()
+                connections.append(connection)
+            connections[0].sendcommand('\x04\x01\x19\x1c')
+
+            answers = []
+            thread = threading.Thread(target=lambda: answers.append(connections[1].runcommand('\x04\x01\x19\x1c')))
+            thread.daemon = True
+            thread.start()
+            thread.join(3)
+            self.assertEqual(answers, [['05', '01', '19', '02', '1F']])
+            self.assertFalse(connections[1].arbiter().is_held())
+        finally:
+            os.close(display.master)
+            os.close(display.slave)
+
+    def test_replies_in_the_same_thread(self):
+        """
+        A second connection on the port waits for the answer window of a reply written
+        by the same thread, and only the holder of the port may release it
+
+        :return:
+        """
+        display = PseudoTerminalDisplay()
+        display.start()
+        try:
+            connections = []
+            for i in range(2):
+                connection = SerialConnection()
+                connection.port = display.path
+                connection.sleep = 0.2
+                connection.parser = HexParser()
+                connections.append(connection)
+            first = connections[0].sendcommand('\x04\x01\x19\x1c')
+            second = connections[1].sendcommand('\x04\x02\x19\x1f')
+            self.assertEqual(first.collect(), ['05', '01', '19', '02', '1F'])
+            self.assertEqual(second.collect(), [])
+            written = [timestamp for timestamp, command in display.received]
+            self.assertEqual(len(written), 2)
+            self.assertGreaterEqual(written[1] - written[0], 0.15)
+        finally:
+            os.close(display.master)
+            os.close(display.slave)
+
+        arbiter = PortArbiter('OWNER')
+        arbiter.acquire()
+        thread = threading.Thread(target=lambda: self.assertRaises(RuntimeError, arbiter.release))
+        thread.start()
+        thread.join()
+        self.assertTrue(arbiter.is_held())
+        arbiter.release()
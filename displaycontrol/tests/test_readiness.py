@@ -0,0 +1,72 @@
+import time
+from unittest import TestCase
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, SamsungEmulatedConnection
+from displaycontrol.connections.handshake import WaitHandshake
+from displaycontrol.exceptions import CommandNotImplementedError
+from displaycontrol.fleet import Fleet
+from displaycontrol.vendors.generic import DisplayGeneric
+from displaycontrol.vendors.philips import PhilipsSICP100
+from displaycontrol.vendors.samsung import SamsungV065
+
+
+class BootingConnection(PhilipsEmulatedConnection):
+    """ Displays stay silent for boot_time seconds after they were switched on """
+    boot_time = 0.3
+    ready_at = 0
+
+    def respond(self, command):
+        if time.time() < self.ready_at:
+            return ''
+        out = PhilipsEmulatedConnection.respond(self, command)
+        if ord(command[2]) == 0x18:
+            self.ready_at = time.time() + self.boot_time
+        return out
+
+
+class TestReadiness(TestCase):
+    def test_wait_until_ready(self):
+        """
+        Waiting ends shortly after the display answers, or at the deadline
+
+        :return:
+        """
+        control = PhilipsSICP100(BootingConnection())
+        control.set_power_state(control.POWER_STATE_ON)
+        started = time.time()
+        self.assertTrue(control.wait_until_ready(5))
+        self.assertGreaterEqual(time.time() - started, 0.3)
+        self.assertLess(time.time() - started, 0.7)
+
+        started = time.time()
+        silent = SamsungV065(SamsungEmulatedConnection([1]), 2)
+        self.assertFalse(silent.wait_until_ready(0.2))
+        self.assertLess(time.time() - started, 0.4)
+
+        # A controller that can not tell fails at once instead of polling until the deadline
+        started = time.time()
+        self.assertRaises(CommandNotImplementedError, DisplayGeneric(BootingConnection()).wait_until_ready, 5)
+        self.assertLess(time.time() - started, 0.1)
+
+    def test_wait_handshake(self):
+        """
+        A ready check ends the handshake early
+
+        :return:
+        """
+        checks = []
+        handshake = WaitHandshake(5, lambda connection: checks.append(connection) or len(checks) >= 3)
+        started = time.time()
+        handshake.perform_handshake('connection')
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(checks, ['connection'] * 3)
+
+    def test_power_on(self):
+        """
+        Every display of a fleet is done once it got ready
+
+        :return:
+        """
+        fleet = Fleet([{'vendor': 'PhilipsSICP100', 'port': 'BOOTING%d' % port, 'id': 1,
+                        'connection': BootingConnection} for port in range(3)])
+        results = fleet.power_on(deadline=5, concurrency=3)
+        self.assertEqual([result['value'] for result in results.values()], [True] * 3)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+from displaycontrol.fleet import Fleet
+from displaycontrol.reconcile import reconcile
+from displaycontrol.vendors.generic import DisplayGeneric
+
+
+def lobby():
+    return [{'name': 'lobby-%d' % display_id, 'vendor': 'philips_sicp188', 'port': 'RECONCILE', 'id': display_id,
+             'connection': 'PhilipsEmulatedConnection', 'groups': ['lobby'],
+             'settings': {'display_ids': [1, 2, 3], 'group_byte': True}} for display_id in [1, 2, 3]]
+
+
+class TestReconcile(TestCase):
+    def test_reconcile(self):
+        """
+        Only differing values are set, power on first and power off last, a second run sends nothing
+
+        :return:
+        """
+        fleet = Fleet(lobby())
+        fleet.controller('lobby-2').set_power_state(DisplayGeneric.POWER_STATE_OFF)
+        fleet.controller('lobby-1').set_input_channel('HDMI 2')
+        desired = {
+            'lobby': {'power_state': DisplayGeneric.POWER_STATE_ON, 'input_channel': 'HDMI 2',
+                      'lock_keys': DisplayGeneric.LOCKED_ALL},
+            'lobby-3': {'power_state': DisplayGeneric.POWER_STATE_OFF},
+        }
+        report = reconcile(fleet, desired)
+        displays = report['displays']
+        self.assertEqual(list(displays['lobby-1']['changed'].keys()), ['lock_keys'])
+        self.assertEqual(displays['lobby-1']['unchanged'], ['power_state', 'input_channel'])
+        self.assertEqual(list(displays['lobby-2']['changed'].keys()), ['power_state', 'input_channel', 'lock_keys'])
+        self.assertEqual(list(displays['lobby-3']['changed'].keys()), ['input_channel', 'lock_keys', 'power_state'])
+        self.assertEqual(report['commands'], 7)
+        self.assertEqual(report['changed'], 7)
+        self.assertEqual(fleet.controller('lobby-3').get_power_state(), DisplayGeneric.POWER_STATE_OFF)
+        self.assertEqual(fleet.controller('lobby-2').get_input_channel_hr(), 'HDMI 2')
+
+        again = reconcile(fleet, desired)
+        self.assertEqual(again['commands'], 0)
+        self.assertEqual([report['failed'] for report in again['displays'].values()], [{}, {}, {}])
+
+    def test_unknown(self):
+        """
+        Unknown names and attributes are rejected before anything is sent
+
+        :return:
+        """
+        fleet = Fleet(lobby())
+        self.assertRaises(ValueError, reconcile, fleet, {'hall': {'power_state': 1}})
+        self.assertRaises(ValueError, reconcile, fleet, {'lobby': {'colour': 1}})
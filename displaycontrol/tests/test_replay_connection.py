@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from displaycontrol.vendors.philips import PhilipsSICP188
+from displaycontrol.vendors.benq import BenQLU9235
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection, BenQEmulatedConnection
+from displaycontrol.connections.recordingconnection import RecordingConnection, read_recording
+from displaycontrol.connections.replayconnection import ReplayConnection
+
+
+class TestReplayConnection(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'session.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record_philips_session(self):
+        recorder = RecordingConnection(PhilipsEmulatedConnection(group_byte=True, latency=0.01), self.filename)
+        ctrl = PhilipsSICP188(recorder)
+        values = [ctrl.get_power_state(), ctrl.get_platform_label(), ctrl.get_lock_keys()]
+        recorder.close()
+        return values
+
+    def test__recording_contains_every_frame(self):
+        """
+        Each command is written as one record with request, raw response and timing.
+
+        :return:
+        """
+        self.record_philips_session()
+        records = read_recording(self.filename)
+        self.assertEqual(len(records), 3)
+        offset, duration, request, response = records[0]
+        self.assertTrue(duration >= 0.01)
+        self.assertEqual(ord(request[0]), len(request))
+        self.assertEqual(ord(response[0]), len(response))
+
+    def test__replay_returns_recorded_values(self):
+        """
+        A controller on top of the replay gets the same answers as during recording.
+
+        :return:
+        """
+        recorded = self.record_philips_session()
+        ctrl = PhilipsSICP188(ReplayConnection(self.filename))
+        self.assertEqual([ctrl.get_power_state(), ctrl.get_platform_label(), ctrl.get_lock_keys()], recorded)
+
+    def test__replay_is_fast_unless_realtime(self):
+        """
+        Without realtime the recorded durations are skipped, with realtime they are kept.
+
+        :return:
+        """
+        self.record_philips_session()
+        fast = ReplayConnection(self.filename, loop=True)
+        ctrl = PhilipsSICP188(fast)
+        started = time.time()
+        for i in range(10):
+            ctrl.get_power_state()
+        self.assertTrue(time.time() - started < 0.05)
+
+        ctrl = PhilipsSICP188(ReplayConnection(self.filename, realtime=True))
+        started = time.time()
+        ctrl.get_power_state()
+        self.assertTrue(time.time() - started >= 0.01)
+
+    def test__unknown_frame_gets_no_answer(self):
+        """
+        Frames that were never recorded behave like a display that does not answer.
+
+        :return:
+        """
+        self.record_philips_session()
+        ctrl = PhilipsSICP188(ReplayConnection(self.filename), 2)
+        self.assertEqual(ctrl.command(0x19, list()), [])
+
+    def test__handshake_is_recorded_and_replayed(self):
+        """
+        The BenQ handshake runs through the recording connection, so it can be replayed.
+
+        :return:
+        """
+        recorder = RecordingConnection(BenQEmulatedConnection(), self.filename)
+        self.assertEqual(BenQLU9235(recorder).get_power_state(), BenQLU9235.POWER_STATE_ON)
+        recorder.close()
+        self.assertEqual(BenQLU9235(ReplayConnection(self.filename)).get_power_state(), BenQLU9235.POWER_STATE_ON)
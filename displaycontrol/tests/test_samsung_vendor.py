@@ -0,0 +1,29 @@
+from unittest import TestCase
+from displaycontrol.vendors.samsung import SamsungV065
+from displaycontrol.connections.emulatedconnection import SamsungEmulatedConnection
+
+
+class TestSamsungV065(TestCase):
+    def setUp(self):
+        self.ctrl = SamsungV065(SamsungEmulatedConnection())
+
+    def test__power_state_is_read(self):
+        """
+        The emulated display is switched on.
+
+        :return:
+        """
+        self.assertEqual(self.ctrl.get_power_state(), SamsungV065.POWER_STATE_ON)
+
+    def test__absolute_values(self):
+        """
+        Volume and picture settings are set with a single absolute command each.
+
+        :return:
+        """
+        self.assertTrue(self.ctrl.set_audio_volume(60))
+        self.assertTrue(self.ctrl.set_picture_brightness(70))
+        self.assertTrue(self.ctrl.set_picture_contrast(80))
+        self.assertEqual(self.ctrl.get_audio_volume(), 60)
+        self.assertEqual(self.ctrl.get_picture_brightness(), 70)
+        self.assertEqual(self.ctrl.get_picture_contrast(), 80)
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from unittest import TestCase
+from displaycontrol.fleet import Fleet
+from displaycontrol.sync import synchronized
+from displaycontrol.tests.helpers import PseudoTerminalDisplay
+
+
+def wall(latency):
+    """ A 3x3 wall, every row is a daisy chain on its own port """
+    return [{'name': 'wall-%d-%d' % (row, column), 'vendor': 'philips_sicp188', 'port': 'WALL%d' % row,
+             'id': column, 'connection': 'PhilipsEmulatedConnection',
+             'settings': {'display_ids': [1, 2, 3], 'group_byte': True, 'latency': latency}}
+            for row in range(3) for column in [1, 2, 3]]
+
+
+class TestSync(TestCase):
+    def test_wall(self):
+        """
+        All frames are written in one burst, the acks are collected afterwards
+
+        :return:
+        """
+        fleet = Fleet(wall(0.1))
+        started = time.time()
+        report = synchronized(fleet, 'set_input_channel', ('HDMI 2',))
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual([result['value'] for result in report['results'].values()], [True] * 9)
+        self.assertLess(report['spread_ms'], 50)
+        self.assertEqual(list(report['writes'].keys()), ['WALL0', 'WALL1', 'WALL2'])
+        self.assertEqual(set(fleet.run('get_input_channel_hr', pipelined=True)[name]['value']
+                             for name in fleet.names()), set(['HDMI 2']))
+
+    def test_opposite_order(self):
+        """
+        Two calls over the same ports in opposite order do not deadlock
+
+        :return:
+        """
+        displays = [{'name': 'port-%02d' % port, 'vendor': 'philips_sicp100', 'port': 'ORDER%02d' % port,
+                     'connection': 'PhilipsEmulatedConnection'} for port in range(20)]
+        fleets = [Fleet(displays), Fleet(list(reversed(displays)))]
+        finished = []
+
+        def run(fleet):
+            for i in range(30):
+                synchronized(fleet, 'get_power_state')
+            finished.append(fleet)
+
+        threads = [threading.Thread(target=run, args=(fleet,)) for fleet in fleets]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join(20)
+        self.assertEqual(len(finished), 2)
+
+    def test_serial_ports(self):
+        """
+        Serial ports are opened before the first frame is written
+
+        :return:
+        """
+        displays = [PseudoTerminalDisplay() for i in range(2)]
+        for display in displays:
+            display.start()
+        try:
+            fleet = Fleet([{'name': 'pty-%d' % index, 'vendor': 'PhilipsSICP100', 'port': display.path, 'id': 1,
+                            'settings': {'sleep': 0.5}} for index, display in enumerate(displays)])
+            report = synchronized(fleet, 'get_power_state')
+            self.assertEqual([result['value'] for result in report['results'].values()], [1, 1])
+            self.assertLess(report['spread_ms'], 50)
+        finally:
+            for display in displays:
+                os.close(display.master)
+                os.close(display.slave)
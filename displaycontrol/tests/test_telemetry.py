@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from displaycontrol.fleet import Fleet
+from displaycontrol.telemetry import RingBuffer, TelemetryRecorder, TelemetryFile
+
+
+class TestTelemetry(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ring_buffer(self):
+        """
+        Old samples get overwritten, range queries and downsampling work across the wrap
+
+        :return:
+        """
+        ring = RingBuffer(8)
+        for second in range(12):
+            ring.append(1000.0 + second, float(second))
+        self.assertEqual(len(ring), 8)
+        self.assertEqual(ring[0], (1004.0, 4.0))
+        self.assertEqual(ring.latest(), (1011.0, 11.0))
+        self.assertEqual(ring.range(1006, 1009), [(1006.0, 6.0), (1007.0, 7.0), (1008.0, 8.0)])
+        self.assertEqual(ring.range(900, 1005), [(1004.0, 4.0)])
+        self.assertEqual(ring.downsample(1004, 1012, 2), [(1004.0, 5.5), (1008.0, 9.5)])
+        self.assertEqual(ring.downsample(1004, 1012, 2, 'max'), [(1004.0, 7.0), (1008.0, 11.0)])
+
+    def test_mapped_file(self):
+        """
+        Samples in a memory mapped file survive reopening
+
+        :return:
+        """
+        filename = os.path.join(self.directory, 'series.tel')
+        ring = RingBuffer(4, filename)
+        for second in range(6):
+            ring.append(float(second), second * 10.0)
+        ring.close()
+
+        ring = RingBuffer(4, filename)
+        self.assertEqual(ring.range(), [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0), (5.0, 50.0)])
+        self.assertEqual(os.path.getsize(filename), 24 + 64 + 4 * 16)
+        ring.close()
+
+    def test_file_per_display(self):
+        """
+        All series of a display share one file, every append is visible to readers of
+        the file without a flush
+
+        :return:
+        """
+        filename = os.path.join(self.directory, 'display.tel')
+        writer = TelemetryFile(filename, 4, slots=2)
+        temperature = RingBuffer(4, storage=writer.storage('temperature.0'))
+        power = RingBuffer(4, storage=writer.storage('power_state'))
+        temperature.append(1.0, 30.0)
+        power.append(1.0, 1.0)
+        power.append(2.0, 0.0)
+        self.assertRaises(IOError, writer.storage, 'operating_hours')
+
+        reader = TelemetryFile(filename, 4, slots=2)
+        self.assertEqual(RingBuffer(4, storage=reader.storage('power_state')).range(), [(1.0, 1.0), (2.0, 0.0)])
+        self.assertEqual(RingBuffer(4, storage=reader.storage('temperature.0')).latest(), (1.0, 30.0))
+        reader.close()
+        writer.close()
+
+        # A file of another size is refused instead of being overwritten
+        self.assertRaises(IOError, TelemetryFile, filename, 8, slots=2)
+        self.assertRaises(IOError, TelemetryFile, filename, 4, slots=1)
+        self.assertEqual(os.path.getsize(filename), 24 + 2 * (64 + 4 * 16))
+
+    def test_recorder(self):
+        """
+        The recorder samples temperature, operating hours and power state
+
+        :return:
+        """
+        fleet = Fleet([{'name': 'lobby', 'vendor': 'PhilipsSICP100', 'port': 'TELEMETRY', 'id': 1,
+                        'connection': 'PhilipsEmulatedConnection'}])
+        recorder = TelemetryRecorder(fleet, capacity=16, directory=self.directory)
+        recorder.sample(100.0)
+        recorder.sample(160.0)
+        self.assertEqual(recorder.query('lobby', 'temperature.0'), [(100.0, 33.0), (160.0, 33.0)])
+        self.assertEqual(recorder.query('lobby', 'temperature.1', 150), [(160.0, 35.0)])
+        self.assertEqual(recorder.query('lobby', 'operating_hours')[-1], (160.0, 42.0))
+        self.assertEqual(recorder.downsample('lobby', 'power_state', 100, 200, buckets=1),
+                         [(100.0, float(fleet.controller('lobby').POWER_STATE_ON))])
+        self.assertEqual(recorder.errors, 0)
+        self.assertEqual(os.listdir(self.directory), ['lobby.tel'])
+        recorder.close()
+
+        recorder = TelemetryRecorder(fleet, capacity=16, directory=self.directory)
+        self.assertEqual(recorder.query('lobby', 'temperature.1'), [(100.0, 35.0), (160.0, 35.0)])
+
+        # Reading unknown displays or series allocates neither files nor slots
+        self.assertEqual(recorder.query('nobody', 'temperature.0'), [])
+        self.assertEqual(recorder.downsample('lobby', 'fan_speed', 100, 200), [])
+        self.assertEqual(os.listdir(self.directory), ['lobby.tel'])
+        self.assertNotIn('fan_speed', recorder.files['lobby'].names)
+        recorder.close()
+        self.assertEqual(TelemetryRecorder(fleet).query('lobby', 'temperature.0'), [])
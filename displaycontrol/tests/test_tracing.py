@@ -0,0 +1,146 @@
+import os
+import shutil
+import sys
+import tempfile
+from StringIO import StringIO
+from unittest import TestCase
+from displaycontrol.connections import SerialConnection
+from displaycontrol.connections.emulatedconnection import PhilipsEmulatedConnection
+from displaycontrol.connections.tracing import RingBufferTracer, CallbackTracer, load_trace
+from displaycontrol.tests.helpers import PseudoTerminalDisplay
+from displaycontrol.vendors.philips import PhilipsSICP100
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_events(self):
+        """
+        Write, first byte and frame are traced in order with increasing timestamps
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1])
+        self.assertEqual(connection.tracers, ())
+        tracer = RingBufferTracer(16)
+        connection.add_tracer(tracer)
+        control = PhilipsSICP100(connection)
+        control.get_power_state()
+
+        events = tracer.events()
+        self.assertEqual([event.event for event in events], ['write', 'first_byte', 'frame'])
+        self.assertEqual(events[0].data, '\x04\x01\x19\x1c')
+        self.assertEqual(events[0].port, 'EMULATED')
+        self.assertEqual(events[2].length, len(events[2].data))
+        self.assertEqual(sorted(event.timestamp for event in events), [event.timestamp for event in events])
+
+        # Silent displays only get the write
+        tracer.clear()
+        PhilipsSICP100(connection, 2).is_ready_for_commands()
+        self.assertEqual([event.event for event in tracer.events()], ['write'])
+
+        connection.remove_tracer(tracer)
+        control.get_power_state()
+        self.assertEqual(len(tracer.events()), 1)
+
+    def test_serial_first_byte(self):
+        """
+        The first byte of a serial answer is traced when it arrives, not after the
+        answer window
+
+        :return:
+        """
+        display = PseudoTerminalDisplay()
+        display.start()
+        connection = SerialConnection()
+        connection.port = display.path
+        connection.sleep = 0.5
+        tracer = RingBufferTracer(16)
+        connection.add_tracer(tracer)
+        try:
+            self.assertEqual(connection.runcommand('\x04\x01\x19\x1c'), '\x05\x01\x19\x02\x1f')
+        finally:
+            os.close(display.master)
+            os.close(display.slave)
+
+        events = tracer.events()
+        self.assertEqual([event.event for event in events], ['write', 'first_byte', 'frame'])
+        self.assertLess(events[1].timestamp - events[0].timestamp, 0.25)
+        self.assertGreaterEqual(events[2].timestamp - events[0].timestamp, 0.5)
+
+    def test_ring_dump(self):
+        """
+        Only the latest events are kept, a dump reads back the same events
+
+        :return:
+        """
+        connection = PhilipsEmulatedConnection([1])
+        tracer = RingBufferTracer(4)
+        connection.add_tracer(tracer)
+        for i in range(3):
+            connection.runcommand('\x04\x01\x19\x1c')
+        events = tracer.events()
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[-1].event, 'frame')
+
+        filename = os.path.join(self.directory, 'port.trace')
+        tracer.dump(filename)
+        self.assertEqual(load_trace(filename), events)
+
+    def test_many_ports(self):
+        """
+        Port numbers do not wrap around, events of every port keep their port
+
+        :return:
+        """
+        tracer = RingBufferTracer(300)
+        connection = PhilipsEmulatedConnection([1])
+        connection.add_tracer(tracer)
+        for port in range(300):
+            connection.port = 'PORT%d' % port
+            connection.trace('write', '\x04\x01\x19\x1c')
+        self.assertEqual([event.port for event in tracer.events()], ['PORT%d' % port for port in range(300)])
+
+    def test_serial_port_closed_once(self):
+        """
+        The serial port is closed exactly once, also if writing fails
+
+        :return:
+        """
+        class BrokenPort(object):
+            closed = 0
+
+            def write(self, data):
+                raise IOError('unplugged')
+
+            def close(self):
+                BrokenPort.closed += 1
+
+        events = []
+        connection = SerialConnection()
+        connection.open = BrokenPort
+        connection.add_tracer(CallbackTracer(on_error=lambda connection, timestamp, data: events.append(data)))
+        # The connection prints the error
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            self.assertEqual(connection.runcommand('\x04\x01\x19\x1c'), '')
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(BrokenPort.closed, 1)
+        self.assertEqual(events, ['unplugged'])
+
+    def test_callbacks(self):
+        """
+        Callback tracers get the events they asked for
+
+        :return:
+        """
+        frames = []
+        connection = PhilipsEmulatedConnection([1])
+        connection.add_tracer(CallbackTracer(on_frame=lambda connection, timestamp, data: frames.append(data)))
+        connection.runcommand('\x04\x01\x19\x1c')
+        self.assertEqual(len(frames), 1)
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+from unittest import TestCase
+from displaycontrol.exceptions import VendorUnknownError
+from displaycontrol.vendors import registry
+
+
+class TestVendorRegistry(TestCase):
+    def test_lookup(self):
+        """
+        Registry keys resolve to the controller classes and back
+
+        :return:
+        """
+        from displaycontrol.vendors.philips import PhilipsSICP188
+        self.assertIs(registry.get_vendor('philips_sicp188'), PhilipsSICP188)
+        self.assertEqual(registry.vendor_key(PhilipsSICP188), 'philips_sicp188')
+        self.assertIn('benq_lu9235', registry.available_vendors())
+        self.assertRaises(VendorUnknownError, registry.get_vendor, 'acme_x1')
+
+        registry.register_vendor('acme_x1', PhilipsSICP188)
+        self.assertIs(registry.get_vendor('acme_x1'), PhilipsSICP188)
+
+    def test_lazy_import(self):
+        """
+        Importing one vendor does not import the others or pyserial
+
+        :return:
+        """
+        script = ("import sys; from displaycontrol.vendors import registry; registry.get_vendor('benq_lu9235'); "
+                  "print [name for name in ('serial', 'displaycontrol.vendors.philips') if name in sys.modules]")
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(output.strip(), '[]')
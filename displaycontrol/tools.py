@@ -1,5 +1,4 @@
 import glob
-import serial
 import struct
 import sys
 
@@ -51,6 +50,7 @@ class Tools:
             ports = glob.glob('/dev/tty.*')
         else:
             raise EnvironmentError('Unsupported platform')
+        import serial
         result = []
         for port in ports:
             try:
@@ -1,5 +1,37 @@
 # read http://mikegrouchy.com/blog/2012/05/be-pythonic-__init__py.html
-from generic import *
-from benq import *
-from philips import *
-from samsung import *
\ No newline at end of file
+# The vendor modules are imported when one of their classes is used for the first time.
+# Use displaycontrol.vendors.registry to look up controller classes by name.
+from displaycontrol.lazy import install_lazy_module
+
+install_lazy_module(__name__, {
+    'GenericDetector': 'displaycontrol.vendors.generic',
+    'DisplayGeneric': 'displaycontrol.vendors.generic',
+    'BenQGeneric': 'displaycontrol.vendors.benq',
+    'BenQLU9235': 'displaycontrol.vendors.benq',
+    'PhilipsGeneric': 'displaycontrol.vendors.philips',
+    'PhilipsSICP100': 'displaycontrol.vendors.philips',
+    'PhilipsSICP110': 'displaycontrol.vendors.philips',
+    'PhilipsSICP130': 'displaycontrol.vendors.philips',
+    'PhilipsSICP140': 'displaycontrol.vendors.philips',
+    'PhilipsSICP150': 'displaycontrol.vendors.philips',
+    'PhilipsSICP160': 'displaycontrol.vendors.philips',
+    'PhilipsSICP170': 'displaycontrol.vendors.philips',
+    'PhilipsSICP180': 'displaycontrol.vendors.philips',
+    'PhilipsSICP182': 'displaycontrol.vendors.philips',
+    'PhilipsSICP183': 'displaycontrol.vendors.philips',
+    'PhilipsSICP184': 'displaycontrol.vendors.philips',
+    'PhilipsSICP185': 'displaycontrol.vendors.philips',
+    'PhilipsSICP186': 'displaycontrol.vendors.philips',
+    'PhilipsSICP187': 'displaycontrol.vendors.philips',
+    'PhilipsSICP188': 'displaycontrol.vendors.philips',
+    'PhilipsSerialDetector': 'displaycontrol.vendors.philips',
+    'SamsungGeneric': 'displaycontrol.vendors.samsung',
+    'SamsungV065': 'displaycontrol.vendors.samsung',
+    'SamsungSerialDetector': 'displaycontrol.vendors.samsung',
+    # Formerly available through the star imports of the vendor modules
+    'GenericConnection': 'displaycontrol.connections',
+    'SerialConnection': 'displaycontrol.connections',
+    'Tools': 'displaycontrol.tools',
+    'CommandNotImplementedError': 'displaycontrol.exceptions',
+    'CommandArgumentsNotSupportedError': 'displaycontrol.exceptions',
+})
@@ -1,5 +1,4 @@
 from displaycontrol.connections.handshake import SendAndReceiveHandshake
-from displaycontrol.connections import SerialConnection
 from displaycontrol.vendors import DisplayGeneric
 from displaycontrol.exceptions import CommandArgumentsNotSupportedError
 
@@ -12,6 +11,7 @@ class BenQGeneric(DisplayGeneric):
     def __init__(self, connection=None, id=1):
         # If there is no connection specified, fall back to a default SerialConnection
         if connection is None:
+            from displaycontrol.connections import SerialConnection
             connection = SerialConnection()
 
         DisplayGeneric.__init__(self, connection, id)
@@ -28,11 +28,23 @@ class BenQGeneric(DisplayGeneric):
         assembled_command = self.assemble_runnable_command(command, data)
 
         # Run the assembled command
-        return self.connection.runcommand(assembled_command)
+        return self.run_command(assembled_command)
 
     def assemble_runnable_command(self, command, data):
         return '*' + command + '#\r'
 
+    def is_answer_ack(self, data):
+        """ The projector echoes the command and answers with the value, errors are
+        reported as text instead """
+        if not data:
+            return False
+        answer = ''.join(data).lower()
+        return 'illegal format' not in answer and 'block item' not in answer
+
+    def is_ready_for_commands(self):
+        """ The projector answers the power state query in standby as well """
+        return self.is_answer_ack(self.command('pow=?', None))
+
     def command_with_response(self, data):
         response = self.command(data, None)
 
@@ -68,9 +80,9 @@ class BenQGeneric(DisplayGeneric):
 
     def set_power_state(self, state):
         if state == self.POWER_STATE_ON:
-            self.command('pow=on', None)
+            return self.check_ack(self.command('pow=on', None))
         elif state == self.POWER_STATE_OFF:
-            self.command('pow=off', None)
+            return self.check_ack(self.command('pow=off', None))
         else:
             raise CommandArgumentsNotSupportedError()
 
@@ -85,7 +97,7 @@ class BenQGeneric(DisplayGeneric):
 
     def set_input_channel(self, channel):
         if channel in self.input_channel_get:
-            self.command_with_response('sour=' + channel)
+            return self.check_ack(self.command('sour=' + channel, None))
         else:
             raise CommandArgumentsNotSupportedError()
 
@@ -116,9 +128,9 @@ class BenQGeneric(DisplayGeneric):
 
     def set_freeze_status(self, status):
         if status == self.GENERIC_ENABLED:
-            self.command('freeze=on', None)
+            return self.check_ack(self.command('freeze=on', None))
         elif status == self.GENERIC_DISABLED:
-            self.command('freeze=off', None)
+            return self.check_ack(self.command('freeze=off', None))
         else:
             raise CommandArgumentsNotSupportedError()
 
@@ -128,9 +140,9 @@ class BenQGeneric(DisplayGeneric):
 
     def set_blank_status(self, status):
         if status == self.GENERIC_ENABLED:
-            self.command('blank=on', None)
+            return self.check_ack(self.command('blank=on', None))
         elif status == self.GENERIC_DISABLED:
-            self.command('blank=off', None)
+            return self.check_ack(self.command('blank=off', None))
         else:
             raise CommandArgumentsNotSupportedError()
 
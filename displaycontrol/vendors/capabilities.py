@@ -0,0 +1,151 @@
+"""
+Which commands a controller class really implements.
+
+DisplayGeneric declares every command of every vendor, most of them only raise a
+CommandNotImplementedError. The capabilities of a class are derived once from the
+methods it overrides with something else than such a stub, plus the helpers of
+DisplayGeneric that are built on other commands (e.g. get_power_state_hr on
+get_power_state, set_audio_volume on stepping the volume up and down). The SICP version
+of the Philips protocol is a class of its own, so a newer version only adds the commands
+it overrides.
+
+    supports(controller, 'get_control_software_version')
+    supports('samsung_v065', 'get_temperature')
+    capability_matrix()['philips_sicp188']['methods']
+
+Fleet.run, reconcile, the detectors and the gateway use it to skip commands a display
+can not answer, instead of sending them and catching the exception.
+"""
+import inspect
+import re
+from collections import OrderedDict
+
+from displaycontrol.exceptions import CommandNotImplementedError
+from displaycontrol.vendors.generic import DisplayGeneric
+from displaycontrol.vendors.registry import available_vendors, get_vendor, vendor_key
+
+# Methods of DisplayGeneric with a get_ / set_ prefix that are not commands
+HELPERS = frozenset(['set_display_id', 'set_connection', 'set_fire_and_forget', 'set_priority', 'set_breaker',
+                     'get_static_value', 'get_answer_data'])
+
+# Helpers of DisplayGeneric -> the commands they need, unless a vendor overrides them
+DERIVED = {
+    'get_power_state_hr': ['get_power_state'],
+    'get_input_channel_hr': ['get_input_channel'],
+    'get_lock_keys_hr': ['get_lock_keys'],
+    'get_lock_ir_remote_hr': ['get_lock_ir_remote'],
+    'wait_until_ready': ['is_ready_for_commands'],
+    'set_audio_volume': ['get_audio_volume', 'set_audio_volume_higher', 'set_audio_volume_lower'],
+    'set_picture_contrast': ['get_picture_contrast', 'set_picture_contrast_higher', 'set_picture_contrast_lower'],
+    'set_picture_brightness': ['get_picture_brightness', 'set_picture_brightness_higher',
+                               'set_picture_brightness_lower'],
+    'set_picture_color': ['get_picture_color', 'set_picture_color_higher', 'set_picture_color_lower'],
+    'set_picture_sharpness': ['get_picture_sharpness', 'set_picture_sharpness_higher',
+                              'set_picture_sharpness_lower'],
+}
+
+
+def _not_implemented(self):
+    raise CommandNotImplementedError()
+
+
+_STUB_CODE = _not_implemented.func_code.co_code
+_STUB_NAMES = _not_implemented.func_code.co_names
+
+
+def is_stub(function):
+    """ True if the function does nothing but raise a CommandNotImplementedError """
+    code = getattr(function, 'func_code', None)
+    if code is None or code.co_names != _STUB_NAMES or len(code.co_code) != len(_STUB_CODE):
+        return False
+    # The implicit return None loads another constant if there is a docstring
+    return code.co_code[:-4] == _STUB_CODE[:-4]
+
+
+def _commands():
+    return sorted(name for name, value in DisplayGeneric.__dict__.items()
+                  if (name.startswith('get_') or name.startswith('set_') or name == 'is_ready_for_commands'
+                      or name == 'wait_until_ready') and name not in HELPERS and inspect.isfunction(value))
+
+
+# All commands a controller may implement
+COMMANDS = _commands()
+
+_capabilities = {}
+
+
+def _definition(controller_class, name):
+    """ The function of the class (or the nearest base) defining name, or None """
+    for base in inspect.getmro(controller_class):
+        if name in base.__dict__:
+            value = base.__dict__[name]
+            return getattr(value, '__func__', value)
+    return None
+
+
+def protocol_version(controller_class):
+    """ The protocol version in the name of a class, e.g. 'V1.88' for PhilipsSICP188, or None """
+    match = re.search(r'(?:SICP|V)(\d)(\d+)$', controller_class.__name__)
+    if match:
+        return 'V%s.%s' % match.groups()
+    return None
+
+
+def _implemented(controller_class):
+    implemented = set()
+    for name in COMMANDS:
+        function = _definition(controller_class, name)
+        if function is None or is_stub(function):
+            continue
+        if name in DERIVED and function is DisplayGeneric.__dict__[name]:
+            continue
+        implemented.add(name)
+    for name, needed in DERIVED.items():
+        if all(command in implemented for command in needed):
+            implemented.add(name)
+    return frozenset(implemented)
+
+
+def controller_class_of(target):
+    """ The controller class of a registry key, a class, a controller or a DisplayHandle """
+    if isinstance(target, basestring):
+        return get_vendor(target)
+    if inspect.isclass(target):
+        return target
+    protocol = getattr(target, 'protocol', None)
+    if protocol is not None and hasattr(protocol, 'controller_class'):
+        return protocol.controller_class
+    return target.__class__
+
+
+def capabilities(target):
+    """ A dict with the vendor key, the protocol version and the frozenset of supported
+    methods of a controller class (see controller_class_of), computed once per class """
+    controller_class = controller_class_of(target)
+    result = _capabilities.get(controller_class)
+    if result is None:
+        result = _capabilities[controller_class] = {
+            'vendor': vendor_key(controller_class),
+            'protocol': protocol_version(controller_class),
+            'methods': _implemented(controller_class),
+        }
+    return result
+
+
+def supports(target, method):
+    """ True if the controller (class, key or handle) implements the method. Methods that
+    are not commands of DisplayGeneric are supported if they exist and are no stub. """
+    if method in COMMANDS:
+        return method in capabilities(target)['methods']
+    function = _definition(controller_class_of(target), method)
+    return function is not None and not is_stub(function)
+
+
+def supported(target, methods):
+    """ The methods the controller supports, in the given order """
+    return [method for method in methods if supports(target, method)]
+
+
+def capability_matrix(keys=None):
+    """ The capabilities of all (or the given) registered vendors by key """
+    return OrderedDict((key, capabilities(key)) for key in (available_vendors() if keys is None else keys))
@@ -1,14 +1,36 @@
-from displaycontrol.connections import GenericConnection
-from displaycontrol.exceptions import CommandNotImplementedError
+import copy
+
+from displaycontrol.connections import PendingReply
+from displaycontrol.connections.arbiter import scheduling, is_scheduled, current_deadline
+from displaycontrol.deadline import poll_until, as_deadline
+from displaycontrol.exceptions import CommandNotImplementedError, CommandArgumentsNotSupportedError, \
+    CommandExpiredError, CommandResponseMalformedError, DisplayOfflineError
 from displaycontrol.tools import Tools
 
 
+# Controller class -> static values (see DisplayGeneric.get_static_value) of its displays
+_static_values = {}
+
+
+def static_values_of(controller_class):
+    """ The static values of all displays of a controller class, by port, display id and name """
+    return _static_values.setdefault(controller_class, {})
+
+
+def invalidate_static_values(port, display_id=None):
+    """ Forgets the static values of the displays on a port (or only of one display id),
+    e.g. because another display may be connected there now """
+    for values in list(_static_values.values()):
+        for key in list(values.keys()):
+            if key[0] == port and display_id in (None, key[1]):
+                values.pop(key, None)
+
+
 class GenericDetector:
     def __init__(self):
-        pass
+        self._displays = []
 
     _command = None
-    _displays = []
 
     def detect_displays(self):
         raise CommandNotImplementedError()
@@ -72,16 +94,33 @@ class DisplayGeneric:
         AUTODETECT_INPUT_FAILOVER: "Failover"
     }
 
+    """ Range of absolute values like volume, brightness or contrast """
+    VALUE_MIN = 0
+    VALUE_MAX = 100
+
     """ Has to be overridden by each class because this really
     differs a lot between implementations and is only needed to
     create the HR method """
     input_channel_get = {}
     input_channel_set = []
 
-    connection = GenericConnection()
+    # Set per instance, a default connection would be shared by all controllers
+    connection = None
     display_id = 1
+    fire_and_forget = False
+    # Priority of the commands on a shared port (see displaycontrol.connections.arbiter)
+    # unless the caller sets one, None is the normal priority
+    priority = None
+    # Circuit breaker that skips the display while it does not answer (see displaycontrol.breaker)
+    breaker = None
+    # Answers collected while probing an open breaker
+    _probe_answers = None
+    # Parser of the answers of this protocol (see parse_answer), None keeps them as the
+    # connection delivers them
+    answer_parser = None
 
     def __init__(self, newconnection, id=1):
+        self.static_values = static_values_of(self.__class__)
         self.set_connection(newconnection)
         self.set_display_id(id)
 
@@ -94,15 +133,172 @@ class DisplayGeneric:
     def set_connection(self, new_connection):
         self.connection = new_connection
 
+    def get_static_value(self, name, loader):
+        """ Returns a value that never changes for a display (e.g. a list length the
+        protocol expects) and only calls the loader the first time. The values are
+        kept per controller class, port and display id, so every controller of a display
+        shares them, until the port is detected again (see invalidate_static_values).
+        None results and values of connections without a port are not cached. """
+        port = getattr(self.connection, 'port', None)
+        if port is None:
+            return loader()
+        key = (port, self.display_id, name)
+        if key not in self.static_values:
+            value = loader()
+            if value is None:
+                return None
+            self.static_values[key] = value
+        return self.static_values[key]
+
+    def set_fire_and_forget(self, enabled):
+        """ When enabled, commands return as soon as the frame is written. Setters then
+        return a PendingReply instead of the ack, which tells the ack later on. """
+        self.fire_and_forget = enabled
+
     def command(self, command, data):
         raise CommandNotImplementedError()
 
+    def set_priority(self, priority):
+        self.priority = priority
+
+    def with_priority(self, priority, deadline=None):
+        """ Context manager for commands with a different priority and an optional
+        deadline, e.g. for an operator's command while background polling is running:
+
+            with display.with_priority(PRIORITY_INTERACTIVE, Deadline(5)):
+                display.set_power_state(display.POWER_STATE_ON)
+        """
+        return scheduling(priority, as_deadline(deadline))
+
+    def with_deadline(self, deadline):
+        """ Context manager for an overall deadline (a Deadline or seconds) of all commands
+        within, including every command of composite operations (read, then write). Once
+        it passed, the remaining commands raise a CommandExpiredError without being sent,
+        waiting for an answer never takes longer than what is left:
+
+            with display.with_deadline(3):
+                display.set_lock_keys(display.LOCKED_ALL)
+        """
+        return scheduling(None, as_deadline(deadline))
+
+    def set_breaker(self, breaker):
+        """ Sets the circuit breaker of the display, None to always send the commands """
+        self.breaker = breaker
+
+    def run_command(self, command):
+        """ Hands the assembled command over to the connection """
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            raise CommandExpiredError('Deadline passed before sending the command')
+        if self._probe_answers is not None:
+            out = self.run_prioritized(command)
+            self._probe_answers.append(out)
+            return out
+        breaker = self.breaker
+        if breaker is None:
+            return self.run_prioritized(command)
+
+        decision = breaker.check()
+        if decision == breaker.REJECT:
+            raise DisplayOfflineError('Display %s is offline' % breaker.name)
+        if decision == breaker.PROBE:
+            try:
+                answered = self.probe()
+            except BaseException:
+                # The probe did not get to the display, which does not make it more offline
+                breaker.abort_probe()
+                raise
+            if not answered:
+                breaker.record_failure()
+                raise DisplayOfflineError('Display %s is still offline' % breaker.name)
+            breaker.record_success()
+
+        out = self.run_prioritized(command)
+        # The answer of a fire and forget command is not known yet
+        if not isinstance(out, PendingReply):
+            if out:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        return out
+
+    def probe(self):
+        """ Sends the readiness query and returns whether the display answered at all,
+        a negative or garbled answer counts as well. Errors before anything was sent
+        (e.g. an expired deadline) are passed on. The answers are collected by a copy of
+        the controller, so other callers of this one still go through the breaker. """
+        prober = copy.copy(self)
+        prober._probe_answers = []
+        try:
+            prober.is_ready_for_commands()
+        except CommandResponseMalformedError:
+            return True
+        except Exception:
+            if not prober._probe_answers:
+                raise
+        return any(prober._probe_answers)
+
+    def run_prioritized(self, command):
+        if self.priority is not None and not is_scheduled():
+            with scheduling(self.priority):
+                return self.send_or_run(command)
+        return self.send_or_run(command)
+
+    def send_or_run(self, command):
+        if self.fire_and_forget:
+            reply = self.connection.sendcommand(command)
+            reply.parser = self.parse_answer
+            return reply
+        return self.parse_answer(self.connection.runcommand(command))
+
+    def parse_answer(self, out):
+        """ Parses the answer with the parser of the protocol. The controller keeps it, not
+        the connection, as displays speaking other protocol versions may share the port. """
+        if self.answer_parser is None:
+            return out
+        return self.answer_parser.parse(out)
+
+    def check_ack(self, data):
+        """ Returns whether the answer is an ack. For a PendingReply the check is
+        deferred until the reply gets collected and the reply is returned instead. """
+        if isinstance(data, PendingReply):
+            data.checker = self.is_answer_ack
+            return data
+        return self.is_answer_ack(data)
+
     def assemble_runnable_command(self, command, data):
         raise CommandNotImplementedError()
 
+    def framer(self):
+        """ Returns a framer (see displaycontrol.connections.framing) that cuts the answers
+        of this protocol out of a byte stream, or None if the protocol can not be pipelined """
+        return None
+
     def command_with_response(self, data):
         raise CommandNotImplementedError()
 
+    def validate_value(self, value):
+        """ Makes sure an absolute value (volume, brightness, ...) is within the allowed range """
+        if not isinstance(value, int) or value < self.VALUE_MIN or value > self.VALUE_MAX:
+            raise CommandArgumentsNotSupportedError()
+        return value
+
+    def step_to_value(self, value, getter, higher, lower):
+        """ Emulates an absolute setter for protocols that only know higher / lower commands.
+        Steps the difference to the current value and reads again until the value is reached
+        or a pass does not get any closer. """
+        self.validate_value(value)
+        current = int(getter())
+        while current != value:
+            step = higher if current < value else lower
+            for i in range(abs(value - current)):
+                step()
+            previous = current
+            current = int(getter())
+            if abs(value - current) >= abs(value - previous):
+                return False
+        return True
+
     def generic_enabled_result(self, current):
         if current == 'on':
             return self.GENERIC_ENABLED
@@ -121,6 +317,12 @@ class DisplayGeneric:
     def is_ready_for_commands(self):
         raise CommandNotImplementedError()
 
+    def wait_until_ready(self, deadline=30, interval=0.05, maximum_interval=1.0):
+        """ Polls is_ready_for_commands in short, growing intervals until the display
+        answers, e.g. after switching it on. Returns True as soon as it does, False if
+        the deadline (a Deadline or seconds) passed before. """
+        return poll_until(self.is_ready_for_commands, deadline, interval, maximum_interval)
+
     def get_power_state(self):
         raise CommandNotImplementedError()
 
@@ -223,6 +425,12 @@ class DisplayGeneric:
     def get_audio_volume(self):
         raise CommandNotImplementedError()
 
+    def set_audio_volume(self, value):
+        """ Sets the volume to an absolute value. Vendors without an absolute command
+        fall back to stepping with the higher / lower commands. """
+        return self.step_to_value(value, self.get_audio_volume,
+                                  self.set_audio_volume_higher, self.set_audio_volume_lower)
+
     def set_audio_volume_higher(self):
         raise CommandNotImplementedError()
 
@@ -238,6 +446,10 @@ class DisplayGeneric:
     def get_picture_contrast(self):
         raise CommandNotImplementedError()
 
+    def set_picture_contrast(self, value):
+        return self.step_to_value(value, self.get_picture_contrast,
+                                  self.set_picture_contrast_higher, self.set_picture_contrast_lower)
+
     def set_picture_contrast_higher(self):
         raise CommandNotImplementedError()
 
@@ -247,6 +459,10 @@ class DisplayGeneric:
     def get_picture_brightness(self):
         raise CommandNotImplementedError()
 
+    def set_picture_brightness(self, value):
+        return self.step_to_value(value, self.get_picture_brightness,
+                                  self.set_picture_brightness_higher, self.set_picture_brightness_lower)
+
     def set_picture_brightness_higher(self):
         raise CommandNotImplementedError()
 
@@ -256,6 +472,10 @@ class DisplayGeneric:
     def get_picture_color(self):
         raise CommandNotImplementedError()
 
+    def set_picture_color(self, value):
+        return self.step_to_value(value, self.get_picture_color,
+                                  self.set_picture_color_higher, self.set_picture_color_lower)
+
     def set_picture_color_higher(self):
         raise CommandNotImplementedError()
 
@@ -265,6 +485,10 @@ class DisplayGeneric:
     def get_picture_sharpness(self):
         raise CommandNotImplementedError()
 
+    def set_picture_sharpness(self, value):
+        return self.step_to_value(value, self.get_picture_sharpness,
+                                  self.set_picture_sharpness_higher, self.set_picture_sharpness_lower)
+
     def set_picture_sharpness_higher(self):
         raise CommandNotImplementedError()
 
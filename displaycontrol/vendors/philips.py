@@ -1,17 +1,32 @@
+import re
 from displaycontrol.vendors import DisplayGeneric
-from displaycontrol.connections import SerialConnection
+from displaycontrol.connections.arbiter import scheduling, current_deadline
+from displaycontrol.deadline import as_deadline
+from displaycontrol.connections.framing import PhilipsFramer
+from displaycontrol.connections.parser import FrameParser
 from displaycontrol.tools import Tools
 from displaycontrol.exceptions import CommandNotImplementedError
 
+# SICP versions with a controller class (PhilipsSICP100 ... PhilipsSICP188)
+SICP_VERSIONS = [100, 110, 130, 140, 150, 160, 170, 180, 182, 183, 184, 185, 186, 187, 188]
+
 
 class PhilipsGeneric(DisplayGeneric):
     """
     Generic Philips Display class
     """
+    # Number of bytes in front of the data part of an answer (message size and control)
+    answer_header_length = 2
 
     def __init__(self, newconnection, id=1):
         DisplayGeneric.__init__(self, newconnection, id)
 
+    def set_connection(self, new_connection):
+        # The answers are handled as list of hex values, checked for a valid frame of this
+        # protocol first. Whatever the connection delivers (bytes or a hex list) is parsed.
+        self.answer_parser = FrameParser(self.framer())
+        self.connection = new_connection
+
     def command(self, command, data):
         temp = list()
 
@@ -39,7 +54,7 @@ class PhilipsGeneric(DisplayGeneric):
         cmd = Tools.list_to_bytes(mapping)
 
         # run the command
-        return self.connection.runcommand(cmd)
+        return self.run_command(cmd)
 
     def get_answer_data(self, data):
         """ Gets the part of the data that is used as data payload """
@@ -59,6 +74,9 @@ class PhilipsGeneric(DisplayGeneric):
         else:
             return list()
 
+    def framer(self):
+        return PhilipsFramer(self.answer_header_length == 3, self.calculate_checksum)
+
     def calculate_checksum(self, mapping):
         # Init the sum with 0
         xor = 0x00
@@ -66,6 +84,15 @@ class PhilipsGeneric(DisplayGeneric):
             xor = xor ^ item
         return xor
 
+    def is_answer_ack(self, data):
+        """ Checks that the answer is complete and not a NACK or NAV report. Answers to
+        get commands carry the requested data instead of an ACK and count as acknowledged. """
+        if data is None or len(data) < self.answer_header_length + 2:
+            return False
+        if int(data[self.answer_header_length], 16) == 0x00:
+            return int(data[self.answer_header_length + 1], 16) == 0x06
+        return True
+
     def is_ready_for_commands(self):
         data = self.command(0x19, list())
         return self.is_answer_ack(data)
@@ -133,13 +160,13 @@ class PhilipsSICP100(PhilipsGeneric):
         Added to V1.0 documentation on page 9, chapter 4.1.3. """
         if state == self.POWER_STATE_ON:
             data = self.command(0x18, [0x02])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         elif state == self.POWER_STATE_OFF:
             data = self.command(0x18, [0x03])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         elif state == self.POWER_STATE_DEEPSLEEP:
             data = self.command(0x18, [0x01])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         else:
             return False
 
@@ -183,7 +210,7 @@ class PhilipsSICP100(PhilipsGeneric):
             flag = irflag | 0x02
 
         data = self.command(0x1D, [flag])
-        return self.is_answer_ack(data)
+        return self.check_ack(data)
 
     def set_lock_ir_remote(self, state):
         """ Set the lock status of local keyboard
@@ -205,7 +232,7 @@ class PhilipsSICP100(PhilipsGeneric):
                     if visible:
                         label = 0x01
                     data = self.command(0xAC, [source[key][0], source[key][1], label, 0x00])
-                    return self.is_answer_ack(data)
+                    return self.check_ack(data)
         return False
 
     def get_serialnumber(self):
@@ -213,14 +240,70 @@ class PhilipsSICP100(PhilipsGeneric):
         return Tools.ascii_hex_list_to_string(self.get_answer_data(raw[1:]))
 
     def get_temperature(self):
+        """ Returns the values of both temperature sensors (degrees Celsius). The first
+        data byte is the command code. """
         raw = self.command(0x2F, list())
         data = self.get_answer_data(raw)
-        return [int(data[0], 16), int(data[1], 16)]
+        return [int(data[1], 16), int(data[2], 16)]
 
     def get_operating_hours(self):
+        """ Returns the operating hours, sent as two bytes with the high byte first """
         raw = self.command(0x0F, list())
         data = self.get_answer_data(raw)
-        return data
+        return int(data[1], 16) * 256 + int(data[2], 16)
+
+    def get_audio_volume(self):
+        """ Get the speaker volume (0 - 100) with the volume get command (0x45) """
+        raw = self.command(0x45, list())
+        data = self.get_answer_data(raw)
+        return int(data[1], 16)
+
+    def set_audio_volume(self, value):
+        """ Set the speaker volume (0 - 100) with the volume set command (0x44) """
+        data = self.command(0x44, [self.validate_value(value)])
+        return self.check_ack(data)
+
+    def get_video_parameters(self):
+        """ Get brightness, color, contrast, sharpness, tint, black level and gamma
+        as list of integers with the video parameters get command (0x33) """
+        raw = self.command(0x33, list())
+        data = self.get_answer_data(raw)
+        return [int(item, 16) for item in data[1:8]]
+
+    def set_video_parameter(self, index, value):
+        """ The video parameters set command (0x32) always sets all parameters at once,
+        so the current ones are read first and only the one at index is changed """
+        self.validate_value(value)
+        parameters = self.get_video_parameters()
+        if len(parameters) != 7:
+            return False
+        parameters[index] = value
+        data = self.command(0x32, parameters)
+        return self.check_ack(data)
+
+    def get_picture_brightness(self):
+        return self.get_video_parameters()[0]
+
+    def set_picture_brightness(self, value):
+        return self.set_video_parameter(0, value)
+
+    def get_picture_color(self):
+        return self.get_video_parameters()[1]
+
+    def set_picture_color(self, value):
+        return self.set_video_parameter(1, value)
+
+    def get_picture_contrast(self):
+        return self.get_video_parameters()[2]
+
+    def set_picture_contrast(self, value):
+        return self.set_video_parameter(2, value)
+
+    def get_picture_sharpness(self):
+        return self.get_video_parameters()[3]
+
+    def set_picture_sharpness(self, value):
+        return self.set_video_parameter(3, value)
 
 
 class PhilipsSICP110(PhilipsSICP100):
@@ -365,10 +448,10 @@ class PhilipsSICP160(PhilipsSICP150):
         """
         if state == self.POWER_STATE_ON:
             data = self.command(0x18, [0x02])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         elif state == self.POWER_STATE_OFF:
             data = self.command(0x18, [0x01])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         else:
             return False
 
@@ -563,9 +646,8 @@ class PhilipsSICP184(PhilipsSICP183):
     def set_auto_detect_input_channel(self, setting):
         """ Set the auto detect mechanism. Allowed values are 0x00
         and 0x01 according to V1.84 documentation on page 13, chapter 5.3 """
-        raw = self.command(0xAE, setting)
-        data = self.get_answer_data(raw)
-        return self.is_answer_ack(data)
+        data = self.command(0xAE, setting)
+        return self.check_ack(data)
 
 
 class PhilipsSICP185(PhilipsSICP184):
@@ -573,6 +655,9 @@ class PhilipsSICP185(PhilipsSICP184):
 
 
 class PhilipsSICP186(PhilipsSICP185):
+    # The group byte was added after the control byte in SICP 1.86
+    answer_header_length = 3
+
     def get_answer_data(self, data):
         """ Gets the part of the data that is used as data payload """
         if self.is_answer_ack(data):
@@ -623,7 +708,7 @@ class PhilipsSICP186(PhilipsSICP185):
         cmd = Tools.list_to_bytes(mapping)
 
         # run the command
-        result = self.connection.runcommand(cmd)
+        result = self.run_command(cmd)
         return result
 
     def get_lock_keys(self):
@@ -662,6 +747,9 @@ class PhilipsSICP186(PhilipsSICP185):
 
 
 class PhilipsSICP187(PhilipsSICP186):
+    # Number of entries in the failover input list, None means it is asked from the display
+    failover_input_slots = None
+
     def get_auto_detect_input_channel(self):
         """ Get the auto detect mechanism.
           Changted in V1.87 documentation on page 19, chapter 5.3 """
@@ -689,23 +777,24 @@ class PhilipsSICP187(PhilipsSICP186):
             del data[0]
         return data
 
+    def get_failover_input_slots(self):
+        """ The number of input channels the display expects in the failover list.
+        Unless the class defines it for the model, the display is asked only once. """
+        if self.failover_input_slots is not None:
+            return self.failover_input_slots
+        return self.get_static_value('failover_input_slots',
+                                     lambda: len(self.get_failover_input_setting()) or None)
+
     def set_failover_input_setting(self, setting):
         """ Set the input channel order for automatic failover.
-        Settings has to be a list. The command needs a list of exactly 14
-        input chanels. If the given variable differs, it will automatically
-        be trimmed to 14 entries. """
-
-        elements = len(setting)
-        needed = len(self.get_failover_input_setting())
-        if elements < needed:
-            for x in range(0, needed - elements):
-                setting.append(00)
-        elif elements > needed:
-            for x in range(0, elements - needed):
-                del setting[-1]
-        raw = self.command(0xA5, setting)
-        data = self.get_answer_data(raw)
-        return self.is_answer_ack(data)
+        Settings has to be a list. The command needs a list of exactly as many
+        input channels as the display has failover slots (usually 14). If the given
+        list differs, a padded or trimmed copy is sent. """
+        needed = self.get_failover_input_slots()
+        if needed is not None:
+            setting = list(setting[:needed]) + [0x00] * (needed - len(setting))
+        data = self.command(0xA5, setting)
+        return self.check_ack(data)
 
 
 class PhilipsSICP188(PhilipsSICP187):
@@ -800,7 +889,7 @@ class PhilipsSICP188(PhilipsSICP187):
             return False
 
         data = self.command(0x1B, [newstatus])
-        return self.is_answer_ack(data)
+        return self.check_ack(data)
 
     def set_lock_ir_remote(self, status):
         """ Set the status of the IR Remote lock
@@ -823,7 +912,7 @@ class PhilipsSICP188(PhilipsSICP187):
             return False
 
         data = self.command(0x1C, [newstatus])
-        return self.is_answer_ack(data)
+        return self.check_ack(data)
 
     def get_lock_ir_remote(self):
         """ Get the status of possibly locked IR remote
@@ -865,42 +954,76 @@ class PhilipsSICP188(PhilipsSICP187):
                     if visible:
                         label = 0x01
                     data = self.command(0xAC, [source[key], source[key], label, 0x00])
-                    return self.is_answer_ack(data)
+                    return self.check_ack(data)
         return False
 
 
+def sicp_key_for_version(version, default=None, maximum=None):
+    """ Returns the registry key of the controller matching a reported SICP version
+    (e.g. 'V1.88' -> philips_sicp188). Versions between two implemented ones use the
+    older controller, unknown versions or versions older than default return default.
+    maximum caps the version, e.g. 185 for displays that answered without group byte. """
+    match = re.search(r'(\d+)\.(\d+)', version or '')
+    if match is None:
+        return default
+    number = int(match.group(1)) * 100 + int(match.group(2).ljust(2, '0')[:2])
+    minimum = int(default[len('philips_sicp'):]) if default else 0
+    if maximum is not None:
+        number = min(number, maximum)
+    candidates = [known for known in SICP_VERSIONS if minimum <= known <= number]
+    if not candidates:
+        return default
+    return 'philips_sicp%d' % max(candidates)
+
+
 # noinspection PyBroadException
 class PhilipsSerialDetector(object):
     _command = None
     _key = None
+    _maximum = None
     _connection = None
-    _display = []
 
-    def __init__(self):
-        self._connection = SerialConnection()
+    def __init__(self, connection=None, ports=None, display_ids=None, deadline=None):
+        # If there is no connection specified, fall back to a default SerialConnection
+        if connection is None:
+            from displaycontrol.connections import SerialConnection
+            connection = SerialConnection()
+        # Without a list of ports, all available com ports are scanned
+        self._ports = ports
+        self._display_ids = display_ids if display_ids is not None else range(1, 5)
+        self._connection = connection
         self._displays = []
+        # Seconds (or a Deadline) for the whole detection, the rest is skipped afterwards
+        self._deadline = deadline
 
     def detect_displays_before_sicp186(self):
         self._command = PhilipsSICP100(self._connection)
         self._key = "philips_sicp100"
+        self._maximum = 185
         print "  -> Check Philips Displays before SICP 186"
         self.query_displays()
 
     def detect_displays_after_sicp186(self):
         self._command = PhilipsSICP186(self._connection)
         self._key = "philips_sicp186"
+        self._maximum = None
         print "Check Philips Displays after SICP 186"
         self.query_displays()
 
     def query_displays(self):
 
-        for port in Tools.get_available_comports():
+        ports = self._ports if self._ports is not None else Tools.get_available_comports()
+        for port in ports:
             print "  -> Trying to detect on port " + str(port)
-            self._command.connection.setPort(port)
-            for i in range(1, 5):
+            self._command.connection.port = port
+            for i in self._display_ids:
+                if self.is_expired():
+                    return
                 print "    -> For Display ID " + str(i)
                 self._command.set_display_id(i)
                 try:
+                    # Only displays that answer the power state query are reported
+                    self._command.get_power_state()
                     power = 'unbek.'
                     try:
                         power = self._command.get_power_state_hr()
@@ -931,6 +1054,7 @@ class PhilipsSerialDetector(object):
                         "port": port,
                         "id": i,
                         "key": self._key,
+                        "vendor": sicp_key_for_version(sicp, self._key, self._maximum),
                         "label": label,
                         "power": power,
                         "input": source,
@@ -943,8 +1067,13 @@ class PhilipsSerialDetector(object):
                 except Exception:
                     pass
 
+    def is_expired(self):
+        deadline = current_deadline()
+        return deadline is not None and deadline.expired()
+
     def detect_displays(self):
-        self.detect_displays_before_sicp186()
-        self.detect_displays_after_sicp186()
+        with scheduling(None, as_deadline(self._deadline)):
+            self.detect_displays_before_sicp186()
+            self.detect_displays_after_sicp186()
 
         return self._displays
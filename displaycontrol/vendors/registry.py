@@ -0,0 +1,96 @@
+"""
+Registry of controller classes by name (e.g. philips_sicp188, samsung_generic,
+benq_lu9235). The vendor module is only imported when its controller is requested.
+
+Third party packages can add their own controllers with an entry point in the
+displaycontrol.vendors group:
+
+    entry_points={
+        'displaycontrol.vendors': [
+            'acme_x1 = acme_displays.control:AcmeX1',
+        ],
+    }
+"""
+from importlib import import_module
+from displaycontrol.exceptions import VendorUnknownError
+
+ENTRY_POINT_GROUP = 'displaycontrol.vendors'
+
+_vendors = {
+    'benq_generic': 'displaycontrol.vendors.benq:BenQGeneric',
+    'benq_lu9235': 'displaycontrol.vendors.benq:BenQLU9235',
+    'philips_sicp100': 'displaycontrol.vendors.philips:PhilipsSICP100',
+    'philips_sicp110': 'displaycontrol.vendors.philips:PhilipsSICP110',
+    'philips_sicp130': 'displaycontrol.vendors.philips:PhilipsSICP130',
+    'philips_sicp140': 'displaycontrol.vendors.philips:PhilipsSICP140',
+    'philips_sicp150': 'displaycontrol.vendors.philips:PhilipsSICP150',
+    'philips_sicp160': 'displaycontrol.vendors.philips:PhilipsSICP160',
+    'philips_sicp170': 'displaycontrol.vendors.philips:PhilipsSICP170',
+    'philips_sicp180': 'displaycontrol.vendors.philips:PhilipsSICP180',
+    'philips_sicp182': 'displaycontrol.vendors.philips:PhilipsSICP182',
+    'philips_sicp183': 'displaycontrol.vendors.philips:PhilipsSICP183',
+    'philips_sicp184': 'displaycontrol.vendors.philips:PhilipsSICP184',
+    'philips_sicp185': 'displaycontrol.vendors.philips:PhilipsSICP185',
+    'philips_sicp186': 'displaycontrol.vendors.philips:PhilipsSICP186',
+    'philips_sicp187': 'displaycontrol.vendors.philips:PhilipsSICP187',
+    'philips_sicp188': 'displaycontrol.vendors.philips:PhilipsSICP188',
+    'samsung_generic': 'displaycontrol.vendors.samsung:SamsungV065',
+    'samsung_v065': 'displaycontrol.vendors.samsung:SamsungV065',
+}
+
+_entry_points_loaded = False
+
+
+def register_vendor(key, target):
+    """ Registers a controller class (or a 'module:Class' string) under the given key """
+    _vendors[key] = target
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        import pkg_resources
+    except ImportError:
+        return
+    for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP):
+        if entry_point.name not in _vendors:
+            _vendors[entry_point.name] = entry_point
+
+
+def _resolve(target):
+    if isinstance(target, basestring):
+        module, name = target.split(':')
+        return getattr(import_module(module), name)
+    if hasattr(target, 'load') and hasattr(target, 'module_name'):
+        return target.load()
+    return target
+
+
+def get_vendor(key):
+    """ Returns the controller class registered under the given key """
+    if key not in _vendors:
+        _load_entry_points()
+    if key not in _vendors:
+        raise VendorUnknownError(key)
+    target = _resolve(_vendors[key])
+    _vendors[key] = target
+    return target
+
+
+def available_vendors():
+    """ All registered keys, including those of third party entry points """
+    _load_entry_points()
+    return sorted(_vendors.keys())
+
+
+def vendor_key(controller_class):
+    """ The first key (in sorted order) a controller class is registered with, or None """
+    path = '%s:%s' % (controller_class.__module__, controller_class.__name__)
+    for key in sorted(_vendors.keys()):
+        target = _vendors[key]
+        if target is controller_class or target == path:
+            return key
+    return None
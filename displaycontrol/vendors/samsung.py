@@ -2,13 +2,15 @@
 Samsung Display Communcation file.
 """
 from displaycontrol.vendors import DisplayGeneric
-from displaycontrol.connections import SerialConnection, GenericConnection
+from displaycontrol.vendors.capabilities import supports
+from displaycontrol.connections.arbiter import scheduling, current_deadline
+from displaycontrol.deadline import as_deadline
+from displaycontrol.connections.framing import SamsungFramer
+from displaycontrol.connections.parser import FrameParser
 from displaycontrol.tools import Tools
 
 
 class SamsungGeneric(DisplayGeneric):
-    connection = GenericConnection()
-
     input_channel_get = {
         '14': 'PC',
         '1E': 'BNC',
@@ -31,6 +33,12 @@ class SamsungGeneric(DisplayGeneric):
     def __init__(self, newconnection, newid=1):
         DisplayGeneric.__init__(self, newconnection, newid)
 
+    def set_connection(self, new_connection):
+        # The answers are handled as list of hex values, checked for a valid frame of this
+        # protocol first. Whatever the connection delivers (bytes or a hex list) is parsed.
+        self.answer_parser = FrameParser(self.framer())
+        self.connection = new_connection
+
     def command(self, command, data=None):
         """ Perform the given command with additional data """
         # If no data was given, it is an empty array
@@ -60,7 +68,7 @@ class SamsungGeneric(DisplayGeneric):
         cmd = Tools.list_to_bytes(mapping)
 
         # run the command
-        return self.connection.runcommand(cmd)
+        return self.run_command(cmd)
 
     def get_answer_data(self, data):
         """ Gets the part of the data that is used as data payload """
@@ -88,6 +96,9 @@ class SamsungGeneric(DisplayGeneric):
         else:
             return list()
 
+    def framer(self):
+        return SamsungFramer(self.calculate_checksum)
+
     def calculate_checksum(self, mapping):
         """ Calculate the checksum as defined in the docs """
         # Init the sum with 0
@@ -96,7 +107,11 @@ class SamsungGeneric(DisplayGeneric):
             # Skip the first item, because it is always the header 0xAA
             if index > 0:
                 total = total + int(item)
-        return total
+        # Only the lowest byte is sent
+        return total & 0xFF
+
+    def is_ready_for_commands(self):
+        return self.is_answer_ack(self.command(0x11))
 
     def is_answer_ack(self, data):
         if len(data) > 7:
@@ -136,36 +151,95 @@ class SamsungV065(SamsungGeneric):
     def set_power_state(self, state):
         if state == self.POWER_STATE_ON:
             data = self.command(0x11, [0x01])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         elif state == self.POWER_STATE_OFF:
             data = self.command(0x11, [0x02])
-            return self.is_answer_ack(data)
+            return self.check_ack(data)
         else:
             return False
 
     def set_input_channel(self, channel, visible=False):
-        """ Set the input channel based on the local list """
+        """ Set the input channel based on the local list. The answer of the display
+        already contains the new channel, so the ack is sufficient. """
         for key in self.input_channel_set:
             if self.input_channel_set[key] == channel:
-                self.command(0x14, [int(key, 16)])
-                data = self.get_input_channel()
-                return key == data
+                data = self.command(0x14, [int(key, 16)])
+                return self.check_ack(data)
         return False
 
+    def get_value(self, command):
+        """ Get an absolute value (volume, contrast, ...) with the given command """
+        raw = self.command(command)
+        data = self.get_answer_data(raw)
+        if len(data) > 0:
+            return int(data[0], 16)
+
+    def set_value(self, command, value):
+        """ Set an absolute value (volume, contrast, ...) with the given command """
+        data = self.command(command, [self.validate_value(value)])
+        return self.check_ack(data)
+
+    def get_audio_volume(self):
+        return self.get_value(0x12)
+
+    def set_audio_volume(self, value):
+        return self.set_value(0x12, value)
+
+    def get_picture_contrast(self):
+        return self.get_value(0x24)
+
+    def set_picture_contrast(self, value):
+        return self.set_value(0x24, value)
+
+    def get_picture_brightness(self):
+        return self.get_value(0x25)
+
+    def set_picture_brightness(self, value):
+        return self.set_value(0x25, value)
+
+    def get_picture_sharpness(self):
+        return self.get_value(0x26)
+
+    def set_picture_sharpness(self, value):
+        return self.set_value(0x26, value)
+
+    def get_picture_color(self):
+        return self.get_value(0x27)
+
+    def set_picture_color(self, value):
+        return self.set_value(0x27, value)
+
 
 # noinspection PyBroadException
 class SamsungSerialDetector(object):
-    def __init__(self):
-        self._connection = SerialConnection()
+    def __init__(self, connection=None, ports=None, display_ids=None, deadline=None):
+        # If there is no connection specified, fall back to a default SerialConnection
+        if connection is None:
+            from displaycontrol.connections import SerialConnection
+            connection = SerialConnection()
+        # Without a list of ports, all available com ports are scanned
+        self._ports = ports
+        self._display_ids = display_ids if display_ids is not None else range(0, 5)
+        self._connection = connection
         self._command = SamsungV065(self._connection)
         self._displays = []
+        # Seconds (or a Deadline) for the whole detection, the rest is skipped afterwards
+        self._deadline = deadline
 
     def detect_displays(self):
+        with scheduling(None, as_deadline(self._deadline)):
+            return self.query_displays()
+
+    def query_displays(self):
         print "Check Samsung Displays"
-        for port in Tools.get_available_comports():
+        ports = self._ports if self._ports is not None else Tools.get_available_comports()
+        for port in ports:
             print "  -> Trying to detect on port " + str(port)
             self._command.connection.port = port
-            for i in range(0, 5):
+            for i in self._display_ids:
+                deadline = current_deadline()
+                if deadline is not None and deadline.expired():
+                    return self._displays
                 print "    -> For Display ID " + str(i)
                 self._command.set_display_id(i)
                 try:
@@ -192,10 +266,11 @@ class SamsungSerialDetector(object):
                         except Exception:
                             pass
                         sicp = ''
-                        try:
-                            sicp = self._command.get_control_software_version()
-                        except Exception:
-                            pass
+                        if supports(self._command, 'get_control_software_version'):
+                            try:
+                                sicp = self._command.get_control_software_version()
+                            except Exception:
+                                pass
 
                         newdisplay = {"port": port,
                                       "id": i,
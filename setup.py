@@ -11,7 +11,7 @@ with open(path.join(here, 'README.md'), encoding='utf-8') as f:
 setup(
     name='displaycontrol',
     version='0.0.3.dev1',
-    packages=['displaycontrol'],
+    packages=['displaycontrol', 'displaycontrol.connections', 'displaycontrol.vendors'],
     license='Creative Commons Attribution-Noncommercial-Share Alike license',
     description='Package to control displays and projectors via serial and ethernet connection.',
     long_description=long_description,
@@ -25,6 +25,12 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 2.7',
     ],
+    entry_points={
+        'console_scripts': [
+            'displaycontrol=displaycontrol.cli:main',
+            'displaycontrol-gateway=displaycontrol.gateway:main',
+        ],
+    },
     test_suite='nose.collector',
     tests_require=['nose'],
 )